@@ -0,0 +1,342 @@
+"""
+Team 分配器
+
+常驻内存，按分配策略把有空位的 Team 放在一个最小堆中，加入请求（join_team、admin_invite_auto）
+直接从堆顶取候选 Team，不再每次请求读库并对整个 Team 列表排序，两处入口也使用同一套选择策略。
+分配器只决定尝试顺序，名额上限仍由 SeatReservation 的条件插入保证。
+
+- 首次使用时从数据库 (Team.get_allocation_state) 加载，之后每 ALLOCATOR_RESYNC_INTERVAL 秒整体重新加载
+  （兜底其他进程的修改）
+- 通过 events 增量更新：seats_changed 带有新增 / 删除的预占时直接调整内存中的预占（不读库），
+  invitation_created 及其他 seats_changed（邀请记录被删除、预占失败）重新读取相关 Team 的名额，
+  team_invited 更新最后邀请时间，teams_changed（Team 增删改、token 状态变化）标记下次使用前整体重新加载
+- 堆中条目按版本号惰性失效（与 ExpiryScheduler 相同）：Team 状态变化时压入新条目，
+  取候选时丢弃旧版本条目，取 k 个候选的开销为 O(k log n)
+
+分配策略 (ALLOCATOR_STRATEGY):
+    most_recent   最近邀请成功的优先（原 get_free_teams 的顺序），从未邀请的排最后
+    least_loaded  占用名额（成功邀请 + 预占）最少的优先，相同时最久未邀请的优先，并发请求分散到不同账号；
+                  预占到期时按到期时间堆把该 Team 重新压入，排序随之恢复
+    round_robin   按分配顺序轮转，每个 Team 被分配为首选后排到最后
+粘性分配 (ALLOCATOR_STICKY): 密钥已分配的 Team (AccessKey.team_id) 有空位时排在第一位，可与任一策略组合。
+"""
+import heapq
+import itertools
+import threading
+import time
+
+import events
+from database import Team
+from config import ALLOCATOR_STRATEGY, ALLOCATOR_STICKY, ALLOCATOR_RESYNC_INTERVAL, TEAM_SEATS
+
+
+class _TeamSlot:
+    """分配器中一个 Team 的状态"""
+    __slots__ = ('team_id', 'healthy', 'members', 'reservations', 'last_invite_ts', 'handout_seq', 'version')
+
+    def __init__(self, team_id):
+        self.team_id = team_id
+        self.healthy = True
+        self.members = 0
+        self.reservations = []  # 未过期名额预占的到期时间戳
+        self.last_invite_ts = 0
+        self.handout_seq = 0
+        self.version = 0
+
+    def reserved(self, now):
+        return sum(1 for ts in self.reservations if ts > now)
+
+    def used(self, now):
+        return self.members + self.reserved(now)
+
+
+class MostRecentStrategy:
+    name = 'most_recent'
+    counts_reservations = False  # 排序键是否包含预占（预占到期时需要重新压入）
+
+    def key(self, slot, now):
+        return (-slot.last_invite_ts, -slot.team_id)
+
+    def on_allocate(self, slot):
+        """Team 被分配为首选后调用，返回排序键是否变化"""
+        return False
+
+
+class LeastLoadedStrategy:
+    name = 'least_loaded'
+    counts_reservations = True
+
+    def key(self, slot, now):
+        return (slot.used(now), slot.last_invite_ts, slot.team_id)
+
+    def on_allocate(self, slot):
+        return False
+
+
+class RoundRobinStrategy:
+    name = 'round_robin'
+    counts_reservations = False
+
+    def __init__(self):
+        self._seq = itertools.count(1)
+
+    def key(self, slot, now):
+        return (slot.handout_seq, slot.team_id)
+
+    def on_allocate(self, slot):
+        slot.handout_seq = next(self._seq)
+        return True
+
+
+STRATEGIES = {cls.name: cls for cls in (MostRecentStrategy, LeastLoadedStrategy, RoundRobinStrategy)}
+
+
+class TeamAllocator:
+    """按策略分配候选 Team（线程安全）"""
+
+    def __init__(self, strategy=ALLOCATOR_STRATEGY, sticky=ALLOCATOR_STICKY, seats=TEAM_SEATS,
+                 resync_interval=ALLOCATOR_RESYNC_INTERVAL, loader=Team.get_allocation_state, lookup=Team.get_by_id):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的分配策略: {strategy}（可选: {', '.join(STRATEGIES)}）")
+        self.strategy = STRATEGIES[strategy]()
+        self.sticky = sticky
+        self.seats = seats
+        self.resync_interval = resync_interval
+        self._loader = loader  # team_ids=None 时返回所有 Team 的状态
+        self._lookup = lookup  # 按 ID 读取 Team 元数据（Team 缓存）
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._slots = {}  # team_id -> _TeamSlot
+        self._heap = []  # [(排序键, 版本号, team_id)]
+        self._expiries = []  # [(最早的未过期预占到期时间, team_id)]，排序键包含预占时到期后重新压入
+        self._loaded_at = None
+        self._dirty = False
+        self._stats = {'requests': 0, 'empty': 0, 'sticky_hits': 0, 'refreshes': 0, 'reloads': 0,
+                       'stale_dropped': 0}
+
+        events.subscribe('invitation_created', self._on_invitation_created)
+        events.subscribe('seats_changed', self._on_seats_changed)
+        events.subscribe('team_invited', self._on_team_invited)
+        events.subscribe('teams_changed', self._on_teams_changed)
+
+    # ---------- 状态维护 ----------
+
+    def _eligible(self, slot):
+        """token 未过期且成功邀请数未满（不考虑会自动过期的预占）"""
+        return slot.healthy and slot.members < self.seats
+
+    def _push(self, slot, now):
+        """状态变化后压入新条目，旧条目随版本号失效"""
+        slot.version += 1
+        if self._eligible(slot):
+            heapq.heappush(self._heap, (self.strategy.key(slot, now), slot.version, slot.team_id))
+            if self.strategy.counts_reservations:
+                expires_at = min((ts for ts in slot.reservations if ts > now), default=None)
+                if expires_at is not None:
+                    heapq.heappush(self._expiries, (expires_at, slot.team_id))
+
+    def _expire_reservations(self, now):
+        """预占到期的 Team 按当前占用重新压入（过时的到期条目只会多压入一次，不影响结果）"""
+        while self._expiries and self._expiries[0][0] <= now:
+            _, team_id = heapq.heappop(self._expiries)
+            slot = self._slots.get(team_id)
+            if slot is not None:
+                slot.reservations = [ts for ts in slot.reservations if ts > now]
+                self._push(slot, now)
+
+    def _apply(self, slot, state):
+        slot.healthy = state['token_status'] != 'expired'
+        slot.members = state['success_members']
+        slot.reservations = state['reservations']
+        # 最后邀请时间由审计线程异步写库，数据库中的值可能比内存旧
+        slot.last_invite_ts = max(slot.last_invite_ts, state['last_invite_ts'] or 0)
+
+    def reload(self):
+        """从数据库整体重新加载"""
+        with self._lock:
+            self._dirty = False
+        states = self._loader(None)
+        now = time.time()
+        with self._lock:
+            slots = {}
+            for state in states:
+                slot = self._slots.get(state['id']) or _TeamSlot(state['id'])
+                self._apply(slot, state)
+                slots[slot.team_id] = slot
+            self._slots = slots
+            self._heap = []
+            self._expiries = []
+            for slot in slots.values():
+                self._push(slot, now)
+            self._loaded_at = time.monotonic()
+            self._stats['reloads'] += 1
+
+    def refresh(self, team_ids):
+        """重新读取部分 Team 的状态（已删除的 Team 移出分配器）"""
+        team_ids = list(team_ids)
+        if not team_ids or self._loaded_at is None:
+            return
+        states = {state['id']: state for state in self._loader(team_ids)}
+        now = time.time()
+        with self._lock:
+            for team_id in team_ids:
+                state = states.get(team_id)
+                if state is None:
+                    self._slots.pop(team_id, None)
+                    continue
+                slot = self._slots.get(team_id)
+                if slot is None:
+                    slot = self._slots[team_id] = _TeamSlot(team_id)
+                self._apply(slot, state)
+                self._push(slot, now)
+            self._stats['refreshes'] += 1
+            self._compact()
+
+    def adjust_reservations(self, reserved=(), released=()):
+        """按新增 / 删除的预占 [(team_id, expires_at)] 调整名额（不读库）"""
+        now = time.time()
+        changed = {}
+        with self._lock:
+            for team_id, expires_at in reserved:
+                slot = self._slots.get(team_id)
+                if slot is not None:
+                    slot.reservations.append(expires_at)
+                    changed[team_id] = slot
+            for team_id, expires_at in released:
+                slot = self._slots.get(team_id)
+                # 加载时已过期或在加载之前创建的预占可能不在列表中
+                if slot is not None and expires_at in slot.reservations:
+                    slot.reservations.remove(expires_at)
+                    changed[team_id] = slot
+            for slot in changed.values():
+                slot.reservations = [ts for ts in slot.reservations if ts > now]
+                self._push(slot, now)
+            self._compact()
+
+    def touch(self, team_id, ts=None):
+        """更新 Team 的最后邀请时间（不读库）"""
+        with self._lock:
+            slot = self._slots.get(team_id)
+            if slot is not None:
+                slot.last_invite_ts = max(slot.last_invite_ts, int(ts or time.time()))
+                self._push(slot, time.time())
+                self._compact()
+
+    def _compact(self):
+        """失效条目过多时按当前状态重建堆"""
+        if len(self._heap) > 2 * len(self._slots) + 64:
+            now = time.time()
+            self._heap = [(self.strategy.key(slot, now), slot.version, slot.team_id)
+                          for slot in self._slots.values() if self._eligible(slot)]
+            heapq.heapify(self._heap)
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded_at is not None and not self._dirty \
+                    and time.monotonic() - self._loaded_at < self.resync_interval:
+                return
+            first_load = self._loaded_at is None
+        # 首次加载需要等待；之后的重新加载由一个线程完成，其他线程继续使用当前状态
+        if not self._load_lock.acquire(blocking=first_load):
+            return
+        try:
+            with self._lock:
+                stale = self._loaded_at is None or self._dirty \
+                    or time.monotonic() - self._loaded_at >= self.resync_interval
+            if stale:
+                self.reload()
+        finally:
+            self._load_lock.release()
+
+    def _on_invitation_created(self, team_id, status, **_):
+        if status == 'success':
+            self.refresh([team_id])
+
+    def _on_seats_changed(self, team_ids, reserved=None, released=None, **_):
+        if reserved is None and released is None:
+            self.refresh(team_ids)
+        else:
+            self.adjust_reservations(reserved or (), released or ())
+
+    def _on_team_invited(self, team_id, ts=None, **_):
+        self.touch(team_id, ts)
+
+    def _on_teams_changed(self, **_):
+        with self._lock:
+            self._dirty = True
+
+    # ---------- 分配 ----------
+
+    def candidate_ids(self, limit, preferred_team_id=None, peek=False):
+        """按策略返回最多 limit 个当前有空位的 Team ID（peek=True 时只查看，不计入分配）"""
+        self._ensure_loaded()
+        now = time.time()
+        picked = []
+        with self._lock:
+            self._expire_reservations(now)
+            if not peek:
+                self._stats['requests'] += 1
+            if self.sticky and preferred_team_id is not None:
+                slot = self._slots.get(preferred_team_id)
+                if slot is not None and self._eligible(slot) and slot.used(now) < self.seats:
+                    picked.append(slot)
+                    if not peek:
+                        self._stats['sticky_hits'] += 1
+
+            kept = []  # 仍然有效的条目，取完后放回堆中
+            while self._heap and len(picked) < limit:
+                entry = heapq.heappop(self._heap)
+                slot = self._slots.get(entry[2])
+                if slot is None or slot.version != entry[1] or not self._eligible(slot):
+                    self._stats['stale_dropped'] += 1
+                    continue
+                kept.append(entry)
+                # 被未过期预占占满的 Team 暂时跳过，预占到期后无需事件即可再次分配；
+                # 已按粘性放在最前的 Team 不重复返回（未启用粘性时按策略正常排序）
+                if slot not in picked and slot.used(now) < self.seats:
+                    picked.append(slot)
+            for entry in kept:
+                heapq.heappush(self._heap, entry)
+
+            if not peek:
+                if not picked:
+                    self._stats['empty'] += 1
+                elif self.strategy.on_allocate(picked[0]):
+                    self._push(picked[0], now)
+                    self._compact()
+        return [slot.team_id for slot in picked]
+
+    def candidates(self, limit, preferred_team_id=None):
+        """
+        按策略返回最多 limit 个当前有空位的 Team（Team 缓存中的记录，
+        附带 member_count、reserved_count）
+        """
+        now = time.time()
+        teams = []
+        for team_id in self.candidate_ids(limit, preferred_team_id):
+            team = self._lookup(team_id)
+            if team is None:
+                continue
+            with self._lock:
+                slot = self._slots.get(team_id)
+                if slot is not None:
+                    team['member_count'] = slot.members
+                    team['reserved_count'] = slot.reserved(now)
+            teams.append(team)
+        return teams
+
+    def get_stats(self):
+        now = time.time()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['strategy'] = self.strategy.name
+            stats['sticky'] = self.sticky
+            stats['teams'] = len(self._slots)
+            stats['available'] = sum(1 for slot in self._slots.values()
+                                     if self._eligible(slot) and slot.used(now) < self.seats)
+            stats['heap_size'] = len(self._heap)
+            stats['age'] = round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None
+        return stats
+
+
+team_allocator = TeamAllocator()
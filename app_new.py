@@ -2,21 +2,46 @@
 ChatGPT Team 自动邀请系统 - 主应用
 """
 from flask import Flask, request, jsonify, render_template, session, redirect, url_for
-from curl_cffi import requests as cf_requests
+from flask.json.provider import DefaultJSONProvider
 import json
 from functools import wraps
-from database import init_db, Team, AccessKey, Invitation, AutoKickConfig, KickLog, LoginAttempt, Order, XHSConfig
+from database import (init_db, Team, AccessKey, Invitation, SeatReservation, AutoKickConfig, KickLog, LoginAttempt,
+                      Order, XHSConfig, get_db_pool_stats, get_audit_writer_stats, get_team_cache_stats,
+                      next_page_cursor)
+from records import Record
 from datetime import datetime, timedelta
 import pytz
 from config import *
 from auto_kick_service import auto_kick_service
+from expiry_scheduler import expiry_scheduler
+from allocator import team_allocator
+from ready_pool import ready_pool
+from chatgpt_client import chatgpt_client
+from rate_limiter import rate_limiter, RateLimited
+from member_cache import member_cache
+from budget import Budget
+from invite_verify import invite_verifier
+from bulk_ops import parse_emails, bulk_invite, bulk_kick
 import threading
+import time
 
 # 全局同步锁，防止并发同步导致资源耗尽
 sync_lock = threading.Lock()
 
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """JSON 序列化时把数据库记录对象转换为字典"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
+app.json = RecordJSONProvider(app)
 
 # 初始化数据库
 init_db()
@@ -32,31 +57,31 @@ def admin_required(f):
     return decorated_function
 
 
-def invite_to_team(access_token, account_id, email, team_id=None):
-    """调用 ChatGPT API 邀请成员"""
-    url = f"https://chatgpt.com/backend-api/accounts/{account_id}/invites"
-    
-    headers = {
-        "accept": "*/*",
-        "accept-language": "zh-CN,zh;q=0.9",
-        "authorization": f"Bearer {access_token}",
-        "chatgpt-account-id": account_id,
-        "content-type": "application/json",
-        "oai-device-id": "a9c9e9a0-f72d-4fbc-800e-2d0e1e3c3b54",
-        "oai-language": "zh-CN",
-        "origin": "https://chatgpt.com",
-        "referer": "https://chatgpt.com/admin",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
-    
-    payload = {
-        "email_addresses": [email],
-        "role": "standard-user",
-        "resend_emails": False
+def get_page_args(*filters):
+    """
+    解析管理后台列表的分页参数 (limit, cursor) 和指定的过滤参数
+    可用过滤: team_id, status, email_prefix, created_from, created_to
+    """
+    limit = request.args.get('limit', ADMIN_PAGE_SIZE, type=int) or ADMIN_PAGE_SIZE
+    args = {
+        'limit': max(1, min(limit, ADMIN_PAGE_SIZE_MAX)),
+        'cursor': request.args.get('cursor') or None
     }
-    
+    for name in filters:
+        if name == 'team_id':
+            value = request.args.get('team_id', type=int)
+        else:
+            value = (request.args.get(name) or '').strip()
+        if value:
+            args[name] = value
+    return args
+
+
+def invite_to_team(access_token, account_id, email, team_id=None, read_timeout=None, max_wait=None):
+    """调用 ChatGPT API 邀请成员"""
     try:
-        response = cf_requests.post(url, headers=headers, json=payload, impersonate="chrome110")
+        response = chatgpt_client.invite(access_token, account_id, [email],
+                                         read_timeout=read_timeout, max_wait=max_wait)
         
         if response.status_code in [200, 201]:
             data = response.json()
@@ -81,10 +106,18 @@ def invite_to_team(access_token, account_id, email, team_id=None):
             return {"success": False, "error": response.text, "status_code": response.status_code}
         else:
             return {"success": False, "error": response.text, "status_code": response.status_code}
+    except RateLimited as e:
+        # 本地限流拒绝，请求没有发出
+        return {"success": False, "error": str(e), "not_sent": True}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+def invite_may_have_applied(result):
+    """邀请失败时上游是否可能已生效：本地限流未发出的请求和 401（token 无效）一定没有生效"""
+    return not result.get('not_sent') and result.get('status_code') != 401
+
+
 # ==================== 用户端路由 ====================
 
 @app.route('/')
@@ -155,179 +188,147 @@ def join_team():
             else:
                 print("⚠️ 同步任务已在运行，跳过本次触发")
                 # 可以选择在这里等待一小会儿，或者直接返回
-                import time
                 time.sleep(2) # 简单等待一下，看是否能查到
                 key_info = AccessKey.get_by_code(key_code)
     
     if not key_info:
         return jsonify({"success": False, "error": "无效的访问密钥"}), 400
 
-    # 方案2优化：智能选择Team + 限制重试次数
-    # 1. 获取所有Team（排除token过期的）
-    all_teams = Team.get_all()
-    all_teams = [t for t in all_teams if t.get('token_status') != 'expired']
+    # 从这里开始计算邀请流程的时间预算（订单按需同步不计入）
+    budget = Budget(JOIN_DEADLINE)
 
-    if not all_teams:
-        return jsonify({"success": False, "error": "当前无可用 Team，请联系管理员"}), 400
-
-    # 2. 只选择通过我们系统邀请的成员数 < 4 的Team
-    available_teams = []
-    for team in all_teams:
-        invited_count = Invitation.get_success_count_by_team(team['id'])
-        if invited_count < 4:
-            team['invited_count'] = invited_count  # 保存邀请数
-            available_teams.append(team)
+    # 1. 从 Team 分配器按策略取候选Team：只包含有空位且 token 未过期的Team，
+    #    密钥已分配的Team（有空位时）排在最前面
+    with budget.step('allocate'):
+        available_teams = team_allocator.candidates(JOIN_CANDIDATES, preferred_team_id=key_info.get('team_id'))
 
     if not available_teams:
+        if not Team.get_all_with_capacity():
+            return jsonify({"success": False, "error": "当前无可用 Team，请联系管理员"}), 400
         return jsonify({"success": False, "error": "所有 Team 名额已满，请联系管理员"}), 400
 
-    # 3. 按最近邀请时间排序（最近成功的在前，命中率更高）
-    available_teams.sort(key=lambda t: t.get('last_invite_at') or '', reverse=True)
-
-    # 4. 优先使用已分配的Team
-    assigned_team_id = key_info.get('team_id')
-    if assigned_team_id:
-        assigned_team = next((t for t in available_teams if t['id'] == assigned_team_id), None)
-        if assigned_team:
-            # 将已分配的Team移到列表最前面
-            available_teams = [assigned_team] + [t for t in available_teams if t['id'] != assigned_team_id]
+    # 2. 按后台就绪池的核对结果调整顺序：邮箱已在其中的Team最先，上游有空位的其次，
+    #    上游已满的跳过，未核对的排最后（就绪池为空时顺序不变）
+    available_teams, known_sources = ready_pool.arrange(available_teams, email)
 
-    # 5. 最多尝试3个Team
-    max_attempts = 3
+    # 3. 按顺序在候选Team中预占名额（短事务内的条件插入，并发请求不会超额分配），
+    #    预占成功后直接邀请，不再先获取成员列表；整个请求共享 JOIN_DEADLINE 时间预算
     tried_teams = []
     last_error = None
 
-    # 遍历可用Team，最多尝试3次
-    for i, team in enumerate(available_teams):
-        if i >= max_attempts:
-            break  # 限制最多尝试3次
-
-        tried_teams.append(team['name'])
-
-        # 检查实际成员数（API获取）
-        members_result = get_team_members(team['access_token'], team['account_id'], team['id'])
-        if not members_result['success']:
-            last_error = f"无法获取{team['name']}成员列表"
-            continue
-
-        members = members_result.get('members', [])
-        non_owner_members = [m for m in members if m.get('role') != 'account-owner']
+    for team in available_teams:
+        if len(tried_teams) >= JOIN_MAX_ATTEMPTS:
+            break
+        if budget.expired():
+            last_error = "请求超时"
+            break
 
-        # 实际成员数已满，跳过此Team
-        if len(non_owner_members) >= 4:
-            last_error = f"{team['name']}实际成员已满"
+        with budget.step('reserve', team=team['name']):
+            reservation_id = SeatReservation.reserve(team['id'], email, key_info['id'])
+        if not reservation_id:
+            # 名额已被并发请求预占满，换下一个Team
             continue
 
-        # 检查该邮箱是否已在此Team中
-        member_emails = [m.get('email', '').lower() for m in members]
-        if email.lower() in member_emails:
-            # 已经是成员，直接返回成功
-            Invitation.create(
-                team_id=team['id'],
-                email=email,
-                key_id=key_info['id'],
-                status='success',
-                is_temp=False
-            )
-            AccessKey.cancel(key_info['id'])
-            return jsonify({
-                "success": True,
-                "message": f"✅ 您已是 {team['name']} 团队成员！",
-                "team_name": team['name'],
-                "email": email
-            })
+        tried_teams.append(team['name'])
+        keep_reservation = False
+        try:
+            if team['id'] in known_sources:
+                # 就绪池刚核对过：邮箱已在成员或待处理邀请中，不再发送邀请
+                result = {'success': False}
+                verify_result = {'found': True, 'source': known_sources[team['id']]}
+            else:
+                # 尝试邀请
+                with budget.step('invite', team=team['name']):
+                    result = invite_to_team(
+                        team['access_token'],
+                        team['account_id'],
+                        email,
+                        team['id'],
+                        read_timeout=budget.timeout(JOIN_INVITE_TIMEOUT),
+                        max_wait=budget.remaining()
+                    )
 
-        # 尝试邀请
-        result = invite_to_team(
-            team['access_token'],
-            team['account_id'],
-            email,
-            team['id']
-        )
+                # 邀请失败且可能已生效时，轮询待处理邀请和成员列表验证是否实际成功（不超过剩余预算）；
+                # 已经是成员的邮箱也在这里识别出来。请求未发出或 token 无效时直接换下一个Team
+                verify_result = {'found': False}
+                if not result['success'] and invite_may_have_applied(result) and not budget.expired():
+                    with budget.step('verify', team=team['name']):
+                        verify_result = invite_verifier.verify(team, email,
+                                                               timeout=budget.timeout(JOIN_VERIFY_TIMEOUT))
+
+            if not result['success'] and not verify_result['found']:
+                last_error = f"{team['name']}: {result.get('error', '未知错误')}"
+                # 超时/5xx 等结果不明确的失败，邀请可能已在上游生效只是验证时还不可见：
+                # 保留预占直到过期（SEAT_RESERVATION_TTL），避免其他请求再占用这个名额
+                status_code = result.get('status_code')
+                if invite_may_have_applied(result) and (status_code is None or status_code >= 500):
+                    keep_reservation = True
+                continue
 
-        if result['success']:
-            # 邀请成功！计算过期时间
+            # 邀请成功（或验证确认）！已是成员的邮箱按原有成员记录，不设过期时间
+            already_member = verify_result.get('source') == 'member'
             temp_expire_at = None
-            if key_info['is_temp'] and key_info['temp_hours'] > 0:
+            if key_info['is_temp'] and key_info['temp_hours'] > 0 and not already_member:
                 now = datetime.utcnow()
                 temp_expire_at = (now + timedelta(hours=key_info['temp_hours'])).strftime('%Y-%m-%d %H:%M:%S')
 
-            # 记录邀请
-            Invitation.create(
+            # 记录邀请并释放预占（同一事务）
+            if verify_result['found']:
+                Invitation.delete_by_email(team['id'], email)
+            SeatReservation.fulfill(
+                reservation_id,
                 team_id=team['id'],
                 email=email,
                 key_id=key_info['id'],
                 invite_id=result.get('invite_id'),
                 status='success',
-                is_temp=key_info['is_temp'],
+                is_temp=key_info['is_temp'] and not already_member,
                 temp_expire_at=temp_expire_at
             )
+            keep_reservation = True
 
             # 邀请码使用一次后立即取消
             AccessKey.cancel(key_info['id'])
             Team.update_last_invite(team['id'])
-
+        finally:
+            if not keep_reservation:
+                SeatReservation.release(reservation_id)
+
+        if already_member:
+            message = f"✅ 您已是 {team['name']} 团队成员！"
+        elif verify_result['found']:
+            message = f"🎉 成功加入 {team['name']} 团队！（验证确认）\n\n📧 请立即查收邮箱 {email} 的邀请邮件并确认加入。"
+            if key_info['is_temp'] and key_info['temp_hours'] > 0:
+                message += f"\n\n⏰ 注意：这是一个 {key_info['temp_hours']} 小时临时邀请。"
+        else:
             message = f"🎉 成功加入 {team['name']} 团队！\n\n📧 请立即查收邮箱 {email} 的邀请邮件并确认加入。\n\n💡 提示：邮件可能在垃圾箱中，请注意查看。"
             if key_info['is_temp'] and key_info['temp_hours'] > 0:
                 message += f"\n\n⏰ 注意：这是一个 {key_info['temp_hours']} 小时临时邀请，到期后如果管理员未确认，将自动踢出。"
 
-            if len(tried_teams) > 1:
-                message += f"\n\n💡 尝试了 {len(tried_teams)} 个Team后成功"
+        if len(tried_teams) > 1:
+            message += f"\n\n💡 尝试了 {len(tried_teams)} 个Team后成功"
 
-            return jsonify({
-                "success": True,
-                "message": message,
-                "team_name": team['name'],
-                "email": email
-            })
-        else:
-            # 邀请失败，验证是否实际成功
-            import time
-            time.sleep(1)
-
-            # 检查pending列表
-            pending_result = get_pending_invites(team['access_token'], team['account_id'])
-            if pending_result['success']:
-                pending_emails = [inv.get('email_address', '').lower() for inv in pending_result.get('invites', [])]
-                if email.lower() in pending_emails:
-                    # 实际已成功
-                    temp_expire_at = None
-                    if key_info['is_temp'] and key_info['temp_hours'] > 0:
-                        now = datetime.utcnow()
-                        temp_expire_at = (now + timedelta(hours=key_info['temp_hours'])).strftime('%Y-%m-%d %H:%M:%S')
-
-                    Invitation.delete_by_email(team['id'], email)
-                    Invitation.create(
-                        team_id=team['id'],
-                        email=email,
-                        key_id=key_info['id'],
-                        invite_id=None,
-                        status='success',
-                        is_temp=key_info['is_temp'],
-                        temp_expire_at=temp_expire_at
-                    )
-                    AccessKey.cancel(key_info['id'])
-                    Team.update_last_invite(team['id'])
-
-                    message = f"🎉 成功加入 {team['name']} 团队！（验证确认）\n\n📧 请立即查收邮箱 {email} 的邀请邮件并确认加入。"
-                    if key_info['is_temp'] and key_info['temp_hours'] > 0:
-                        message += f"\n\n⏰ 注意：这是一个 {key_info['temp_hours']} 小时临时邀请。"
+        return jsonify({
+            "success": True,
+            "message": message,
+            "team_name": team['name'],
+            "email": email,
+            "timing": budget.report()
+        })
 
-                    return jsonify({
-                        "success": True,
-                        "message": message,
-                        "team_name": team['name'],
-                        "email": email
-                    })
+    if not tried_teams and last_error is None:
+        # 候选Team的名额都已被并发请求预占
+        return jsonify({"success": False, "error": "所有 Team 名额已满，请联系管理员",
+                        "timing": budget.report()}), 400
 
-            # 确实失败，记录错误并尝试下一个Team
-            last_error = f"{team['name']}: {result.get('error', '未知错误')}"
-            continue
+    if budget.expired() and last_error != "请求超时":
+        last_error = f"请求超时（{last_error}）" if last_error else "请求超时"
 
     # 所有Team都试过了，仍然失败
     return jsonify({
         "success": False,
-        "error": f"尝试了 {len(tried_teams)} 个Team均失败\n最后错误: {last_error}\n尝试的Team: {', '.join(tried_teams)}"
+        "error": f"尝试了 {len(tried_teams)} 个Team均失败\n最后错误: {last_error}\n尝试的Team: {', '.join(tried_teams)}",
+        "timing": budget.report()
     }), 500
 
 
@@ -391,14 +392,11 @@ def admin_logout():
 @admin_required
 def get_teams():
     """获取所有 Teams (新逻辑: 显示成员数)"""
-    teams = Team.get_all()
+    teams = Team.get_all_with_capacity(include_expired=True)
 
-    # 为每个 Team 添加成员信息
+    # 为每个 Team 添加剩余名额
     for team in teams:
-        invitations = Invitation.get_by_team(team['id'])
-        team['invitations'] = invitations
-        team['member_count'] = len(set(inv['email'] for inv in invitations if inv['status'] == 'success'))
-        team['available_slots'] = max(0, 4 - team['member_count'])
+        team['available_slots'] = max(0, TEAM_SEATS - team['member_count'])
 
     return jsonify({"success": True, "teams": teams})
 
@@ -550,10 +548,13 @@ def export_team_token(team_id):
 @app.route('/api/admin/keys', methods=['GET'])
 @admin_required
 def get_all_keys():
-    """获取所有邀请码"""
+    """分页获取邀请码"""
     try:
-        keys = AccessKey.get_all()
-        return jsonify({"success": True, "keys": keys})
+        page = get_page_args('team_id', 'status', 'created_from', 'created_to')
+        keys = AccessKey.get_all(**page)
+        return jsonify({"success": True, "keys": keys, "next_cursor": next_page_cursor(keys, page['limit'])})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -615,9 +616,17 @@ def delete_invite_key(key_id):
 @app.route('/api/admin/invitations', methods=['GET'])
 @admin_required
 def get_invitations():
-    """获取所有邀请记录"""
-    invitations = Invitation.get_all()
-    return jsonify({"success": True, "invitations": invitations})
+    """分页获取邀请记录"""
+    page = get_page_args('team_id', 'status', 'email_prefix', 'created_from', 'created_to')
+    try:
+        invitations = Invitation.get_all(**page)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({
+        "success": True,
+        "invitations": invitations,
+        "next_cursor": next_page_cursor(invitations, page['limit'])
+    })
 
 
 @app.route('/api/admin/invitations/<int:invitation_id>/confirm', methods=['POST'])
@@ -631,22 +640,11 @@ def confirm_invitation(invitation_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-def get_team_members(access_token, account_id, team_id=None):
+def get_team_members(access_token, account_id, team_id=None, read_timeout=None, max_wait=None):
     """获取 Team 成员列表"""
-    url = f"https://chatgpt.com/backend-api/accounts/{account_id}/users"
-
-    headers = {
-        "accept": "*/*",
-        "accept-language": "zh-CN,zh;q=0.9",
-        "authorization": f"Bearer {access_token}",
-        "chatgpt-account-id": account_id,
-        "origin": "https://chatgpt.com",
-        "referer": "https://chatgpt.com/admin",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
-
     try:
-        response = cf_requests.get(url, headers=headers, impersonate="chrome110")
+        response = chatgpt_client.get_members(access_token, account_id,
+                                              read_timeout=read_timeout, max_wait=max_wait)
         if response.status_code == 200:
             data = response.json()
             # 成功时重置检查成员的错误计数
@@ -671,22 +669,11 @@ def get_team_members(access_token, account_id, team_id=None):
         return {"success": False, "error": str(e)}
 
 
-def get_pending_invites(access_token, account_id):
+def get_pending_invites(access_token, account_id, read_timeout=None, max_wait=None):
     """获取待处理的邀请列表"""
-    url = f"https://chatgpt.com/backend-api/accounts/{account_id}/invites"
-
-    headers = {
-        "accept": "*/*",
-        "accept-language": "zh-CN,zh;q=0.9",
-        "authorization": f"Bearer {access_token}",
-        "chatgpt-account-id": account_id,
-        "origin": "https://chatgpt.com",
-        "referer": "https://chatgpt.com/admin",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
-
     try:
-        response = cf_requests.get(url, headers=headers, impersonate="chrome110")
+        response = chatgpt_client.get_invites(access_token, account_id,
+                                              read_timeout=read_timeout, max_wait=max_wait)
         if response.status_code == 200:
             data = response.json()
             return {"success": True, "invites": data.get('items', [])}
@@ -698,20 +685,8 @@ def get_pending_invites(access_token, account_id):
 
 def kick_member(access_token, account_id, user_id):
     """踢出成员"""
-    url = f"https://chatgpt.com/backend-api/accounts/{account_id}/users/{user_id}"
-
-    headers = {
-        "accept": "*/*",
-        "accept-language": "zh-CN,zh;q=0.9",
-        "authorization": f"Bearer {access_token}",
-        "chatgpt-account-id": account_id,
-        "origin": "https://chatgpt.com",
-        "referer": "https://chatgpt.com/admin",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
-
     try:
-        response = cf_requests.delete(url, headers=headers, impersonate="chrome110")
+        response = chatgpt_client.kick(access_token, account_id, user_id)
         if response.status_code == 200:
             return {"success": True}
         else:
@@ -812,98 +787,104 @@ def admin_invite_member(team_id):
 
     # 检查 Team 人数是否已满 (检查邀请记录数)
     invited_emails = Invitation.get_all_emails_by_team(team_id)
-    if len(invited_emails) >= 4:
-        return jsonify({"success": False, "error": "该 Team 已达到人数上限 (4人)"}), 400
+    if len(invited_emails) >= TEAM_SEATS:
+        return jsonify({"success": False, "error": f"该 Team 已达到人数上限 ({TEAM_SEATS}人)"}), 400
 
     # 检查该邮箱是否已被邀请
     if email in invited_emails:
         return jsonify({"success": False, "error": "该邮箱已被邀请过"}), 400
 
-    # 执行邀请
-    result = invite_to_team(team['access_token'], team['account_id'], email, team_id)
+    # 预占名额（与进行中的用户加入请求共用名额判断，不会超额分配）
+    reservation_id = SeatReservation.reserve(team_id, email)
+    if not reservation_id:
+        return jsonify({"success": False, "error": "该 Team 名额已被进行中的邀请占满，请稍后再试"}), 400
 
-    if result['success']:
-        # 计算过期时间 - 使用UTC时间
-        temp_expire_at = None
-        if is_temp and temp_hours > 0:
-            now = datetime.utcnow()
-            temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    keep_reservation = False
+    try:
+        # 执行邀请
+        result = invite_to_team(team['access_token'], team['account_id'], email, team_id)
 
-        # 记录邀请
-        Invitation.create(
-            team_id=team_id,
-            email=email,
-            invite_id=result.get('invite_id'),
-            status='success',
-            is_temp=is_temp,
-            temp_expire_at=temp_expire_at
-        )
+        if result['success']:
+            # 计算过期时间 - 使用UTC时间
+            temp_expire_at = None
+            if is_temp and temp_hours > 0:
+                now = datetime.utcnow()
+                temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
 
-        # 更新team的最后邀请时间（实现轮询）
-        Team.update_last_invite(team_id)
+            # 记录邀请并释放预占（同一事务）
+            SeatReservation.fulfill(
+                reservation_id,
+                team_id=team_id,
+                email=email,
+                invite_id=result.get('invite_id'),
+                status='success',
+                is_temp=is_temp,
+                temp_expire_at=temp_expire_at
+            )
+            keep_reservation = True
 
-        return jsonify({
-            "success": True,
-            "message": f"已成功邀请 {email}",
-            "invite_id": result.get('invite_id')
-        })
-    else:
-        # 邀请 API 返回失败，验证是否实际成功
-        import time
-        time.sleep(2)  # 等待 API 同步
-        
-        # 1. 检查是否在 pending 列表中
-        pending_result = get_pending_invites(team['access_token'], team['account_id'])
-        if pending_result['success']:
-            pending_emails = [inv.get('email_address', '').lower() for inv in pending_result.get('invites', [])]
-            if email.lower() in pending_emails:
-                # 实际已成功（在 pending 列表中），先删除可能存在的failed记录
-                Invitation.delete_by_email(team_id, email)
-                
-                temp_expire_at = None
-                if is_temp and temp_hours > 0:
-                    now = datetime.utcnow()
-                    temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
-                
-                Invitation.create(
-                    team_id=team_id,
-                    email=email,
-                    status='success',
-                    is_temp=is_temp,
-                    temp_expire_at=temp_expire_at
-                )
-                Team.update_last_invite(team_id)
-                
-                return jsonify({
-                    "success": True,
-                    "message": f"已成功邀请 {email}（验证确认）",
-                    "verified": True
-                })
-        
-        # 2. 检查是否已在成员列表中
-        members_result = get_team_members(team['access_token'], team['account_id'], team_id)
-        if members_result['success']:
-            member_emails = [m.get('email', '').lower() for m in members_result.get('members', [])]
-            if email.lower() in member_emails:
-                # 已经是成员了，先删除可能存在的failed记录
-                Invitation.delete_by_email(team_id, email)
-                
-                Invitation.create(
-                    team_id=team_id,
-                    email=email,
-                    status='success',
-                    is_temp=is_temp,
-                    temp_expire_at=None
-                )
-                Team.update_last_invite(team_id)
-                
-                return jsonify({
-                    "success": True,
-                    "message": f"{email} 已是团队成员",
-                    "already_member": True
-                })
-        
-        # 3. 确实失败
+            # 更新team的最后邀请时间（实现轮询）
+            Team.update_last_invite(team_id)
+
+            return jsonify({
+                "success": True,
+                "message": f"已成功邀请 {email}",
+                "invite_id": result.get('invite_id')
+            })
+
+        # 邀请 API 返回失败，并发轮询 pending 列表和成员列表验证是否实际成功
+        verify_result = invite_verifier.verify(team, email)
+
+        # 1. 在 pending 列表中
+        if verify_result['source'] == 'pending':
+            # 实际已成功（在 pending 列表中），先删除可能存在的failed记录
+            Invitation.delete_by_email(team_id, email)
+
+            temp_expire_at = None
+            if is_temp and temp_hours > 0:
+                now = datetime.utcnow()
+                temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+            SeatReservation.fulfill(
+                reservation_id,
+                team_id=team_id,
+                email=email,
+                status='success',
+                is_temp=is_temp,
+                temp_expire_at=temp_expire_at
+            )
+            keep_reservation = True
+            Team.update_last_invite(team_id)
+
+            return jsonify({
+                "success": True,
+                "message": f"已成功邀请 {email}（验证确认）",
+                "verified": True
+            })
+
+        # 2. 已在成员列表中
+        if verify_result['source'] == 'member':
+            # 已经是成员了，先删除可能存在的failed记录
+            Invitation.delete_by_email(team_id, email)
+
+            SeatReservation.fulfill(
+                reservation_id,
+                team_id=team_id,
+                email=email,
+                status='success',
+                is_temp=is_temp,
+                temp_expire_at=None
+            )
+            keep_reservation = True
+            Team.update_last_invite(team_id)
+
+            return jsonify({
+                "success": True,
+                "message": f"{email} 已是团队成员",
+                "already_member": True
+            })
+
+        # 3. 确实失败（预占在下面释放）
         Invitation.create(
             team_id=team_id,
             email=email,
@@ -913,6 +894,9 @@ def admin_invite_member(team_id):
             "success": False,
             "error": f"邀请失败: {result.get('error', '未知错误')}"
         }), 500
+    finally:
+        if not keep_reservation:
+            SeatReservation.release(reservation_id)
 
 
 @app.route('/api/admin/teams/<int:team_id>/kick-by-email', methods=['POST'])
@@ -996,128 +980,122 @@ def admin_invite_auto():
         return jsonify({"success": False, "error": "请输入邮箱"}), 400
 
     # 方案2优化：智能选择Team + 限制重试次数
-    # 1. 获取所有Team（排除token过期的）
-    all_teams = Team.get_all()
-    all_teams = [t for t in all_teams if t.get('token_status') != 'expired']
-
-    if not all_teams:
-        return jsonify({"success": False, "error": "当前无可用 Team，请先添加 Team"}), 400
-
-    # 2. 只选择通过我们系统邀请的成员数 < 4 的Team
-    available_teams = []
-    for team in all_teams:
-        invited_count = Invitation.get_success_count_by_team(team['id'])
-        if invited_count < 4:
-            team['invited_count'] = invited_count
-            available_teams.append(team)
+    # 1. 从 Team 分配器按策略取候选Team（有空位且 token 未过期，与用户加入使用同一策略）
+    available_teams = team_allocator.candidates(JOIN_CANDIDATES)
 
     if not available_teams:
+        if not Team.get_all_with_capacity():
+            return jsonify({"success": False, "error": "当前无可用 Team，请先添加 Team"}), 400
         return jsonify({"success": False, "error": "所有 Team 名额已满，请先添加 Team"}), 400
 
-    # 3. 按最近邀请时间排序（最近成功的在前）
-    available_teams.sort(key=lambda t: t.get('last_invite_at') or '', reverse=True)
-
-    # 4. 最多尝试3个Team
+    # 2. 按顺序预占名额（与用户加入共用名额判断），最多尝试3个Team
     max_attempts = 3
     tried_teams = []
     last_error = None
 
-    for i, team in enumerate(available_teams):
-        if i >= max_attempts:
+    for team in available_teams:
+        if len(tried_teams) >= max_attempts:
             break
 
+        reservation_id = SeatReservation.reserve(team['id'], email)
+        if not reservation_id:
+            # 名额已被并发请求预占满，换下一个Team
+            continue
+
         tried_teams.append(team['name'])
+        keep_reservation = False
+        try:
+            # 检查实际成员数
+            members_result = get_team_members(team['access_token'], team['account_id'], team['id'])
+            if not members_result['success']:
+                last_error = f"无法获取{team['name']}成员列表"
+                continue
 
-        # 检查实际成员数
-        members_result = get_team_members(team['access_token'], team['account_id'], team['id'])
-        if not members_result['success']:
-            last_error = f"无法获取{team['name']}成员列表"
-            continue
+            members = members_result.get('members', [])
+            non_owner_members = [m for m in members if m.get('role') != 'account-owner']
 
-        members = members_result.get('members', [])
-        non_owner_members = [m for m in members if m.get('role') != 'account-owner']
+            # 实际成员数已满，跳过
+            if len(non_owner_members) >= TEAM_SEATS:
+                last_error = f"{team['name']}实际成员已满"
+                continue
 
-        # 实际成员数已满，跳过
-        if len(non_owner_members) >= 4:
-            last_error = f"{team['name']}实际成员已满"
-            continue
+            # 检查该邮箱是否已在此Team中
+            member_emails = [m.get('email', '').lower() for m in members]
+            if email.lower() in member_emails:
+                return jsonify({"success": False, "error": f"该邮箱已在 {team['name']} 团队中"}), 400
 
-        # 检查该邮箱是否已在此Team中
-        member_emails = [m.get('email', '').lower() for m in members]
-        if email.lower() in member_emails:
-            return jsonify({"success": False, "error": f"该邮箱已在 {team['name']} 团队中"}), 400
+            # 执行邀请
+            result = invite_to_team(team['access_token'], team['account_id'], email, team['id'])
 
-        # 执行邀请
-        result = invite_to_team(team['access_token'], team['account_id'], email, team['id'])
+            if result['success']:
+                # 邀请成功！计算过期时间
+                temp_expire_at = None
+                if is_temp and temp_hours > 0:
+                    now = datetime.utcnow()
+                    temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
 
-        if result['success']:
-            # 邀请成功！计算过期时间
-            temp_expire_at = None
-            if is_temp and temp_hours > 0:
-                now = datetime.utcnow()
-                temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
+                # 记录邀请并释放预占（同一事务）
+                SeatReservation.fulfill(
+                    reservation_id,
+                    team_id=team['id'],
+                    email=email,
+                    invite_id=result.get('invite_id'),
+                    status='success',
+                    is_temp=is_temp,
+                    temp_expire_at=temp_expire_at
+                )
+                keep_reservation = True
 
-            # 记录邀请
-            Invitation.create(
-                team_id=team['id'],
-                email=email,
-                invite_id=result.get('invite_id'),
-                status='success',
-                is_temp=is_temp,
-                temp_expire_at=temp_expire_at
-            )
+                # 更新team的最后邀请时间
+                Team.update_last_invite(team['id'])
 
-            # 更新team的最后邀请时间
-            Team.update_last_invite(team['id'])
+                message = f"已成功邀请 {email} 加入 {team['name']}"
+                if len(tried_teams) > 1:
+                    message += f"（尝试了 {len(tried_teams)} 个Team）"
 
-            message = f"已成功邀请 {email} 加入 {team['name']}"
-            if len(tried_teams) > 1:
-                message += f"（尝试了 {len(tried_teams)} 个Team）"
+                return jsonify({
+                    "success": True,
+                    "message": message,
+                    "team_name": team['name'],
+                    "invite_id": result.get('invite_id')
+                })
 
-            return jsonify({
-                "success": True,
-                "message": message,
-                "team_name": team['name'],
-                "invite_id": result.get('invite_id')
-            })
-        else:
-            # 邀请失败，验证是否实际成功（检查pending列表）
-            import time
-            time.sleep(1)  # 等待API同步
-
-            pending_result = get_pending_invites(team['access_token'], team['account_id'])
-            if pending_result['success']:
-                pending_emails = [inv.get('email_address', '').lower() for inv in pending_result.get('invites', [])]
-                if email.lower() in pending_emails:
-                    # 实际已成功（在pending列表中）
-                    temp_expire_at = None
-                    if is_temp and temp_hours > 0:
-                        now = datetime.utcnow()
-                        temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
-
-                    Invitation.create(
-                        team_id=team['id'],
-                        email=email,
-                        invite_id=None,
-                        status='success',
-                        is_temp=is_temp,
-                        temp_expire_at=temp_expire_at
-                    )
-                    Team.update_last_invite(team['id'])
+            # 邀请失败，并发轮询 pending 列表和成员列表验证是否实际成功
+            verify_result = invite_verifier.verify(team, email)
+            if verify_result['found']:
+                # 实际已成功（在pending列表或成员列表中）
+                temp_expire_at = None
+                if is_temp and temp_hours > 0:
+                    now = datetime.utcnow()
+                    temp_expire_at = (now + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
 
-                    message = f"已成功邀请 {email} 加入 {team['name']}（验证确认）"
-                    if len(tried_teams) > 1:
-                        message += f"（尝试了 {len(tried_teams)} 个Team）"
+                SeatReservation.fulfill(
+                    reservation_id,
+                    team_id=team['id'],
+                    email=email,
+                    invite_id=None,
+                    status='success',
+                    is_temp=is_temp,
+                    temp_expire_at=temp_expire_at
+                )
+                keep_reservation = True
+                Team.update_last_invite(team['id'])
 
-                    return jsonify({
-                        "success": True,
-                        "message": message,
-                        "team_name": team['name']
-                    })
+                message = f"已成功邀请 {email} 加入 {team['name']}（验证确认）"
+                if len(tried_teams) > 1:
+                    message += f"（尝试了 {len(tried_teams)} 个Team）"
 
-            # 确实失败，记录错误并尝试下一个Team
+                return jsonify({
+                    "success": True,
+                    "message": message,
+                    "team_name": team['name']
+                })
+
+            # 确实失败，记录错误并尝试下一个Team（预占在下面释放）
             last_error = f"{team['name']}: {result.get('error', '未知错误')}"
-            continue
+        finally:
+            if not keep_reservation:
+                SeatReservation.release(reservation_id)
 
     # 所有Team都试过了，仍然失败
     return jsonify({
@@ -1126,6 +1104,48 @@ def admin_invite_auto():
     }), 500
 
 
+@app.route('/api/admin/invite-bulk', methods=['POST'])
+@admin_required
+def admin_invite_bulk():
+    """管理员批量邀请(统一规划名额，每个Team一次请求)"""
+    data = request.json or {}
+    emails = parse_emails(data.get('emails'))
+    is_temp = data.get('is_temp', False)
+    temp_hours = data.get('temp_hours', 24) if is_temp else 0
+
+    if not emails:
+        return jsonify({"success": False, "error": "请输入邮箱"}), 400
+
+    try:
+        report = bulk_invite(emails, is_temp=is_temp, temp_hours=temp_hours)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({"success": True, **report})
+
+
+@app.route('/api/admin/kick-bulk', methods=['POST'])
+@admin_required
+def admin_kick_bulk():
+    """管理员批量按邮箱踢出成员(邀请记录定位Team，并发查询和踢出)"""
+    data = request.json or {}
+    emails = parse_emails(data.get('emails'))
+
+    if not emails:
+        return jsonify({"success": False, "error": "请输入邮箱"}), 400
+
+    try:
+        report = bulk_kick(emails)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+    return jsonify({"success": True, **report})
+
+
 @app.route('/api/admin/kick-by-email-auto', methods=['POST'])
 @admin_required
 def kick_member_by_email_auto():
@@ -1303,10 +1323,13 @@ def update_auto_kick_config():
 @app.route('/api/admin/auto-kick/logs', methods=['GET'])
 @admin_required
 def get_kick_logs():
-    """获取踢人日志"""
-    limit = request.args.get('limit', 100, type=int)
-    logs = KickLog.get_all(limit)
-    return jsonify({"success": True, "logs": logs})
+    """分页获取踢人日志"""
+    page = get_page_args('team_id', 'status', 'email_prefix', 'created_from', 'created_to')
+    try:
+        logs = KickLog.get_all(**page)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "logs": logs, "next_cursor": next_page_cursor(logs, page['limit'])})
 
 
 @app.route('/api/admin/auto-kick/check-now', methods=['POST'])
@@ -1457,19 +1480,42 @@ def get_xhs_status():
 @app.route('/api/admin/xhs/orders', methods=['GET'])
 @admin_required
 def get_xhs_orders():
-    """获取订单列表"""
+    """分页获取订单列表"""
     try:
-        limit = request.args.get('limit', 100, type=int)
-        offset = request.args.get('offset', 0, type=int)
-        
-        orders = Order.get_all(limit=limit, offset=offset)
+        page = get_page_args('status', 'email_prefix', 'created_from', 'created_to')
+        orders = Order.get_all(**page)
         stats = Order.get_stats()
         
         return jsonify({
             "success": True,
             "orders": orders,
+            "next_cursor": next_page_cursor(orders, page['limit']),
             "stats": stats
         })
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route('/api/admin/perf-stats', methods=['GET'])
+@admin_required
+def get_perf_stats():
+    """获取性能统计信息（数据库连接池、审计写入队列、Team 缓存、成员列表缓存、邀请验证、API 客户端、限流器、到期调度、Team 分配器、就绪池）"""
+    try:
+        stats = {
+            "db_pool": get_db_pool_stats(),
+            "audit_writer": get_audit_writer_stats(),
+            "team_cache": get_team_cache_stats(),
+            "member_cache": member_cache.get_stats(),
+            "invite_verify": invite_verifier.get_stats(),
+            "chatgpt_client": chatgpt_client.get_stats(),
+            "rate_limiter": rate_limiter.get_stats(),
+            "expiry_scheduler": expiry_scheduler.get_stats(),
+            "team_allocator": team_allocator.get_stats(),
+            "ready_pool": ready_pool.get_stats()
+        }
+        return jsonify({"success": True, "stats": stats})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -1491,6 +1537,12 @@ if __name__ == '__main__':
     config = AutoKickConfig.get()
     if config and config['enabled']:
         auto_kick_service.start()
+
+    # 临时邀请到期调度（独立于定时检测，到期即踢出）
+    expiry_scheduler.start()
+
+    # 后台核对候选 Team 的上游名额，加入请求优先使用已核对的 Team
+    ready_pool.start()
     
     # 检查小红书订单同步配置
     # 注意：已改为按需同步，不再启动定时任务
@@ -6,8 +6,10 @@ import random
 import threading
 import concurrent.futures
 from datetime import datetime
-from curl_cffi import requests as cf_requests
+from chatgpt_client import chatgpt_client
 from database import Team, Invitation, AutoKickConfig, KickLog
+from scan_engine import scan_engine, classify_members, UNINVITED_REASON
+from config import CHATGPT_SCAN_READ_TIMEOUT, AUTO_KICK_WORKERS, AUTO_KICK_ENGINE, AUTO_KICK_CONCURRENCY
 import pytz
 
 
@@ -16,6 +18,7 @@ class AutoKickService:
         self.running = False
         self.thread = None
         self.check_lock = threading.Lock()  # 防止并发检测
+        self.expiry_lock = threading.Lock()  # 到期调度器与定时检测处理过期邀请时互斥
         self.last_check_time = None  # 上次检测完成时间
         self.check_start_time = None  # 当前检测开始时间
     
@@ -105,32 +108,33 @@ class AutoKickService:
             print(f"🔍 开始并发检测 - {self.check_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"{'='*60}")
             
-            # 2. 检查过期的临时邀请（串行）
-            self._check_temp_invitations()
+            # 2. 检查过期的临时邀请（按 Team 分组并发），拿到的成员列表交给下面的检测复用
+            prefetched = self._check_temp_invitations()
             
             # 3. 并发检测所有 Team
             teams = Team.get_all()
-            stats = {
-                'total': len(teams),
-                'success': 0,
-                'failed': 0,
-                'skipped': 0
-            }
-            
-            print(f"\n📊 开始并发检测 {stats['total']} 个 Team（使用 3 个线程）...")
-            
-            # 4. 使用线程池并发执行
-            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                futures = []
-                
-                for team in teams:
-                    # 提交任务前添加随机延迟，避免触发限流
-                    time.sleep(random.uniform(0.3, 0.5))
-                    future = executor.submit(self._check_team_safe, team, stats)
-                    futures.append(future)
-                
-                # 等待所有任务完成
-                concurrent.futures.wait(futures)
+
+            if AUTO_KICK_ENGINE == 'async':
+                # 4. asyncio 引擎：获取成员和踢人在同一事件循环中流水线执行
+                print(f"\n📊 开始并发检测 {len(teams)} 个 Team（asyncio，并发 {AUTO_KICK_CONCURRENCY}）...")
+                stats = scan_engine.scan(teams, prefetched)
+            else:
+                stats = {
+                    'total': len(teams),
+                    'success': 0,
+                    'failed': 0,
+                    'skipped': 0
+                }
+
+                print(f"\n📊 开始并发检测 {stats['total']} 个 Team（使用 {AUTO_KICK_WORKERS} 个线程）...")
+
+                # 4. 使用线程池并发执行（请求节奏由 rate_limiter 按账号和全局控制）
+                with concurrent.futures.ThreadPoolExecutor(max_workers=AUTO_KICK_WORKERS) as executor:
+                    futures = [executor.submit(self._check_team_safe, team, stats, prefetched.get(team['id']))
+                               for team in teams]
+
+                    # 等待所有任务完成
+                    concurrent.futures.wait(futures)
             
             # 5. 输出统计信息
             self.last_check_time = datetime.now()
@@ -147,10 +151,10 @@ class AutoKickService:
             self.check_lock.release()
             self.check_start_time = None
     
-    def _check_team_safe(self, team, stats):
+    def _check_team_safe(self, team, stats, members=None):
         """线程安全的 Team 检测包装器"""
         try:
-            result = self._check_team(team)
+            result = self._check_team(team, members)
             if result == 'success':
                 stats['success'] += 1
             elif result == 'skipped':
@@ -162,37 +166,80 @@ class AutoKickService:
             stats['failed'] += 1
     
     def _check_temp_invitations(self):
-        """检查并踢出过期的临时邀请成员"""
+        """
+        检查并踢出过期的临时邀请成员（到期调度器之外的兜底，处理之前失败或遗漏的到期邀请）
+        返回 {team_id: 成员列表}（已去掉踢出成功的成员），供本轮检测直接复用
+        """
         print(f"\n🕐 检查过期的临时邀请...")
 
         expired_invitations = Invitation.get_temp_expired()
 
         if not expired_invitations:
             print(f"   ✅ 没有过期的临时邀请")
-            return
+            return {}
 
         print(f"   发现 {len(expired_invitations)} 个过期的临时邀请")
+        prefetched, _ = self._kick_expired(expired_invitations)
+        return prefetched
+
+    def kick_expired_invitations(self, invitation_ids):
+        """
+        到期调度器回调：踢出这些已到期的临时邀请成员（按数据库最新状态过滤已确认或已删除的邀请）
+        返回需要稍后重试的邀请 ID；自动检测未启用时不处理，留给启用后的检测兜底
+        """
+        config = AutoKickConfig.get()
+        if not config or not config['enabled']:
+            return []
+
+        expired_invitations = Invitation.get_temp_expired(invitation_ids)
+        if not expired_invitations:
+            return []
+
+        print(f"\n🕐 {len(expired_invitations)} 个临时邀请到期")
+        _, retry = self._kick_expired(expired_invitations)
+        return retry
 
+    def _kick_expired(self, expired_invitations):
+        """
+        按 Team 分组踢出过期邀请的成员：每个 Team 只获取一次成员列表，各 Team 的获取和踢人都并发执行
+        返回 ({team_id: 成员列表（已去掉踢出成功的成员）}, 获取成员列表或踢人失败的邀请 ID)
+        """
+        expired_by_team = {}
         for invitation in expired_invitations:
-            team = Team.get_by_id(invitation['team_id'])
-            if not team:
-                continue
+            expired_by_team.setdefault(invitation['team_id'], []).append(invitation)
+        teams = [team for team in map(Team.get_by_id, expired_by_team) if team]
 
-            email = invitation['email']
-            print(f"   ⏰ {email} 的临时邀请已过期,准备踢出")
+        # 调度器和定时检测可能同时处理到期邀请，串行执行避免重复踢人
+        with self.expiry_lock, concurrent.futures.ThreadPoolExecutor(max_workers=AUTO_KICK_WORKERS) as executor:
+            fetched = list(executor.map(
+                lambda team: self._get_team_members(team['access_token'], team['account_id']), teams))
 
-            # 获取成员列表,找到对应的 user_id
-            members = self._get_team_members(team['access_token'], team['account_id'])
-            if not members:
-                continue
+            retry = []
+            kicks = []  # (team, user_id, email, invitation_id)
+            for team, members in zip(teams, fetched):
+                if members is None:
+                    retry.extend(invitation['id'] for invitation in expired_by_team[team['id']])
+                    continue
+                by_email = {m.get('email', '').lower(): m for m in members}
+                for invitation in expired_by_team[team['id']]:
+                    member = by_email.get(invitation['email'].lower())
+                    if member:
+                        print(f"   ⏰ {invitation['email']} 的临时邀请已过期,准备踢出")
+                        kicks.append((team, member.get('id', ''), invitation['email'], invitation['id']))
 
-            member = next((m for m in members if m.get('email', '').lower() == email.lower()), None)
-            if member:
-                user_id = member.get('id', '')
-                self._kick_member(team, user_id, email, "临时邀请已过期")
+            kicked = list(executor.map(lambda kick: self._kick_member(*kick[:3], "临时邀请已过期"), kicks))
 
-    def _check_team(self, team):
-        """检查单个 Team"""
+        retry.extend(kick[3] for kick, success in zip(kicks, kicked) if not success)
+        # 踢出成功的成员从列表中去掉，避免检测时因邀请记录已删除被当作非法成员再踢一次
+        removed = {(team['id'], user_id) for (team, user_id, _, _), success in zip(kicks, kicked) if success}
+        prefetched = {
+            team['id']: [m for m in members if (team['id'], m.get('id', '')) not in removed]
+            for team, members in zip(teams, fetched) if members
+        }
+        return prefetched, retry
+
+    def _check_team(self, team, members=None):
+        """检查单个 Team，members 为本轮已获取的成员列表（没有则重新获取）"""
         team_id = team['id']
         team_name = team['name']
         account_id = team['account_id']
@@ -210,7 +257,8 @@ class AutoKickService:
         print(f"   已邀请邮箱数: {len(invited_emails)}")
 
         # 2. 获取当前 Team 成员
-        members = self._get_team_members(access_token, account_id)
+        if members is None:
+            members = self._get_team_members(access_token, account_id)
 
         if not members:
             print(f"   ⚠️  无法获取成员列表")
@@ -218,30 +266,22 @@ class AutoKickService:
 
         print(f"   当前成员数: {len(members)}")
 
-        # 3. 检查每个成员
+        # 3. 检查每个成员（判定规则与 asyncio 引擎共用）
         kicked_count = 0
         legal_count = 0
         owner_count = 0
-        
-        for member in members:
-            member_email = member.get('email', '').lower()
-            member_role = member.get('role', '')
-            member_user_id = member.get('id', '')
 
-            # 跳过所有者
-            if member_role == 'account-owner':
+        for result, member_email, member_user_id in classify_members(members, invited_emails):
+            if result == 'owner':
                 print(f"   ✅ {member_email} (所有者,跳过)")
                 owner_count += 1
-                continue
-
-            # 检查是否在邀请列表中
-            if member_email in invited_emails:
+            elif result == 'legal':
                 print(f"   ✅ {member_email} (合法成员)")
                 legal_count += 1
             else:
                 # 非法成员,踢出
                 print(f"   ⚠️  {member_email} (非法成员,准备踢出)")
-                self._kick_member(team, member_user_id, member_email, "未经邀请的成员")
+                self._kick_member(team, member_user_id, member_email, UNINVITED_REASON)
                 kicked_count += 1
         
         print(f"   📊 统计: 所有者={owner_count}, 合法成员={legal_count}, 踢出={kicked_count}")
@@ -249,31 +289,16 @@ class AutoKickService:
     
     def _get_team_members(self, access_token, account_id):
         """获取 Team 成员列表"""
-        url = f"https://chatgpt.com/backend-api/accounts/{account_id}/users"
-        
-        headers = {
-            "accept": "*/*",
-            "accept-language": "zh-CN,zh;q=0.9",
-            "authorization": f"Bearer {access_token}",
-            "chatgpt-account-id": account_id,
-            "content-type": "application/json",
-            "oai-device-id": "a9c9e9a0-f72d-4fbc-800e-2d0e1e3c3b54",
-            "oai-language": "zh-CN",
-            "origin": "https://chatgpt.com",
-            "referer": "https://chatgpt.com/admin",
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-        }
-        
         try:
-            # 降低超时时间从 10 秒到 5 秒
-            response = cf_requests.get(url, headers=headers, impersonate="chrome110", timeout=5)
+            # 扫描时使用较短的响应超时，慢的 Team 直接跳过
+            response = chatgpt_client.get_members(access_token, account_id, read_timeout=CHATGPT_SCAN_READ_TIMEOUT)
 
             if response.status_code == 200:
                 data = response.json()
                 # 使用 items 字段（API 实际返回的字段名）
                 return data.get('items', [])
             elif response.status_code == 429:
-                # 不再阻塞，直接跳过该 Team
+                # 限流器已按 Retry-After 暂停该账号并降低速率，本轮跳过该 Team
                 print(f"   ⚠️  请求过于频繁 (429)，跳过该 Team")
                 return None
             elif response.status_code == 401:
@@ -287,28 +312,13 @@ class AutoKickService:
             return None
     
     def _kick_member(self, team, user_id, email, reason):
-        """踢出成员"""
+        """踢出成员，返回是否成功"""
         team_id = team['id']
         account_id = team['account_id']
         access_token = team['access_token']
         
-        url = f"https://chatgpt.com/backend-api/accounts/{account_id}/users/{user_id}"
-        
-        headers = {
-            "accept": "*/*",
-            "accept-language": "zh-CN,zh;q=0.9",
-            "authorization": f"Bearer {access_token}",
-            "chatgpt-account-id": account_id,
-            "content-type": "application/json",
-            "oai-device-id": "a9c9e9a0-f72d-4fbc-800e-2d0e1e3c3b54",
-            "oai-language": "zh-CN",
-            "origin": "https://chatgpt.com",
-            "referer": "https://chatgpt.com/admin",
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-        }
-        
         try:
-            response = cf_requests.delete(url, headers=headers, impersonate="chrome110", timeout=10)
+            response = chatgpt_client.kick(access_token, account_id, user_id)
 
             if response.status_code == 200:
                 # 从invitations表中删除记录，释放位置
@@ -316,6 +326,7 @@ class AutoKickService:
 
                 print(f"   ✅ 成功踢出: {email}")
                 KickLog.create(team_id, user_id, email, reason, success=True)
+                return True
             else:
                 error_msg = f"状态码: {response.status_code}"
                 print(f"   ❌ 踢出失败: {email} - {error_msg}")
@@ -324,6 +335,7 @@ class AutoKickService:
             error_msg = str(e)
             print(f"   ❌ 踢出出错: {email} - {error_msg}")
             KickLog.create(team_id, user_id, email, reason, success=False, error_message=error_msg)
+        return False
     
     def is_checking(self):
         """检查是否有检测任务正在运行"""
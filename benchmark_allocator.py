@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+基准测试：Team 分配器（allocator.py）
+
+在内存中生成合成 Team 集群（随机成员数、最后邀请时间，约 10% token 已过期），不访问数据库。
+开始前先检查粘性分配的候选顺序和 least_loaded 在预占到期后的排序（不满足时直接退出）：
+
+1. 取候选耗时：分配器 candidate_ids() 对比「每次请求过滤并排序整个 Team 列表」
+   （原 get_free_teams + 已分配 Team 前置的做法，不含数据库查询本身），以及单个 Team 增量更新的耗时
+2. 策略对比：按批模拟并发加入请求，每批请求同时取候选并预占名额（预占后立即调整分配器，与 seats_changed 事件相同），
+   批次结束时按成功率转为成功邀请（重新读取该 Team，与 invitation_created 事件相同）或释放，并随机踢出部分成员。统计：
+   - 同批最多几个请求落在同一个 Team（同一账号的并发邀请数，越高越容易触发上游按账号限流）
+   - 平均每批涉及的 Team 数
+   - 结束时部分占用的 Team 数（名额碎片）
+   - 密钥已分配 Team 的命中率
+
+用法: python3 benchmark_allocator.py [--sizes 100,1000,10000] [--calls 2000] [--waves 50] [--concurrency 20]
+"""
+import argparse
+import random
+import time
+
+from allocator import TeamAllocator, STRATEGIES
+from config import TEAM_SEATS
+
+
+def make_fleet(size, rng):
+    now = int(time.time())
+    fleet = {}
+    for team_id in range(1, size + 1):
+        fleet[team_id] = {
+            'id': team_id,
+            'token_status': 'expired' if rng.random() < 0.1 else 'active',
+            'success_members': rng.randint(0, TEAM_SEATS),
+            'last_invite_ts': now - rng.randint(0, 86400) if rng.random() < 0.8 else None,
+            'reservations': [],
+        }
+    return fleet
+
+
+def make_allocator(fleet, strategy, sticky=True):
+    def loader(team_ids):
+        ids = fleet.keys() if team_ids is None else team_ids
+        return [dict(fleet[t], reservations=list(fleet[t]['reservations'])) for t in ids if t in fleet]
+
+    return TeamAllocator(strategy=strategy, sticky=sticky, seats=TEAM_SEATS, resync_interval=3600,
+                         loader=loader, lookup=lambda team_id: {'id': team_id})
+
+
+def check_sticky():
+    """密钥已分配的 Team 有空位时：启用粘性排在第一位，未启用时按策略正常排序，两种情况都不能丢失或重复"""
+    now = int(time.time())
+    fleet = {team_id: {'id': team_id, 'token_status': 'active', 'success_members': 1,
+                       'last_invite_ts': now - team_id * 60, 'reservations': []}
+             for team_id in range(1, 6)}
+    for sticky, expected in ((True, [3, 1, 2, 4, 5]), (False, [1, 2, 3, 4, 5])):
+        allocator = make_allocator(fleet, 'most_recent', sticky)
+        allocator.reload()
+        result = allocator.candidate_ids(10, preferred_team_id=3)
+        assert result == expected, f"sticky={sticky}: 期望 {expected}，实际 {result}"
+    print("✅ 粘性分配候选顺序检查通过")
+
+
+def check_reservation_expiry():
+    """least_loaded：预占到期后无需其他事件，Team 即按实际占用恢复排序"""
+    now = int(time.time())
+    fleet = {team_id: {'id': team_id, 'token_status': 'active', 'success_members': 1,
+                       'last_invite_ts': 0, 'reservations': []}
+             for team_id in (1, 2)}
+    allocator = make_allocator(fleet, 'least_loaded', sticky=False)
+    allocator.reload()
+    allocator.adjust_reservations(reserved=[(1, now + 1), (1, now + 1)])
+    result = allocator.candidate_ids(2, peek=True)
+    assert result == [2, 1], f"预占未到期: 期望 [2, 1]，实际 {result}"
+    time.sleep(now + 1.1 - time.time())
+    result = allocator.candidate_ids(2, peek=True)
+    assert result == [1, 2], f"预占到期后: 期望 [1, 2]，实际 {result}"
+    print("✅ 预占到期后的排序检查通过")
+
+
+def sort_per_request(fleet, limit, preferred_team_id=None):
+    """原做法：每次请求过滤整个列表并按最后邀请时间排序"""
+    free = [t for t in fleet.values()
+            if t['token_status'] != 'expired' and t['success_members'] + len(t['reservations']) < TEAM_SEATS]
+    free.sort(key=lambda t: (t['last_invite_ts'] or 0, t['id']), reverse=True)
+    if preferred_team_id is not None:
+        preferred = [t for t in free if t['id'] == preferred_team_id]
+        free = preferred + [t for t in free if t['id'] != preferred_team_id]
+    return [t['id'] for t in free[:limit]]
+
+
+def bench_latency(sizes, calls, limit):
+    print(f"\n📊 取 {limit} 个候选的平均耗时（µs）\n")
+    print(f"{'Team 数':>8}{'排序整个列表':>14}{'分配器':>10}{'增量更新':>10}")
+    for size in sizes:
+        rng = random.Random(size)
+        fleet = make_fleet(size, rng)
+        preferred = [rng.randint(1, size) for _ in range(calls)]
+
+        start = time.perf_counter()
+        for team_id in preferred:
+            sort_per_request(fleet, limit, team_id)
+        baseline = (time.perf_counter() - start) / calls * 1e6
+
+        allocator = make_allocator(fleet, 'most_recent')
+        allocator.reload()
+        start = time.perf_counter()
+        for team_id in preferred:
+            allocator.candidate_ids(limit, team_id)
+        allocated = (time.perf_counter() - start) / calls * 1e6
+
+        start = time.perf_counter()
+        for team_id in preferred:
+            allocator.touch(team_id)
+        touched = (time.perf_counter() - start) / calls * 1e6
+
+        print(f"{size:>8}{baseline:>14.1f}{allocated:>10.1f}{touched:>10.1f}")
+
+
+def simulate(size, strategy, sticky, waves, concurrency, limit, seed):
+    rng = random.Random(seed)
+    fleet = make_fleet(size, rng)
+    allocator = make_allocator(fleet, strategy, sticky)
+    allocator.reload()
+
+    hottest, touched, sticky_total, sticky_hits, failed = [], [], 0, 0, 0
+    for _ in range(waves):
+        now = int(time.time())
+        reserved = []
+        per_team = {}
+        for _ in range(concurrency):
+            preferred = rng.randint(1, size) if rng.random() < 0.3 else None
+            chosen = None
+            for team_id in allocator.candidate_ids(limit, preferred):
+                team = fleet[team_id]
+                if team['success_members'] + len(team['reservations']) < TEAM_SEATS:
+                    chosen = team_id
+                    break
+            if chosen is None:
+                failed += 1
+                continue
+            if preferred is not None:
+                sticky_total += 1
+                sticky_hits += chosen == preferred
+            fleet[chosen]['reservations'].append(now + 60)
+            allocator.adjust_reservations(reserved=[(chosen, now + 60)])
+            reserved.append(chosen)
+            per_team[chosen] = per_team.get(chosen, 0) + 1
+
+        hottest.append(max(per_team.values(), default=0))
+        touched.append(len(per_team))
+
+        # 批次结束：预占转为成功邀请（90%）或释放，再随机踢出少量成员腾出名额
+        for team_id in reserved:
+            team = fleet[team_id]
+            expires_at = team['reservations'].pop()
+            if rng.random() < 0.9:
+                team['success_members'] += 1
+                team['last_invite_ts'] = now
+                allocator.refresh([team_id])
+                allocator.touch(team_id, now)
+            allocator.adjust_reservations(released=[(team_id, expires_at)])
+        for team_id in rng.sample(sorted(fleet), min(size, max(1, concurrency // 4))):
+            if fleet[team_id]['success_members'] and rng.random() < 0.5:
+                fleet[team_id]['success_members'] -= 1
+                allocator.refresh([team_id])
+
+    partial = sum(1 for t in fleet.values()
+                  if t['token_status'] != 'expired' and 0 < t['success_members'] < TEAM_SEATS)
+    return {
+        'hottest': max(hottest),
+        'hottest_avg': sum(hottest) / len(hottest),
+        'touched': sum(touched) / len(touched),
+        'partial': partial,
+        'sticky': sticky_hits / sticky_total if sticky_total else 0,
+        'failed': failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Team 分配器基准测试')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Team 数量，逗号分隔')
+    parser.add_argument('--calls', type=int, default=2000, help='取候选耗时测试的调用次数')
+    parser.add_argument('--limit', type=int, default=10, help='每次取的候选数')
+    parser.add_argument('--waves', type=int, default=50, help='策略对比模拟的批次数')
+    parser.add_argument('--concurrency', type=int, default=20, help='每批并发的加入请求数')
+    parser.add_argument('--fleet', type=int, default=1000, help='策略对比使用的 Team 数量')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    check_sticky()
+    check_reservation_expiry()
+    bench_latency([int(s) for s in args.sizes.split(',')], args.calls, args.limit)
+
+    print(f"\n📊 策略对比（{args.fleet} 个 Team，{args.waves} 批 × {args.concurrency} 个并发请求，30% 密钥已分配 Team）\n")
+    print(f"{'策略':<22}{'单Team最多并发':>14}{'平均':>8}{'每批Team数':>12}{'部分占用Team':>14}"
+          f"{'粘性命中':>10}{'无可用':>8}")
+    for strategy in STRATEGIES:
+        for sticky in (True, False):
+            result = simulate(args.fleet, strategy, sticky, args.waves, args.concurrency, args.limit, args.seed)
+            label = f"{strategy}{' + sticky' if sticky else ''}"
+            print(f"{label:<22}{result['hottest']:>14}{result['hottest_avg']:>8.1f}{result['touched']:>12.1f}"
+                  f"{result['partial']:>14}{result['sticky']:>10.0%}{result['failed']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+基准测试：数据库连接池 vs 每次新建连接
+
+模拟并发 /api/join 的数据库访问序列，同时运行自动踢人线程池（3 个线程）的写入，
+对比旧版 get_db（每次 sqlite3.connect + 回滚日志）与连接池（线程本地持久连接 + WAL）
+的耗时、连接建立次数和锁错误数。
+
+用法: python3 benchmark_db_pool.py [--joins 400] [--threads 16] [--teams 100]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import database
+from database import init_db, Team, AccessKey, Invitation, KickLog
+
+
+class LegacyStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+
+
+def make_legacy_get_db(stats):
+    """重建旧版 get_db：每次调用都新建连接"""
+    @contextmanager
+    def legacy_get_db():
+        conn = sqlite3.connect(database.DATABASE_PATH)
+        with stats.lock:
+            stats.connections += 1
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    return legacy_get_db
+
+
+def seed(team_count, key_count):
+    """创建 Team 和邀请码"""
+    for i in range(team_count):
+        Team.create(f"bench-team-{i}", f"acct-{i}", f"token-{i}", f"org-{i}", f"owner{i}@example.com")
+    return [AccessKey.create()['key_code'] for _ in range(key_count)]
+
+
+def join_workload(key_code, index, errors):
+    """与 join_team 相同的数据库访问序列"""
+    try:
+        key_info = AccessKey.get_by_code(key_code)
+        available = [t for t in Team.get_all_with_capacity() if t['member_count'] < 4]
+        if not available or not key_info:
+            return
+        team = available[index % len(available)]
+        Invitation.create(team_id=team['id'], email=f"user{index}@example.com",
+                          key_id=key_info['id'], status='success')
+        AccessKey.cancel(key_info['id'])
+        Team.update_last_invite(team['id'])
+    except sqlite3.OperationalError as e:
+        errors.append(str(e))
+
+
+def kick_workload(stop_event, errors, team_count):
+    """与自动踢人工作线程相同的数据库访问序列"""
+    i = 0
+    while not stop_event.is_set():
+        team_id = (i % team_count) + 1
+        try:
+            Invitation.get_all_emails_by_team(team_id)
+            KickLog.create(team_id, f"user-{i}", f"intruder{i}@example.com", "benchmark", success=True)
+            Invitation.delete_by_email(team_id, f"intruder{i}@example.com")
+        except sqlite3.OperationalError as e:
+            errors.append(str(e))
+        i += 1
+
+
+def run(mode, args):
+    workdir = tempfile.mkdtemp(prefix='bench_db_')
+    database.DATABASE_PATH = os.path.join(workdir, 'bench.db')
+    database.close_db_connections()
+
+    legacy_stats = LegacyStats()
+    original_get_db = database.get_db
+    if mode == 'legacy':
+        database.get_db = make_legacy_get_db(legacy_stats)
+
+    try:
+        init_db()
+        keys = seed(args.teams, args.joins)
+        before = database.get_db_pool_stats()
+
+        errors = []
+        stop_event = threading.Event()
+        kickers = [threading.Thread(target=kick_workload, args=(stop_event, errors, args.teams))
+                   for _ in range(3)]
+        for t in kickers:
+            t.start()
+
+        start = time.perf_counter()
+        next_index = [0]
+        index_lock = threading.Lock()
+
+        def join_worker():
+            while True:
+                with index_lock:
+                    index = next_index[0]
+                    next_index[0] += 1
+                if index >= len(keys):
+                    return
+                join_workload(keys[index], index, errors)
+
+        joiners = [threading.Thread(target=join_worker) for _ in range(args.threads)]
+        for t in joiners:
+            t.start()
+        for t in joiners:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        stop_event.set()
+        for t in kickers:
+            t.join()
+
+        after = database.get_db_pool_stats()
+        if mode == 'legacy':
+            connections = legacy_stats.connections
+        else:
+            connections = after['opened'] - before['opened']
+
+        return {
+            'mode': mode,
+            'elapsed': elapsed,
+            'joins_per_sec': args.joins / elapsed,
+            'connections': connections,
+            'lock_errors': len(errors),
+            'lock_retries': after['lock_retries'] - before['lock_retries']
+        }
+    finally:
+        database.get_db = original_get_db
+        database.close_db_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库连接池基准测试')
+    parser.add_argument('--joins', type=int, default=400, help='模拟的加入请求数')
+    parser.add_argument('--threads', type=int, default=16, help='并发请求线程数')
+    parser.add_argument('--teams', type=int, default=100, help='Team 数量')
+    args = parser.parse_args()
+
+    print(f"📊 {args.joins} 次加入请求, {args.threads} 个并发线程, {args.teams} 个 Team, 3 个踢人线程\n")
+    results = [run('legacy', args), run('pooled', args)]
+
+    print(f"{'模式':<8}{'耗时(s)':>10}{'请求/秒':>10}{'新建连接':>10}{'锁错误':>8}{'锁重试':>8}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['elapsed']:>10.2f}{r['joins_per_sec']:>10.1f}"
+              f"{r['connections']:>10}{r['lock_errors']:>8}{r['lock_retries']:>8}")
+
+
+if __name__ == '__main__':
+    main()
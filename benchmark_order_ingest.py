@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+基准测试：订单批量入库
+
+对比旧版 Order.batch_create（逐个调用 Order.create，每单多次查询和独立事务）
+与集合写入版本（单事务 + executemany + INSERT ... RETURNING）导入大量订单号的耗时。
+同时测试重复导入（全部跳过）的情况。
+
+用法: python3 benchmark_order_ingest.py [--count 100000]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import database
+from database import init_db, get_db, Order
+
+
+def legacy_create(order_number):
+    """旧版 Order.create 的数据库访问序列"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT o.*, ak.key_code
+            FROM orders o
+            LEFT JOIN access_keys ak ON o.key_id = ak.id
+            WHERE o.order_number = ?
+        ''', (order_number,))
+        if cursor.fetchone():
+            return None
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT id FROM orders WHERE order_number = ?', (order_number,))
+            if cursor.fetchone():
+                return None
+            cursor.execute('SELECT id FROM access_keys WHERE key_code = ?', (order_number,))
+            existing_key = cursor.fetchone()
+            if existing_key:
+                key_id = existing_key[0]
+            else:
+                cursor.execute('''
+                    INSERT INTO access_keys (key_code, is_temp, temp_hours)
+                    VALUES (?, 0, 0)
+                ''', (order_number,))
+                key_id = cursor.lastrowid
+            cursor.execute('INSERT INTO orders (order_number, key_id) VALUES (?, ?)', (order_number, key_id))
+            return {'id': cursor.lastrowid, 'key_id': key_id, 'key_code': order_number}
+        except sqlite3.IntegrityError:
+            return None
+
+
+def legacy_batch_create(order_numbers):
+    created = []
+    skipped = 0
+    for order_number in order_numbers:
+        result = legacy_create(order_number)
+        if result:
+            created.append(result)
+        else:
+            skipped += 1
+    return {'created': len(created), 'skipped': skipped, 'orders': created}
+
+
+def run(label, batch_create, order_numbers):
+    workdir = tempfile.mkdtemp(prefix='bench_orders_')
+    database.DATABASE_PATH = os.path.join(workdir, 'orders.db')
+    database.close_db_connections()
+    try:
+        init_db()
+
+        start = time.perf_counter()
+        first = batch_create(order_numbers)
+        first_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        second = batch_create(order_numbers)
+        second_elapsed = time.perf_counter() - start
+
+        with get_db() as conn:
+            orders = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+            keys = conn.execute('SELECT COUNT(*) FROM access_keys').fetchone()[0]
+
+        return {
+            'label': label,
+            'first': first_elapsed,
+            'second': second_elapsed,
+            'created': first['created'],
+            'skipped': first['skipped'] + second['skipped'],
+            'orders': orders,
+            'keys': keys
+        }
+    finally:
+        database.close_db_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订单批量入库基准测试')
+    parser.add_argument('--count', type=int, default=100000, help='订单号数量')
+    args = parser.parse_args()
+
+    # 约 1% 的批内重复，模拟滚动加载时重复提取的订单
+    order_numbers = [f"P{700000000000 + i}" for i in range(args.count)]
+    order_numbers += order_numbers[:args.count // 100]
+
+    print(f"📊 导入 {len(order_numbers)} 个订单号（含 {args.count // 100} 个批内重复），随后重复导入一次\n")
+    results = [
+        run('legacy', legacy_batch_create, order_numbers),
+        run('set-based', Order.batch_create, order_numbers),
+    ]
+
+    print(f"{'版本':<12}{'首次导入(s)':>12}{'重复导入(s)':>12}{'新建':>10}{'跳过':>10}{'订单数':>10}{'密钥数':>10}")
+    for r in results:
+        print(f"{r['label']:<12}{r['first']:>12.2f}{r['second']:>12.2f}{r['created']:>10}"
+              f"{r['skipped']:>10}{r['orders']:>10}{r['keys']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+基准测试：slotted 记录 vs dict(row) 副本
+
+在临时数据库中写入大量邀请记录，对比旧版 Invitation.get_all（SELECT i.* + dict(row)）
+与记录类型版本（列投影 + InvitationRecord）的耗时、分配峰值和结果常驻内存。
+
+用法: python3 benchmark_records.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import database
+from database import init_db, get_db, Invitation
+
+
+def legacy_get_all():
+    """旧版 Invitation.get_all：全部列 + 每行一个 dict 副本"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT i.*, t.name as team_name
+            FROM invitations i
+            JOIN teams t ON i.team_id = t.id
+            ORDER BY i.created_at DESC
+        ''')
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def records_get_all():
+    return Invitation.get_all()
+
+
+def seed(rows):
+    with get_db() as conn:
+        conn.executemany(
+            'INSERT INTO teams (name, account_id, access_token, organization_id, email) VALUES (?, ?, ?, ?, ?)',
+            [(f"team-{i}", f"acct-{i}", 'x' * 1200, f"org-{i}", f"owner{i}@example.com") for i in range(100)]
+        )
+        conn.executemany(
+            'INSERT INTO invitations (team_id, email, user_id, invite_id, status, is_temp, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(1 + i % 100, f"user{i}@example.com", f"user-{i:024d}", f"invite-{i:032d}",
+              'success' if i % 4 else 'pending', i % 7 == 0,
+              f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00")
+             for i in range(rows)]
+        )
+
+
+def measure(func, repeat):
+    """返回 (最短耗时, 分配峰值, 结果常驻内存, 行数)"""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, retained, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='记录类型内存/分配基准测试')
+    parser.add_argument('--rows', type=int, default=100000, help='邀请记录数量')
+    parser.add_argument('--repeat', type=int, default=3, help='计时重复次数（取最短）')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_records_')
+    database.DATABASE_PATH = os.path.join(workdir, 'records.db')
+    database.close_db_connections()
+    try:
+        init_db()
+        seed(args.rows)
+
+        print(f"\n📊 Invitation.get_all() 读取 {args.rows} 条邀请记录\n")
+        print(f"{'版本':<10}{'耗时(s)':>10}{'分配峰值(MB)':>14}{'常驻内存(MB)':>14}{'每行(B)':>10}")
+        for label, func in (('dict(row)', legacy_get_all), ('records', records_get_all)):
+            elapsed, peak, retained, count = measure(func, args.repeat)
+            print(f"{label:<10}{elapsed:>10.3f}{peak / 2 ** 20:>14.1f}{retained / 2 ** 20:>14.1f}"
+                  f"{retained / max(count, 1):>10.0f}")
+    finally:
+        database.close_db_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+基准测试：自动踢人全量扫描（线程池 vs asyncio 引擎）
+
+启动本地模拟 backend-api（mock_backend.py，每个请求固定延迟），
+为 50 / 500 / 5000 个 Team 写入测试数据：每个 Team 有所有者、若干已邀请成员和一个未经邀请的成员。
+分别用线程池引擎和 asyncio 引擎执行一次完整的 _check_and_kick，对比耗时，
+并核对两者的踢人结果（kick_logs 中的 team_id + 邮箱）完全一致。
+
+默认不限流，测的是引擎本身的吞吐；--global-rps 可以打开限流器观察限流下的扫描时间。
+
+用法: python3 benchmark_scan.py [--sizes 50,500,5000] [--latency 0.02] [--members 5] [--concurrency 32]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import database
+import auto_kick_service as service_module
+from database import init_db, get_db, flush_audit_writes
+from chatgpt_client import ChatGPTClient
+from rate_limiter import RateLimiter
+from scan_engine import AsyncScanEngine
+from mock_backend import start_mock_backend
+
+
+def seed_backend(state, team_count, members):
+    """模拟接口中账号 acct-N 的成员为所有者、User{N}.{i}（已邀请）和 stranger{N}（需踢出）"""
+    state.reset()
+    for n in range(1, team_count + 1):
+        state.add_account(f"acct-{n}", [f"User{n}.{i}@Example.com" for i in range(members)]
+                          + [f"stranger{n}@example.com"])
+
+
+def seed(team_count, members):
+    with get_db() as conn:
+        conn.executemany(
+            'INSERT INTO teams (id, name, account_id, access_token, organization_id, email) VALUES (?, ?, ?, ?, ?, ?)',
+            [(n, f"team-{n}", f"acct-{n}", 'token', f"org-{n}", f"owner{n}@example.com")
+             for n in range(1, team_count + 1)]
+        )
+        conn.executemany(
+            'INSERT INTO invitations (team_id, email, status) VALUES (?, ?, ?)',
+            [(n, f"user{n}.{i}@example.com", 'success')
+             for n in range(1, team_count + 1) for i in range(members)]
+        )
+    database._team_cache.invalidate()
+
+
+def kick_results():
+    flush_audit_writes()
+    with get_db() as conn:
+        rows = conn.execute('SELECT team_id, email, success FROM kick_logs').fetchall()
+        conn.execute('DELETE FROM kick_logs')
+    return sorted(tuple(row) for row in rows)
+
+
+def run_sweep(engine):
+    service_module.AUTO_KICK_ENGINE = engine
+    service = service_module.AutoKickService()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        service._check_and_kick()
+    return time.perf_counter() - start, kick_results()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='自动踢人扫描基准测试')
+    parser.add_argument('--sizes', default='50,500,5000', help='Team 数量，逗号分隔')
+    parser.add_argument('--latency', type=float, default=0.02, help='模拟接口每个请求的延迟 (秒)')
+    parser.add_argument('--members', type=int, default=5, help='每个 Team 的已邀请成员数')
+    parser.add_argument('--concurrency', type=int, default=32, help='asyncio 引擎并发数')
+    parser.add_argument('--workers', type=int, default=8, help='线程池引擎线程数')
+    parser.add_argument('--global-rps', type=float, default=0, help='全局限流速率，0 表示不限流')
+    args = parser.parse_args()
+
+    server = start_mock_backend(latency=str(args.latency))
+    base_url = server.base_url
+
+    unlimited = 1e9
+    global_rps = args.global_rps or unlimited
+    service_module.AUTO_KICK_WORKERS = args.workers
+
+    print(f"📊 模拟接口延迟 {args.latency * 1000:.0f}ms，每个 Team {args.members + 2} 个成员（1 个需踢出），"
+          f"线程数 {args.workers}，asyncio 并发 {args.concurrency}，"
+          f"全局限流 {'无' if global_rps == unlimited else f'{global_rps:g} rps'}\n")
+    print(f"{'Team 数':>8}{'线程池(s)':>12}{'asyncio(s)':>12}{'加速':>8}{'踢出':>8}{'结果一致':>10}")
+
+    try:
+        for size in (int(s) for s in args.sizes.split(',')):
+            workdir = tempfile.mkdtemp(prefix='bench_scan_')
+            database.DATABASE_PATH = os.path.join(workdir, 'scan.db')
+            database.close_db_connections()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    init_db()
+                seed(size, args.members)
+
+                # 每次扫描使用新的限流器，互不影响
+                service_module.chatgpt_client = ChatGPTClient(
+                    base_url=base_url, pool_size=args.workers,
+                    limiter=RateLimiter(account_rps=unlimited, account_burst=unlimited,
+                                        global_rps=global_rps, global_burst=min(global_rps, 40))
+                )
+                seed_backend(server.state, size, args.members)
+                thread_time, thread_kicks = run_sweep('thread')
+                service_module.chatgpt_client.close()
+
+                service_module.scan_engine = AsyncScanEngine(
+                    base_url=base_url, concurrency=args.concurrency,
+                    limiter=RateLimiter(account_rps=unlimited, account_burst=unlimited,
+                                        global_rps=global_rps, global_burst=min(global_rps, 40))
+                )
+                seed_backend(server.state, size, args.members)
+                async_time, async_kicks = run_sweep('async')
+
+                same = thread_kicks == async_kicks
+                print(f"{size:>8}{thread_time:>12.2f}{async_time:>12.2f}{thread_time / async_time:>7.1f}x"
+                      f"{len(async_kicks):>8}{'✅' if same else '❌':>10}")
+            finally:
+                database.close_db_connections()
+                shutil.rmtree(workdir, ignore_errors=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
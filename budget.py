@@ -0,0 +1,71 @@
+"""
+请求时间预算
+
+一个用户请求（如 join_team）内的所有上游调用共享一个截止时间：
+每一步的超时取「该步骤上限」和「剩余预算」中较小的一个，
+同时记录每一步的耗时，响应中返回 timing 说明时间花在了哪里。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Budget:
+    """端到端时间预算（线程安全，可在并发的子任务中记录步骤）"""
+
+    # 剩余预算不足时，单步超时的下限（秒），避免传给 curl 的超时为 0
+    MIN_STEP_TIMEOUT = 0.5
+
+    def __init__(self, total):
+        self.total = total
+        self.start = time.monotonic()
+        self.deadline = self.start + total
+        self._lock = threading.Lock()
+        self._steps = []
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def timeout(self, step_limit):
+        """本步骤可用的超时：步骤上限与剩余预算取小"""
+        return max(self.MIN_STEP_TIMEOUT, min(step_limit, self.remaining()))
+
+    def record(self, name, started, **info):
+        """记录一个从 started (time.monotonic()) 开始、到现在结束的步骤"""
+        now = time.monotonic()
+        step = {
+            'step': name,
+            'start_ms': round((started - self.start) * 1000, 1),
+            'ms': round((now - started) * 1000, 1)
+        }
+        step.update(info)
+        with self._lock:
+            self._steps.append(step)
+
+    @contextmanager
+    def step(self, name, **info):
+        """计时一个步骤：with budget.step('invite', team='xxx'): ..."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, started, **info)
+
+    def report(self):
+        """生成 timing 报告：总耗时、预算、各步骤及耗时最多的步骤"""
+        with self._lock:
+            steps = sorted(self._steps, key=lambda s: s['start_ms'])
+        report = {
+            'total_ms': round(self.elapsed() * 1000, 1),
+            'budget_ms': round(self.total * 1000),
+            'steps': steps
+        }
+        if steps:
+            report['slowest_step'] = max(steps, key=lambda s: s['ms'])['step']
+        return report
@@ -0,0 +1,314 @@
+"""
+管理后台批量操作
+
+批量邀请：一次提交多个邮箱，先按 Team 名额统一规划分配，并为每个分到 Team 的邮箱预占一个名额，
+每个 Team 只发一次邀请请求（email_addresses 带上分到该 Team 的所有邮箱），
+上游返回失败或缺少的邮箱并发验证，所有邀请记录在一个事务中写入并删除对应预占，
+邀请失败的邮箱释放预占，最后返回每个邮箱的结果。
+
+批量踢人：先用邀请记录把邮箱映射到候选 Team，并发获取这些 Team 的成员列表（走成员缓存）定位成员，
+找不到的邮箱再分批并发扫描其余 Team；踢人请求并发发送，邀请记录在一个事务中删除，踢人日志批量写入。
+"""
+import concurrent.futures
+import re
+from datetime import datetime, timedelta
+
+from chatgpt_client import chatgpt_client
+from database import Team, Invitation, SeatReservation, KickLog
+from invite_verify import invite_verifier
+from config import BULK_MAX_EMAILS, BULK_WORKERS, TEAM_SEATS
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix='bulk-ops')
+
+
+def parse_emails(value):
+    """接受邮箱列表或以换行 / 逗号 / 空白分隔的字符串"""
+    if isinstance(value, str):
+        value = re.split(r'[\s,;]+', value)
+    return [email.strip() for email in (value or []) if isinstance(email, str) and email.strip()]
+
+
+def _normalize(emails, results):
+    """去重（不区分大小写）并校验格式，无效和重复的邮箱直接写入结果"""
+    unique = []
+    seen = set()
+    for email in emails:
+        key = email.lower()
+        if not EMAIL_PATTERN.match(email):
+            results.append({'email': email, 'status': 'invalid', 'error': '邮箱格式不正确'})
+        elif key in seen:
+            results.append({'email': email, 'status': 'duplicate', 'error': '重复的邮箱'})
+        else:
+            seen.add(key)
+            unique.append(email)
+    return unique
+
+
+def _fetch_members(team):
+    """获取成员列表，失败返回 None"""
+    try:
+        response = chatgpt_client.get_members(team['access_token'], team['account_id'])
+        if response.status_code == 200:
+            return response.json().get('items', [])
+        if response.status_code == 401:
+            Team.increment_member_check_error(team['id'])
+    except Exception:
+        pass
+    return None
+
+
+def _send_invites(team, emails):
+    """向一个 Team 发送一次邀请请求，返回 ({小写邮箱: invite_id}, 错误信息)"""
+    try:
+        response = chatgpt_client.invite(team['access_token'], team['account_id'], emails)
+    except Exception as e:
+        return {}, str(e)
+
+    if response.status_code in (200, 201):
+        Team.reset_token_error(team['id'])
+        invites = response.json().get('account_invites', [])
+        return {inv.get('email_address', '').lower(): inv.get('id') for inv in invites}, None
+    if response.status_code == 401:
+        Team.increment_token_error(team['id'])
+    return {}, f"状态码 {response.status_code}: {response.text[:200]}"
+
+
+def _plan(emails, results):
+    """
+    按 Team 顺序规划名额：每次取一批数据库名额足够容纳剩余邮箱的 Team，
+    并发获取成员列表确认实际人数，并为分到的每个邮箱预占名额（与进行中的加入请求互不超额），
+    返回 [(team, [email, ...], [预占 ID, ...])]
+    """
+    teams = Team.get_free_teams()
+    queue = list(emails)
+    plan = []
+    index = 0
+
+    while queue and index < len(teams):
+        batch = []
+        seats = 0
+        while index < len(teams) and seats < len(queue):
+            team = teams[index]
+            index += 1
+            batch.append(team)
+            seats += max(0, TEAM_SEATS - team['member_count'] - team['reserved_count'])
+
+        fetched = [(team, members) for team, members in zip(batch, _executor.map(_fetch_members, batch))
+                   if members is not None]
+
+        # 先排除已是这一批 Team 成员的邮箱，再分配名额
+        for team, members in fetched:
+            member_emails = {m.get('email', '').lower() for m in members}
+            for email in [e for e in queue if e.lower() in member_emails]:
+                queue.remove(email)
+                results.append({'email': email, 'status': 'already_member', 'team_name': team['name'],
+                                'error': f"该邮箱已在 {team['name']} 团队中"})
+
+        for team, members in fetched:
+            non_owner = sum(1 for m in members if m.get('role') != 'account-owner')
+            # 数据库名额需扣除进行中的加入请求预占的名额
+            free = min(TEAM_SEATS - team['member_count'] - team['reserved_count'], TEAM_SEATS - non_owner)
+            if free > 0 and queue:
+                # 规划后名额可能已被并发请求预占，只保留预占成功的邮箱，其余留给后面的 Team
+                reservation_ids = SeatReservation.reserve_many(team['id'], queue[:free])
+                if reservation_ids:
+                    plan.append((team, queue[:len(reservation_ids)], reservation_ids))
+                    queue = queue[len(reservation_ids):]
+
+    for email in queue:
+        results.append({'email': email, 'status': 'no_seat', 'error': '没有足够的空余名额'})
+    return plan
+
+
+def bulk_invite(emails, is_temp=False, temp_hours=0):
+    """
+    批量邀请邮箱，返回 {'summary': {...}, 'results': [每个邮箱的结果], 'teams': [每个 Team 的请求情况]}
+    结果状态：invited / verified（上游报错但验证已生效）/ failed / already_invited / already_member /
+    no_seat / invalid / duplicate
+    """
+    if len(emails) > BULK_MAX_EMAILS:
+        raise ValueError(f"单次最多处理 {BULK_MAX_EMAILS} 个邮箱")
+    input_order = {}
+    for position, email in enumerate(emails):
+        input_order.setdefault(email.lower(), position)
+
+    results = []
+    emails = _normalize(emails, results)
+
+    # 已有成功邀请记录的邮箱不再占用名额
+    existing = Invitation.get_teams_by_emails(emails)
+    for email in [e for e in emails if e.lower() in existing]:
+        results.append({'email': email, 'status': 'already_invited', 'error': '该邮箱已有邀请记录'})
+    emails = [e for e in emails if e.lower() not in existing]
+
+    plan = _plan(emails, results) if emails else []
+    reservations = {(team['id'], email.lower()): reservation_id
+                    for team, team_emails, reservation_ids in plan
+                    for email, reservation_id in zip(team_emails, reservation_ids)}
+
+    invited = []  # (team, email, invite_id, status)
+    team_reports = []
+    try:
+        # 每个 Team 一次请求，并发发送
+        sent = list(zip(plan, _executor.map(lambda entry: _send_invites(entry[0], entry[1]), plan)))
+
+        to_verify = []  # (team, [email, ...], error)
+        for (team, team_emails, _), (invite_ids, error) in sent:
+            team_reports.append({'team_name': team['name'], 'emails': team_emails, 'error': error})
+            missing = []
+            for email in team_emails:
+                if email.lower() in invite_ids:
+                    invited.append((team, email, invite_ids[email.lower()], 'invited'))
+                else:
+                    missing.append(email)
+            if missing:
+                to_verify.append((team, missing, error or '上游未返回该邮箱的邀请'))
+
+        # 上游报错或未返回的邮箱按 Team 并发验证是否实际生效（同一 Team 的邮箱共用查询）
+        verified = _executor.map(lambda item: invite_verifier.verify_many(item[0], item[1]), to_verify)
+        for (team, missing, error), verify_results in zip(to_verify, verified):
+            for email in missing:
+                if verify_results[email.lower()]['found']:
+                    invited.append((team, email, None, 'verified'))
+                else:
+                    results.append({'email': email, 'status': 'failed', 'team_name': team['name'], 'error': error})
+
+        temp_expire_at = None
+        if is_temp and temp_hours > 0:
+            temp_expire_at = (datetime.utcnow() + timedelta(hours=temp_hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+        # 写入邀请记录并删除对应预占（同一事务）
+        fulfilled = [(team['id'], email.lower()) for team, email, _, _ in invited]
+        SeatReservation.fulfill_many([reservations[key] for key in fulfilled], [{
+            'team_id': team['id'],
+            'email': email,
+            'invite_id': invite_id,
+            'status': 'success',
+            'is_temp': is_temp,
+            'temp_expire_at': temp_expire_at
+        } for team, email, invite_id, _ in invited])
+        for key in fulfilled:
+            del reservations[key]
+        for team_id in {team['id'] for team, _, _, _ in invited}:
+            Team.update_last_invite(team_id)
+    finally:
+        # 邀请失败（或处理中出现异常）的邮箱释放预占
+        SeatReservation.release_many(list(reservations.values()))
+
+    for team, email, invite_id, status in invited:
+        results.append({'email': email, 'status': status, 'team_name': team['name'], 'invite_id': invite_id})
+
+    # 按提交顺序返回
+    results.sort(key=lambda item: (input_order[item['email'].lower()], item['status'] == 'duplicate'))
+
+    summary = {'total': len(results), 'invited': len(invited)}
+    summary['failed'] = sum(1 for r in results if r['status'] == 'failed')
+    summary['skipped'] = summary['total'] - summary['invited'] - summary['failed']
+    return {'summary': summary, 'results': results, 'teams': team_reports}
+
+
+def _kick(team, user_id):
+    """踢出一个成员，返回错误信息（成功为 None）"""
+    try:
+        response = chatgpt_client.kick(team['access_token'], team['account_id'], user_id)
+    except Exception as e:
+        return str(e)
+    if response.status_code == 200:
+        return None
+    return f"状态码 {response.status_code}: {response.text[:200]}"
+
+
+def _locate(teams, waiting, found):
+    """并发获取 teams 的成员列表，把 waiting 中出现的邮箱记入 found {小写邮箱: (team, member)}"""
+    for team, members in zip(teams, _executor.map(_fetch_members, teams)):
+        for member in members or []:
+            email = member.get('email', '').lower()
+            if email in waiting and email not in found:
+                found[email] = (team, member)
+    waiting.difference_update(found)
+
+
+def bulk_kick(emails, reason='管理员批量踢出'):
+    """
+    批量按邮箱踢出成员，返回 {'summary': {...}, 'results': [每个邮箱的结果]}
+    结果状态：kicked / failed / owner（团队所有者不踢）/ released（未找到成员，已删除邀请记录释放位置）/
+    not_found / invalid / duplicate
+    """
+    if len(emails) > BULK_MAX_EMAILS:
+        raise ValueError(f"单次最多处理 {BULK_MAX_EMAILS} 个邮箱")
+    input_order = {}
+    for position, email in enumerate(emails):
+        input_order.setdefault(email.lower(), position)
+
+    results = []
+    emails = _normalize(emails, results)
+    waiting = {email.lower() for email in emails}
+    found = {}
+
+    teams = Team.get_all()
+    teams_by_id = {team['id']: team for team in teams}
+
+    # 先查邀请记录指向的候选 Team（最近邀请的优先）
+    candidate_ids = []
+    for team_ids in Invitation.get_teams_by_emails(waiting).values():
+        candidate_ids.extend(team_id for team_id in team_ids if team_id not in candidate_ids)
+    candidates = [teams_by_id[team_id] for team_id in candidate_ids if team_id in teams_by_id]
+    if waiting and candidates:
+        _locate(candidates, waiting, found)
+
+    # 兜底：分批并发扫描其余 Team（处理手动添加的成员），全部找到即停止
+    others = [team for team in teams if team['id'] not in set(candidate_ids)]
+    for start in range(0, len(others), BULK_WORKERS * 2):
+        if not waiting:
+            break
+        _locate(others[start:start + BULK_WORKERS * 2], waiting, found)
+
+    kicks = []  # (email, team, user_id)
+    for email in emails:
+        if email.lower() not in found:
+            continue
+        team, member = found[email.lower()]
+        if member.get('role') == 'account-owner':
+            results.append({'email': email, 'status': 'owner', 'team_name': team['name'],
+                            'error': '不能踢出团队所有者'})
+        else:
+            kicks.append((email, team, member.get('user_id') or member.get('id')))
+
+    errors = list(_executor.map(lambda kick: _kick(kick[1], kick[2]), kicks))
+
+    kicked_pairs = []
+    logs = []
+    for (email, team, user_id), error in zip(kicks, errors):
+        logs.append({'team_id': team['id'], 'user_id': user_id, 'email': email, 'reason': reason,
+                     'success': error is None, 'error_message': error})
+        if error is None:
+            kicked_pairs.append((team['id'], email))
+            results.append({'email': email, 'status': 'kicked', 'team_name': team['name']})
+        else:
+            results.append({'email': email, 'status': 'failed', 'team_name': team['name'], 'error': error})
+
+    # 从邀请记录中删除，释放位置
+    Invitation.delete_many(kicked_pairs)
+    KickLog.create_many(logs)
+
+    # 未找到成员的邮箱：可能已经离开或拒绝邀请，删除邀请记录释放位置
+    missing = [email for email in emails if email.lower() in waiting]
+    released = Invitation.delete_by_emails(missing) if missing else {}
+    for email in missing:
+        team_ids = released.get(email.lower())
+        if team_ids:
+            results.append({'email': email, 'status': 'released',
+                            'team_names': [teams_by_id[t]['name'] for t in team_ids if t in teams_by_id]})
+        else:
+            results.append({'email': email, 'status': 'not_found', 'error': '未找到该邮箱的成员或邀请记录'})
+
+    # 按提交顺序返回
+    results.sort(key=lambda item: (input_order[item['email'].lower()], item['status'] == 'duplicate'))
+
+    summary = {'total': len(results), 'kicked': len(kicked_pairs)}
+    summary['failed'] = sum(1 for r in results if r['status'] == 'failed')
+    summary['released'] = sum(1 for r in results if r['status'] == 'released')
+    summary['skipped'] = summary['total'] - summary['kicked'] - summary['failed'] - summary['released']
+    return {'summary': summary, 'results': results}
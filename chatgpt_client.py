@@ -0,0 +1,200 @@
+"""
+ChatGPT backend-api 客户端
+
+所有对 backend-api 的调用（邀请、成员列表、待处理邀请、踢人）都经过这里：
+维护一组 keep-alive 的 curl_cffi Session（TLS 指纹模拟，HTTPS 下优先 HTTP/2），
+请求时借出一个独占使用、用完归还，连接和 TLS 会话在请求之间复用（Cookie 在归还时清空，不在账号之间传递）；
+统一请求头和超时设置。
+每个请求发送前经过 rate_limiter 按账号和全局限流，响应状态（429 / Retry-After）回馈给限流器。
+成员列表经过 member_cache 缓存并合并并发请求，邀请和踢人后使对应账号的缓存失效。
+"""
+import atexit
+import queue
+import threading
+import time
+
+from curl_cffi import requests as cf_requests
+from curl_cffi.const import CurlHttpVersion
+
+import events
+from rate_limiter import rate_limiter
+from member_cache import member_cache
+from config import (CHATGPT_API_BASE, CHATGPT_IMPERSONATE, CHATGPT_POOL_SIZE,
+                    CHATGPT_CONNECT_TIMEOUT, CHATGPT_READ_TIMEOUT)
+
+DEVICE_ID = "a9c9e9a0-f72d-4fbc-800e-2d0e1e3c3b54"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+
+
+def build_headers(access_token, account_id):
+    """backend-api 通用请求头"""
+    return {
+        "accept": "*/*",
+        "accept-language": "zh-CN,zh;q=0.9",
+        "authorization": f"Bearer {access_token}",
+        "chatgpt-account-id": account_id,
+        "oai-device-id": DEVICE_ID,
+        "oai-language": "zh-CN",
+        "origin": "https://chatgpt.com",
+        "referer": "https://chatgpt.com/admin",
+        "user-agent": USER_AGENT
+    }
+
+
+class ChatGPTClient:
+    """带 Session 池的 backend-api 客户端（线程安全）"""
+
+    def __init__(self, base_url=CHATGPT_API_BASE, pool_size=CHATGPT_POOL_SIZE,
+                 connect_timeout=CHATGPT_CONNECT_TIMEOUT, read_timeout=CHATGPT_READ_TIMEOUT, limiter=rate_limiter):
+        self.base_url = base_url.rstrip('/')
+        self.limiter = limiter
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # LIFO：优先复用最近用过、连接仍然存活的 Session
+        self._sessions = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'errors': 0,
+            'sessions_created': 0,
+            'sessions_reused': 0,
+            'sessions_discarded': 0,
+            'total_ms': 0.0,
+            'status': {}
+        }
+        atexit.register(self.close)
+
+    def _new_session(self):
+        session = cf_requests.Session(
+            impersonate=CHATGPT_IMPERSONATE,
+            http_version=CurlHttpVersion.V2TLS,
+            use_thread_local_curl=False
+        )
+        with self._lock:
+            self._stats['sessions_created'] += 1
+        return session
+
+    def _acquire(self):
+        try:
+            session = self._sessions.get_nowait()
+        except queue.Empty:
+            return self._new_session()
+        with self._lock:
+            self._stats['sessions_reused'] += 1
+        return session
+
+    def _release(self, session, broken=False):
+        if not broken:
+            # 池中的 Session 由所有账号共用：清空上游为某个账号设置的 Cookie，只复用连接
+            # （curl_cffi 每次请求前按 session.cookies 重建 curl 的 Cookie 列表）
+            session.cookies.clear()
+            try:
+                self._sessions.put_nowait(session)
+                return
+            except queue.Full:
+                pass
+        with self._lock:
+            self._stats['sessions_discarded'] += 1
+        try:
+            session.close()
+        except Exception:
+            pass
+
+    def request(self, method, path, access_token, account_id, json=None, read_timeout=None, max_wait=None):
+        """
+        发送请求并返回 curl_cffi Response，网络错误时抛出异常（与 cf_requests 一致）
+        path 为 backend-api 下的相对路径，如 /accounts/{account_id}/users
+        限流排队超过 max_wait 秒（默认 RATE_LIMIT_MAX_WAIT）时抛出 RateLimited
+        """
+        self.limiter.acquire(account_id, max_wait)
+        timeout = (self.connect_timeout, read_timeout or self.read_timeout)
+        session = self._acquire()
+        start = time.perf_counter()
+        broken = False
+        try:
+            response = session.request(method, self.base_url + path,
+                                       headers=build_headers(access_token, account_id),
+                                       json=json, timeout=timeout)
+        except Exception:
+            # 出错的连接状态不可信，不再放回池中
+            broken = True
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._stats['requests'] += 1
+                self._stats['total_ms'] += elapsed_ms
+            self._release(session, broken)
+
+        self.limiter.on_response(account_id, response.status_code, response.headers.get('Retry-After'))
+        with self._lock:
+            status = self._stats['status']
+            status[response.status_code] = status.get(response.status_code, 0) + 1
+        return response
+
+    def invite(self, access_token, account_id, emails, read_timeout=None, max_wait=None):
+        """发送邀请，emails 为邮箱列表"""
+        payload = {
+            "email_addresses": list(emails),
+            "role": "standard-user",
+            "resend_emails": False
+        }
+        try:
+            return self.request('POST', f"/accounts/{account_id}/invites", access_token, account_id,
+                                json=payload, read_timeout=read_timeout, max_wait=max_wait)
+        finally:
+            # 邀请失败也可能实际已生效，一律失效
+            member_cache.invalidate(account_id)
+
+    def get_members(self, access_token, account_id, read_timeout=None, use_cache=True, max_wait=None):
+        """获取成员列表（默认经过成员缓存，use_cache=False 时强制请求）"""
+        def fetch():
+            return self.request('GET', f"/accounts/{account_id}/users", access_token, account_id,
+                                read_timeout=read_timeout, max_wait=max_wait)
+
+        if not use_cache:
+            response = fetch()
+            if response.status_code == 200:
+                member_cache.put(account_id, response)
+            return response
+        return member_cache.get(account_id, fetch, cacheable=lambda response: response.status_code == 200)
+
+    def get_invites(self, access_token, account_id, read_timeout=None, max_wait=None):
+        """获取待处理的邀请列表"""
+        return self.request('GET', f"/accounts/{account_id}/invites", access_token, account_id,
+                            read_timeout=read_timeout, max_wait=max_wait)
+
+    def kick(self, access_token, account_id, user_id, read_timeout=None):
+        """踢出成员"""
+        try:
+            return self.request('DELETE', f"/accounts/{account_id}/users/{user_id}", access_token, account_id,
+                                read_timeout=read_timeout)
+        finally:
+            member_cache.invalidate(account_id)
+            events.emit('member_kicked', account_id=account_id, user_id=user_id)
+
+    def close(self):
+        """关闭池中所有 Session"""
+        while True:
+            try:
+                session = self._sessions.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                session.close()
+            except Exception:
+                pass
+
+    def get_stats(self):
+        """获取客户端统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['status'] = dict(self._stats['status'])
+        stats['idle_sessions'] = self._sessions.qsize()
+        stats['avg_ms'] = round(stats.pop('total_ms') / stats['requests'], 1) if stats['requests'] else 0
+        return stats
+
+
+chatgpt_client = ChatGPTClient()
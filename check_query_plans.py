@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+查询计划回归检查
+
+在临时数据库中生成大规模模拟数据，逐个调用 database.py 中所有模型方法，
+记录实际执行的每条 SQL，并用 EXPLAIN QUERY PLAN 检查是否出现全表扫描 (SCAN 表 且未使用索引)。
+出现全表扫描或有模型方法未被覆盖时返回非 0 退出码，可放在部署前执行。
+
+用法: python3 check_query_plans.py [--scale 1.0]
+"""
+import argparse
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+import database
+from database import (init_db, get_db, Team, AccessKey, Invitation, SeatReservation, AutoKickConfig, KickLog,
+                      LoginAttempt, Order, XHSConfig)
+
+MODEL_CLASSES = [Team, AccessKey, Invitation, SeatReservation, AutoKickConfig, KickLog, LoginAttempt, Order, XHSConfig]
+
+# 只有一行的配置表，全表扫描无代价
+SMALL_TABLES = {'auto_kick_config', 'xhs_config', 'schema_version'}
+
+# 有意读取整张表的语句（维护命令），按 SQL 片段匹配
+ALLOWED_FULL_SCANS = [
+    # Team.rebuild_member_counters / verify_member_counters: 按设计需要遍历所有 Team
+    'FROM teams t\n        LEFT JOIN invitations i ON i.team_id = t.id',
+    'SELECT id, name, success_members, pending_members, temp_members FROM teams',
+    # Team.get_allocation_state(): 分配器整体加载所有 Team（不带 team_ids 时）
+    'AS reservations\n                FROM teams\n                ORDER BY id',
+]
+
+SKIP_PREFIXES = ('PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE',
+                 'CREATE', 'DROP', 'ALTER', 'ANALYZE', 'EXPLAIN')
+
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+def seed(scale):
+    """直接写入大规模模拟数据"""
+    team_count = int(500 * scale)
+    key_count = int(100000 * scale)
+    invitation_count = int(100000 * scale)
+    kick_log_count = int(100000 * scale)
+    order_count = int(50000 * scale)
+    login_count = int(50000 * scale)
+    rnd = random.Random(42)
+
+    def ts(i):
+        return f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:{i % 60:02d}"
+
+    with get_db() as conn:
+        conn.executemany(
+            'INSERT INTO teams (name, account_id, access_token, organization_id, email, last_invite_at, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(f"team-{i}", f"acct-{i}", f"token-{i}", f"org-{i}", f"owner{i}@example.com",
+              ts(i) if i % 3 else None, ts(i)) for i in range(team_count)]
+        )
+        conn.executemany(
+            'INSERT INTO access_keys (team_id, key_code, is_temp, temp_hours, is_cancelled, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(rnd.randint(1, team_count) if i % 2 else None, f"key-{i}", i % 5 == 0, 24 if i % 5 == 0 else 0,
+              i % 3 == 0, ts(i)) for i in range(key_count)]
+        )
+        conn.executemany(
+            'INSERT INTO invitations (team_id, key_id, email, user_id, status, is_temp, temp_expire_at, '
+            'temp_expire_ts, is_confirmed, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(rnd.randint(1, team_count), rnd.randint(1, key_count), f"User{i}@Example.com", f"user-{i}",
+              rnd.choice(['success', 'success', 'pending', 'failed']), i % 7 == 0,
+              ts(i) if i % 7 == 0 else None, database._to_epoch(ts(i)) if i % 7 == 0 else None,
+              i % 14 == 0, ts(i)) for i in range(invitation_count)]
+        )
+        conn.executemany(
+            'INSERT INTO kick_logs (team_id, user_id, email, reason, success, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            [(rnd.randint(1, team_count), f"user-{i}", f"kicked{i}@example.com", "seed", True, ts(i))
+             for i in range(kick_log_count)]
+        )
+        conn.executemany(
+            'INSERT INTO orders (order_number, key_id, is_used, extracted_at, created_at) VALUES (?, ?, ?, ?, ?)',
+            [(f"P{10 ** 11 + i}", rnd.randint(1, key_count), i % 2, ts(i), ts(i)) for i in range(order_count)]
+        )
+        conn.executemany(
+            'INSERT INTO login_attempts (ip_address, username, success, created_at) VALUES (?, ?, ?, ?)',
+            [(f"10.0.{i % 256}.{i % 200}", 'admin', i % 4 == 0, ts(i)) for i in range(login_count)]
+        )
+
+
+def exercise_models():
+    """调用所有模型方法，返回已调用的 (类名, 方法名) 集合"""
+    called = set()
+
+    def call(cls, method, *args, **kwargs):
+        called.add((cls.__name__, method))
+        return getattr(cls, method)(*args, **kwargs)
+
+    team_id = call(Team, 'create', 'qp-team', 'qp-acct', 'qp-token', 'qp-org', 'qp-owner@example.com')
+    call(Team, 'get_all')
+    call(Team, 'get_by_id', team_id)
+    call(Team, 'get_by_organization_id', 'org-7')
+    call(Team, 'update_token', team_id, 'qp-token-2')
+    call(Team, 'update_team_info', team_id, name='qp-team-2', email='qp-owner2@example.com')
+    call(Team, 'get_all_with_capacity')
+    call(Team, 'get_free_teams', 3)
+    call(Team, 'get_available_teams')
+    call(Team, 'get_allocation_state')
+    call(Team, 'get_allocation_state', [team_id, 7])
+    call(Team, 'update_last_invite', team_id)
+    call(Team, 'increment_token_error', team_id)
+    call(Team, 'reset_token_error', team_id)
+    call(Team, 'increment_member_check_error', team_id)
+    call(Team, 'increment_member_check_error', team_id)
+    call(Team, 'reset_member_check_error', team_id)
+    call(Team, 'get_token_status', team_id)
+    call(Team, 'get_expired_teams')
+    call(Team, 'verify_member_counters')
+    call(Team, 'rebuild_member_counters')
+
+    key = call(AccessKey, 'create', is_temp=True, temp_hours=24)
+    call(AccessKey, 'assign_team', key['id'], team_id)
+    call(AccessKey, 'get_all')
+    page = AccessKey.get_all(limit=50)
+    AccessKey.get_all(limit=50, cursor=database.next_page_cursor(page, 50), status='temp')
+    AccessKey.get_all(limit=50, team_id=team_id, created_from='2025-01-01', created_to='2025-06-30')
+    call(AccessKey, 'get_by_code', key['key_code'])
+    call(AccessKey, 'cancel', key['id'])
+
+    invitation_id = call(Invitation, 'create', team_id, 'QP@Example.com', key_id=key['id'], status='success',
+                         is_temp=True, temp_expire_at='2025-01-01 00:00:00')
+    call(Invitation, 'get_by_team', team_id)
+    call(Invitation, 'get_all')
+    page = Invitation.get_all(limit=50)
+    Invitation.get_all(limit=50, cursor=database.next_page_cursor(page, 50), team_id=7)
+    Invitation.get_all(limit=50, status='failed', created_from='2025-03-01', created_to='2025-03-31')
+    Invitation.get_all(limit=50, email_prefix='user12')
+    call(Invitation, 'get_all_emails_by_team', team_id)
+    call(Invitation, 'get_emails_grouped_by_team')
+    call(Invitation, 'get_success_count_by_team', team_id)
+    call(Invitation, 'get_temp_expired')
+    call(Invitation, 'get_temp_expired', [invitation_id])
+    call(Invitation, 'get_temp_schedule')
+    call(Invitation, 'update_user_id', invitation_id, 'qp-user')
+    call(Invitation, 'get_by_user_id', team_id, 'qp-user')
+    call(Invitation, 'get_teams_by_email', 'qp@example.com')
+    call(Invitation, 'get_teams_by_emails', ['qp@example.com', 'user12@example.com'])
+    call(Invitation, 'create_many', [{'team_id': team_id, 'email': 'bulk@example.com', 'status': 'success'}])
+    reservation_id = call(SeatReservation, 'reserve', team_id, 'seat@example.com', key['id'])
+    call(SeatReservation, 'release', reservation_id)
+    reservation_id = SeatReservation.reserve(team_id, 'seat@example.com')
+    call(SeatReservation, 'fulfill', reservation_id, team_id, 'seat@example.com', status='success')
+    reservation_ids = call(SeatReservation, 'reserve_many', team_id, ['seat1@example.com', 'seat2@example.com'])
+    call(SeatReservation, 'release_many', reservation_ids)
+    reservation_ids = SeatReservation.reserve_many(team_id, ['seat1@example.com'])
+    call(SeatReservation, 'fulfill_many', reservation_ids,
+         [{'team_id': team_id, 'email': 'seat1@example.com', 'status': 'success'}])
+    call(Invitation, 'delete_many', [(team_id, 'bulk@example.com')])
+    call(Invitation, 'delete_by_emails', ['gone@example.com'])
+    call(Invitation, 'confirm', invitation_id)
+    call(Invitation, 'delete_by_email', team_id, 'qp@example.com')
+
+    call(AutoKickConfig, 'get')
+    call(AutoKickConfig, 'update', enabled=True, check_interval_min=90)
+
+    call(KickLog, 'create', team_id, 'qp-user', 'qp@example.com', 'query plan check')
+    call(KickLog, 'create_many', [{'team_id': team_id, 'user_id': 'qp-user', 'email': 'qp@example.com', 'reason': 'query plan check'}])
+    call(KickLog, 'get_all', 100)
+    page = KickLog.get_all(50)
+    KickLog.get_all(50, cursor=database.next_page_cursor(page, 50), team_id=7)
+    KickLog.get_all(50, status='failed', created_to='2025-06-30 12:00:00')
+    KickLog.get_all(50, email_prefix='kicked12')
+    call(KickLog, 'get_by_team', team_id)
+
+    call(LoginAttempt, 'record', '10.1.1.1', 'admin', False)
+    call(LoginAttempt, 'get_recent_failures', '10.1.1.1')
+    call(LoginAttempt, 'is_blocked', '10.1.1.1')
+    call(LoginAttempt, 'cleanup_old_records')
+
+    call(Order, 'create', 'P999000000001')
+    call(Order, 'get_by_number', 'P999000000001')
+    call(Order, 'get_all', limit=100)
+    page = Order.get_all(limit=50)
+    Order.get_all(limit=50, cursor=database.next_page_cursor(page, 50), status='unused')
+    Order.get_all(limit=50, email_prefix='buyer', created_from='2025-01-01')
+    call(Order, 'get_unused_count')
+    call(Order, 'mark_as_used', 'P999000000001', 'buyer@example.com')
+    call(Order, 'get_stats')
+    call(Order, 'batch_create', ['P999000000002', 'P999000000003', 'P999000000001'])
+
+    call(XHSConfig, 'get')
+    call(XHSConfig, 'update', cookies='{"a": "b"}', sync_enabled=True)
+    call(XHSConfig, 'update_last_sync')
+    call(XHSConfig, 'record_error', 'query plan check')
+    call(XHSConfig, 'get_cookies_dict')
+
+    # 删除类操作放在最后
+    call(AccessKey, 'delete', key['id'])
+    call(Team, 'delete_expired_teams')
+    call(Team, 'delete', team_id)
+    return called
+
+
+def find_full_scans(conn, sql):
+    """返回该语句查询计划中的全表扫描"""
+    rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    scans = []
+    for row in rows:
+        match = FULL_SCAN_RE.match(row[3])
+        if match and match.group(1) not in SMALL_TABLES:
+            scans.append(row[3])
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检查 database.py 中所有语句的查询计划')
+    parser.add_argument('--scale', type=float, default=1.0, help='模拟数据规模倍数')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='query_plans_')
+    database.DATABASE_PATH = os.path.join(workdir, 'plans.db')
+    database.close_db_connections()
+
+    try:
+        print("🔧 初始化数据库并生成模拟数据...")
+        init_db()
+        seed(args.scale)
+
+        # 审计写入改为同步，保证所有语句都在当前线程执行并被记录
+        database.set_audit_writer_sync(True)
+        statements = []
+        with get_db() as conn:
+            conn.set_trace_callback(statements.append)
+        called = exercise_models()
+        with get_db() as conn:
+            conn.set_trace_callback(None)
+
+        # 所有公开模型方法都必须被覆盖，新增方法时请同步添加到 exercise_models()
+        missing = []
+        for cls in MODEL_CLASSES:
+            for name, value in vars(cls).items():
+                if isinstance(value, staticmethod) and not name.startswith('_') \
+                        and (cls.__name__, name) not in called:
+                    missing.append(f"{cls.__name__}.{name}")
+
+        unique = []
+        seen = set()
+        for sql in statements:
+            text = sql.strip()
+            if not text or text.upper().startswith(SKIP_PREFIXES) or text in seen:
+                continue
+            seen.add(text)
+            unique.append(text)
+
+        failures = []
+        with get_db() as conn:
+            for sql in unique:
+                if any(fragment in sql for fragment in ALLOWED_FULL_SCANS):
+                    continue
+                scans = find_full_scans(conn, sql)
+                if scans:
+                    failures.append((sql, scans))
+
+        print(f"📊 检查了 {len(unique)} 条语句, 覆盖 {len(called)} 个模型方法")
+        for sql, scans in failures:
+            print(f"\n❌ 全表扫描: {', '.join(scans)}")
+            print('   ' + ' '.join(sql.split())[:300])
+        for name in missing:
+            print(f"❌ 未覆盖的模型方法: {name}")
+
+        if failures or missing:
+            return 1
+        print("✅ 没有语句退化为全表扫描")
+        return 0
+    finally:
+        database.close_db_connections()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
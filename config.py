@@ -8,7 +8,91 @@ import secrets
 ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'Qq3142016904')  # 部署时请修改
 
 # 数据库配置
-DATABASE_PATH = 'chatgpt_team.db'
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'chatgpt_team.db')
+
+# SQLite 连接池配置（每个线程复用一个持久连接）
+DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))  # 遇到写锁时最长等待时间
+DB_CACHE_SIZE_KB = 16 * 1024  # 每个连接的页缓存大小 (KiB)
+DB_MMAP_SIZE = 256 * 1024 * 1024  # 内存映射读取大小 (字节)
+DB_CONN_MAX_AGE = 600  # 连接最长存活时间 (秒)，超过后回收重建
+DB_HEALTH_CHECK_IDLE = 30  # 连接空闲超过该秒数后，复用前先做健康检查
+
+# 审计类写入（踢人日志、登录记录、最后邀请时间）的后台批量提交
+AUDIT_QUEUE_SIZE = 10000  # 待写入队列上限，满时调用方短暂等待
+AUDIT_BATCH_SIZE = 500  # 每个事务最多合并的写入条数
+AUDIT_ENQUEUE_TIMEOUT = 1.0  # 队列满时最长等待秒数，超时后在调用线程直接写入
+AUDIT_WRITER_SYNC = os.environ.get('AUDIT_WRITER_SYNC', 'False').lower() == 'true'  # 同步写入（测试用）
+
+# Team 元数据缓存有效期 (秒)，本进程内的 Team 写操作会立即使缓存失效
+TEAM_CACHE_TTL = int(os.environ.get('TEAM_CACHE_TTL', 30))
+
+# 数据库迁移时重建表每批复制的行数
+MIGRATION_BATCH_SIZE = 5000
+
+# 管理后台列表分页（按 created_at, id 游标分页）
+ADMIN_PAGE_SIZE = 50  # 默认每页条数
+ADMIN_PAGE_SIZE_MAX = 500  # 单页最大条数
+
+# ChatGPT backend-api 客户端
+# 本地压测可指向 mock_backend.py，如 CHATGPT_API_BASE=http://127.0.0.1:18600/backend-api
+CHATGPT_API_BASE = os.environ.get('CHATGPT_API_BASE', 'https://chatgpt.com/backend-api').rstrip('/')
+CHATGPT_IMPERSONATE = 'chrome110'  # curl_cffi 模拟的浏览器指纹
+CHATGPT_POOL_SIZE = 8  # 保持的长连接 Session 数量（并发更高时临时新建，用完关闭）
+CHATGPT_CONNECT_TIMEOUT = 5  # 建立连接超时 (秒)
+CHATGPT_READ_TIMEOUT = 15  # 等待响应超时 (秒)
+CHATGPT_SCAN_READ_TIMEOUT = 5  # 自动踢人扫描获取成员列表的响应超时 (秒)，超时直接跳过该 Team
+MEMBER_CACHE_TTL = int(os.environ.get('MEMBER_CACHE_TTL', 10))  # 成员列表缓存有效期 (秒)，邀请/踢人后立即失效
+
+# backend-api 限流（按账号令牌桶 + 全局令牌桶）
+RATE_LIMIT_ACCOUNT_RPS = 2.0  # 每个账号每秒请求数
+RATE_LIMIT_ACCOUNT_BURST = 4  # 每个账号允许的突发请求数
+RATE_LIMIT_GLOBAL_RPS = 20.0  # 所有账号合计每秒请求数
+RATE_LIMIT_GLOBAL_BURST = 40
+RATE_LIMIT_MIN_RPS = 0.2  # 连续 429 后每个账号的最低速率
+RATE_LIMIT_429_BACKOFF = 10  # 429 没有 Retry-After 时暂停该账号的秒数
+RATE_LIMIT_RECOVERY = 0.1  # 每次成功恢复的速率（基础速率的比例）
+RATE_LIMIT_MAX_WAIT = 10  # 单次请求最多排队等待的秒数，超过则直接返回限流错误
+
+# 自动踢人扫描引擎：async（asyncio + AsyncSession）或 thread（线程池）
+AUTO_KICK_ENGINE = os.environ.get('AUTO_KICK_ENGINE', 'async').lower()
+AUTO_KICK_CONCURRENCY = int(os.environ.get('AUTO_KICK_CONCURRENCY', 32))  # async 引擎同时在途的请求数
+AUTO_KICK_WORKERS = 8  # thread 引擎的线程数（两种引擎的请求速率都由限流器控制）
+
+# 临时邀请到期调度（不受自动检测的运行时段和检测间隔限制）
+EXPIRY_RETRY_DELAY = 60  # 获取成员列表或踢人失败后重试的间隔 (秒)
+
+# 邀请接口返回失败后，轮询待处理邀请和成员列表确认是否实际成功
+INVITE_VERIFY_TIMEOUT = 6  # 默认轮询截止时间 (秒)
+INVITE_VERIFY_BACKOFF_INITIAL = 0.25  # 首次重试间隔 (秒)，之后翻倍并加随机抖动
+INVITE_VERIFY_BACKOFF_MAX = 1.5  # 重试间隔上限 (秒)
+INVITE_VERIFY_WORKERS = 8  # 并发轮询的共享线程数
+INVITE_VERIFY_SAMPLES = 500  # 保留最近多少次「邀请生效延迟」样本用于统计
+
+# 用户加入 Team (join_team) 的时间预算
+JOIN_DEADLINE = 25  # 整个请求的截止时间 (秒)
+JOIN_MAX_ATTEMPTS = 3  # 最多向几个 Team 发送邀请（预占名额失败的 Team 不计入）
+JOIN_INVITE_TIMEOUT = 10  # 发送邀请单步超时 (秒)
+JOIN_VERIFY_TIMEOUT = 5  # 邀请失败后验证是否实际成功的单步超时 (秒)
+SEAT_RESERVATION_TTL = 60  # 名额预占的有效期 (秒)，进程异常退出遗留的预占到期后自动释放
+JOIN_CANDIDATES = 10  # 每次请求从分配器取的候选 Team 数（预占失败时依次尝试下一个）
+
+# 每个 Team 的名额（不含所有者）
+TEAM_SEATS = 4
+
+# Team 分配器（allocator.py）
+ALLOCATOR_STRATEGY = os.environ.get('ALLOCATOR_STRATEGY', 'most_recent')  # most_recent / least_loaded / round_robin
+ALLOCATOR_STICKY = True  # 密钥已分配的 Team 有空位时优先
+ALLOCATOR_RESYNC_INTERVAL = 30  # 整体重新加载的间隔 (秒)，兜底其他进程的修改
+
+# 已验证 Team 就绪池（ready_pool.py）：后台定期核对排在最前的几个 Team 的上游成员和待处理邀请
+READY_POOL_SIZE = 5  # 每轮核对的 Team 数
+READY_POOL_INTERVAL = 5  # 核对间隔 (秒)
+READY_POOL_MAX_AGE = 10  # 核对结果的有效期 (秒)，过期后 join_team 不再使用
+READY_POOL_READ_TIMEOUT = 5  # 核对请求的响应超时 (秒)
+
+# 管理后台批量邀请 / 批量踢人
+BULK_MAX_EMAILS = 200  # 单次请求最多处理的邮箱数
+BULK_WORKERS = 8  # 并发调用上游接口的线程数
 
 # 每个 Team 最多生成的密钥数量
 MAX_KEYS_PER_TEAM = 4
@@ -1,12 +1,25 @@
 """
 数据库模型
 """
+import atexit
+import base64
+import calendar
+import json
+import queue
 import sqlite3
 import secrets
+import threading
 import time
+import weakref
 from datetime import datetime
 from contextlib import contextmanager
-from config import DATABASE_PATH, MAX_KEYS_PER_TEAM, KEY_LENGTH
+from functools import wraps
+import events
+from records import TeamRecord, InvitationRecord, KeyRecord, OrderRecord
+from config import (DATABASE_PATH, MAX_KEYS_PER_TEAM, KEY_LENGTH, DB_BUSY_TIMEOUT_MS,
+                    DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_CONN_MAX_AGE, DB_HEALTH_CHECK_IDLE,
+                    AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_ENQUEUE_TIMEOUT, AUDIT_WRITER_SYNC,
+                    TEAM_CACHE_TTL, SEAT_RESERVATION_TTL, TEAM_SEATS)
 
 
 def execute_with_retry(func, max_retries=3):
@@ -16,6 +29,7 @@ def execute_with_retry(func, max_retries=3):
             return func()
         except sqlite3.OperationalError as e:
             if 'locked' in str(e).lower() and attempt < max_retries - 1:
+                _pool.record_lock_retry()
                 # 指数退避: 0.1s, 0.2s, 0.3s
                 time.sleep(0.1 * (attempt + 1))
             else:
@@ -23,161 +37,653 @@ def execute_with_retry(func, max_retries=3):
     return None
 
 
+def _close_quietly(conn):
+    """关闭连接，忽略已关闭/跨线程等错误"""
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+class _PooledConnection:
+    """连接池中的一条连接及其元数据"""
+    __slots__ = ('conn', 'path', 'created_at', 'last_used', 'depth', 'closed', '__weakref__')
+
+    def __init__(self, conn, path):
+        self.conn = conn
+        self.path = path
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.depth = 0  # 同一线程内 get_db 的嵌套层数
+        self.closed = False
+
+
+class ConnectionPool:
+    """
+    线程本地的 SQLite 连接池
+
+    每个线程持有一个持久连接（WAL 模式 + 调优后的 PRAGMA），
+    连接超过最大存活时间会被回收，空闲过久的连接在复用前会做一次健康检查。
+    线程结束后其连接会被自动关闭。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._entries = set()
+        self._stats = {
+            'opened': 0,
+            'reused': 0,
+            'recycled': 0,
+            'health_check_failed': 0,
+            'lock_errors': 0,
+            'lock_retries': 0
+        }
+
+    def _incr(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _open(self, path):
+        """创建新连接并应用连接级 PRAGMA"""
+        conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # 开启外键约束支持
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+        # WAL: 读写互不阻塞，写入只追加日志；NORMAL 在 WAL 下仍保证崩溃一致性
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+
+        entry = _PooledConnection(conn, path)
+        with self._lock:
+            self._entries.add(entry)
+            self._stats['opened'] += 1
+        # 线程对象被回收时关闭其连接，避免每请求一个线程的服务器泄漏连接
+        weakref.finalize(threading.current_thread(), self._discard, entry)
+        return entry
+
+    def _discard(self, entry):
+        """关闭并移除连接"""
+        with self._lock:
+            self._entries.discard(entry)
+        if not entry.closed:
+            entry.closed = True
+            _close_quietly(entry.conn)
+
+    def _is_healthy(self, entry):
+        try:
+            entry.conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """获取当前线程的连接（必要时新建、回收或重建）"""
+        path = DATABASE_PATH
+        entry = getattr(self._local, 'entry', None)
+
+        # 嵌套调用直接复用同一连接，不做回收检查
+        if entry is not None and entry.depth > 0 and not entry.closed:
+            entry.depth += 1
+            return entry
+
+        if entry is not None:
+            now = time.monotonic()
+            if entry.closed or entry.path != path:
+                self._discard(entry)
+                entry = None
+            elif now - entry.created_at > DB_CONN_MAX_AGE:
+                self._discard(entry)
+                self._incr('recycled')
+                entry = None
+            elif now - entry.last_used > DB_HEALTH_CHECK_IDLE and not self._is_healthy(entry):
+                self._discard(entry)
+                self._incr('health_check_failed')
+                entry = None
+            else:
+                self._incr('reused')
+
+        if entry is None:
+            entry = self._open(path)
+            self._local.entry = entry
+
+        entry.depth = 1
+        return entry
+
+    def release(self, entry):
+        entry.depth -= 1
+        entry.last_used = time.monotonic()
+
+    def record_lock_error(self):
+        self._incr('lock_errors')
+
+    def record_lock_retry(self):
+        self._incr('lock_retries')
+
+    def close_all(self):
+        """关闭所有连接（仅在关闭服务或切换数据库时调用）"""
+        with self._lock:
+            entries = list(self._entries)
+        for entry in entries:
+            self._discard(entry)
+
+    def get_stats(self):
+        """获取连接池统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['open_connections'] = len(self._entries)
+        return stats
+
+
+_pool = ConnectionPool()
+
+
 @contextmanager
 def get_db():
-    """数据库连接上下文管理器"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    # 开启外键约束支持
-    conn.execute("PRAGMA foreign_keys = ON")
+    """数据库连接上下文管理器（复用当前线程的持久连接，最外层退出时提交）"""
+    entry = _pool.acquire()
+    conn = entry.conn
+    outermost = entry.depth == 1
     try:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
+        if outermost:
+            conn.commit()
+    except Exception as e:
+        if outermost:
+            conn.rollback()
+        if isinstance(e, sqlite3.OperationalError) and 'locked' in str(e).lower():
+            _pool.record_lock_error()
         raise
     finally:
-        conn.close()
-
+        _pool.release(entry)
+
+
+def close_db_connections():
+    """关闭连接池中的所有连接（先等待后台审计写入提交，并清空 Team 缓存）"""
+    _audit_writer.flush()
+    _pool.close_all()
+    _team_cache.invalidate()
+
+
+def get_db_pool_stats():
+    """获取数据库连接池统计信息"""
+    return _pool.get_stats()
+
+
+_STOP = object()
+
+
+class AuditWriter:
+    """
+    审计类写入的后台批量提交线程 (group commit)
+
+    踢人日志、登录记录、last_invite_at 更新等写入放入有界队列，由单个后台线程
+    把队列中已积累的写入合并到一个事务提交，请求线程和扫描线程不再直接争抢写锁。
+    队列满时调用方最多等待 enqueue_timeout 秒，仍然满则在调用线程直接写入（不丢数据）。
+    sync=True 时每次写入都在调用线程立即提交（测试和查询计划检查使用）。
+    """
+
+    def __init__(self, max_queue=AUDIT_QUEUE_SIZE, batch_size=AUDIT_BATCH_SIZE,
+                 enqueue_timeout=AUDIT_ENQUEUE_TIMEOUT, sync=AUDIT_WRITER_SYNC):
+        self.sync = sync
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._enqueue_timeout = enqueue_timeout
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0  # 已入队但尚未提交的写入数
+        self._thread = None
+        self._atexit_registered = False
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'max_batch_size': 0,
+            'max_queue_depth': 0,
+            'queue_full': 0,
+            'sync_fallbacks': 0,
+            'errors': 0,
+            'last_batch_ms': 0.0
+        }
 
-def init_db():
-    """初始化数据库"""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # Teams 表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS teams (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                account_id TEXT NOT NULL,
-                access_token TEXT NOT NULL,
-                organization_id TEXT,
-                email TEXT,
-                last_invite_at TIMESTAMP,
-                token_error_count INTEGER DEFAULT 0,
-                token_status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 为已存在的表添加新字段（如果不存在）
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+
+    def submit(self, sql, params=()):
+        """提交一条写入语句（异步，按提交顺序执行）"""
+        if self.sync:
+            self._write([(sql, params)])
+            return
+
+        self._ensure_started()
+        with self._lock:
+            self._pending += 1
+            self._stats['enqueued'] += 1
         try:
-            cursor.execute('ALTER TABLE teams ADD COLUMN token_error_count INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
-        
-        try:
-            cursor.execute('ALTER TABLE teams ADD COLUMN token_status TEXT DEFAULT "active"')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
+            try:
+                self._queue.put_nowait((sql, params))
+            except queue.Full:
+                with self._lock:
+                    self._stats['queue_full'] += 1
+                self._queue.put((sql, params), timeout=self._enqueue_timeout)
+        except queue.Full:
+            # 后台线程跟不上时退回同步写入
+            self._done(1)
+            with self._lock:
+                self._stats['sync_fallbacks'] += 1
+            self._write([(sql, params)])
+            return
+
+        depth = self._queue.qsize()
+        with self._lock:
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+
+    def _write(self, batch):
+        """在一个事务中执行一批写入（遇到锁定按 execute_with_retry 重试）"""
+        def _execute():
+            with get_db() as conn:
+                for sql, params in batch:
+                    conn.execute(sql, params)
+        execute_with_retry(_execute)
 
+    def _commit(self, batch):
+        start = time.perf_counter()
         try:
-            cursor.execute('ALTER TABLE teams ADD COLUMN member_check_error_count INTEGER DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
+            self._write(batch)
+            failed = 0
+        except Exception:
+            # 整批失败时逐条重试，只丢弃本身出错的写入（如 Team 已被删除）
+            failed = 0
+            for item in batch:
+                try:
+                    self._write([item])
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ 审计写入失败: {e}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['written'] += len(batch) - failed
+            self._stats['errors'] += failed
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], len(batch))
+            self._stats['last_batch_ms'] = round(elapsed_ms, 2)
+        self._done(len(batch))
+
+    def _done(self, count):
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # 合并队列中已经积累的写入，写锁竞争越激烈批次越大
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
 
-        try:
-            cursor.execute('ALTER TABLE teams ADD COLUMN member_check_first_error_at TIMESTAMP')
-        except sqlite3.OperationalError:
-            pass  # 字段已存在
+    def flush(self, timeout=None):
+        """等待已提交的写入全部落库，超时返回 False"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
 
-        # Access Keys 表 (重构: 每个邀请码对应一个 Team)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS access_keys (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_id INTEGER,
-                key_code TEXT NOT NULL UNIQUE,
-                is_temp BOOLEAN DEFAULT 0,
-                temp_hours INTEGER DEFAULT 0,
-                is_cancelled BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE SET NULL
-            )
-        ''')
-        
-        # Invitations 表（记录所有邀请）
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invitations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_id INTEGER NOT NULL,
-                key_id INTEGER,
-                email TEXT NOT NULL,
-                user_id TEXT,
-                invite_id TEXT,
-                status TEXT DEFAULT 'pending',
-                is_temp BOOLEAN DEFAULT 0,
-                temp_expire_at TIMESTAMP,
-                is_confirmed BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE CASCADE,
-                FOREIGN KEY (key_id) REFERENCES access_keys (id) ON DELETE SET NULL
-            )
-        ''')
-
-        # 自动检测配置表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS auto_kick_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                enabled BOOLEAN DEFAULT 0,
-                check_interval_min INTEGER DEFAULT 90,
-                check_interval_max INTEGER DEFAULT 120,
-                start_time TEXT DEFAULT '09:00',
-                end_time TEXT DEFAULT '22:00',
-                timezone TEXT DEFAULT 'Asia/Shanghai',
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 插入默认配置（如果不存在）
-        cursor.execute('SELECT COUNT(*) FROM auto_kick_config')
-        if cursor.fetchone()[0] == 0:
-            cursor.execute('''
-                INSERT INTO auto_kick_config (enabled, check_interval_min, check_interval_max, start_time, end_time)
-                VALUES (0, 90, 120, '09:00', '22:00')
-            ''')
+    def close(self, timeout=5):
+        """写完队列中的剩余数据并停止后台线程（进程退出时自动调用）"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
 
-        # 踢人日志表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS kick_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                team_id INTEGER NOT NULL,
-                user_id TEXT NOT NULL,
-                email TEXT NOT NULL,
-                reason TEXT,
-                success BOOLEAN DEFAULT 1,
-                error_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE CASCADE
-            )
-        ''')
-
-        # 登录失败记录表 (fail2ban)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS login_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ip_address TEXT NOT NULL,
-                username TEXT,
-                success BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 创建索引加速查询
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_login_attempts_ip
-            ON login_attempts(ip_address, created_at)
-        ''')
+    def get_stats(self):
+        """获取写入统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+            stats['sync'] = self.sync
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_batch_size'] = round(stats['written'] / stats['batches'], 2) if stats['batches'] else 0
+        return stats
 
-        conn.commit()
-    
-    # 初始化小红书相关表
-    init_xhs_tables()
+
+_audit_writer = AuditWriter()
+
+
+def flush_audit_writes(timeout=None):
+    """等待后台审计写入全部提交"""
+    return _audit_writer.flush(timeout)
+
+
+def set_audit_writer_sync(enabled):
+    """切换审计写入为同步模式（先写完队列中已有的数据）"""
+    _audit_writer.flush()
+    _audit_writer.sync = enabled
+
+
+def get_audit_writer_stats():
+    """获取审计写入线程统计信息"""
+    return _audit_writer.get_stats()
+
+
+def encode_cursor(row):
+    """根据列表最后一行的 (created_at, id) 生成分页游标"""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析分页游标，返回 (created_at, id)，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('无效的分页游标') from e
+    if not isinstance(created_at, str) or not isinstance(row_id, int):
+        raise ValueError('无效的分页游标')
+    return created_at, row_id
+
+
+def next_page_cursor(rows, limit):
+    """当前页已取满时返回下一页游标，否则返回 None"""
+    if limit and len(rows) >= limit:
+        return encode_cursor(rows[-1])
+    return None
+
+
+def _keyset_filters(alias, cursor=None, created_from=None, created_to=None):
+    """
+    生成游标与创建时间范围条件，返回 (conditions, params)
+    游标条件使用行值比较 (created_at, id) < (?, ?)，可直接走 created_at 索引
+    （二级索引末尾隐含 rowid，即 id），翻页耗时与页码和表大小无关
+    """
+    conditions, params = [], []
+    if cursor:
+        conditions.append(f"({alias}.created_at, {alias}.id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    if created_from:
+        conditions.append(f"{alias}.created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        # 只给日期时包含当天的全部记录
+        if len(created_to) == 10:
+            conditions.append(f"{alias}.created_at < DATE(?, '+1 day')")
+        else:
+            conditions.append(f"{alias}.created_at <= ?")
+        params.append(created_to)
+    return conditions, params
+
+
+def _prefix_filter(expr, prefix, conditions, params):
+    """前缀匹配改写为范围条件（而不是 LIKE），以便使用 expr 上的索引"""
+    conditions.append(f"{expr} >= ? AND {expr} < ?")
+    params.extend([prefix, prefix + '\U0010ffff'])
+
+
+def _keyset_select(conn, sql, alias, conditions, params, limit, record_cls=None):
+    """追加过滤条件并按 (created_at, id) 倒序取一页"""
+    if conditions:
+        sql += '\n WHERE ' + ' AND '.join(conditions)
+    sql += f'\n ORDER BY {alias}.created_at DESC, {alias}.id DESC'
+    if limit:
+        sql += '\n LIMIT ?'
+        params = params + [limit]
+    if record_cls is not None:
+        return _fetch_records(conn, record_cls, sql, params)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+# 各表的查询列（按查询需要投影，不再 SELECT *）
+TEAM_COLUMNS = ('id', 'name', 'account_id', 'access_token', 'organization_id', 'email',
+                'last_invite_at', 'token_error_count', 'token_status',
+                'member_check_error_count', 'member_check_first_error_at', 'created_at', 'updated_at')
+INVITATION_COLUMNS = ('id', 'team_id', 'key_id', 'email', 'user_id', 'invite_id', 'status',
+                      'is_temp', 'temp_expire_at', 'is_confirmed', 'created_at')
+KEY_COLUMNS = ('id', 'team_id', 'key_code', 'is_temp', 'temp_hours', 'is_cancelled', 'created_at')
+ORDER_COLUMNS = ('id', 'order_number', 'key_id', 'is_used', 'user_email', 'extracted_at', 'used_at', 'created_at')
+
+# 可分配的 Team：token 未过期（token_status 为 NULL 的旧数据视为正常，与分配器一致），
+# 所有按 token 状态筛选 Team 的查询共用；部分索引 idx_teams_free_seats（迁移 11）按同一条件建立
+TEAM_TOKEN_USABLE = "COALESCE(token_status, 'active') != 'expired'"
+
+
+def _to_epoch(value):
+    """把 UTC 时间（datetime 或 'YYYY-MM-DD HH:MM:SS' 字符串）转换成整数时间戳，None 原样返回"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return calendar.timegm(value.utctimetuple())
+
+
+def _column_list(columns, alias=None):
+    """生成 SELECT 列清单，可带表别名"""
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(prefix + column for column in columns)
+
+
+def _fetch_records(conn, record_cls, sql, params=()):
+    """执行查询，结果行直接构造成 record_cls 记录（不创建 sqlite3.Row 和 dict 副本）"""
+    cursor = conn.execute(sql, params)
+    cursor.row_factory = record_cls.builder(column[0] for column in cursor.description)
+    return cursor.fetchall()
+
+
+def _fetch_record(conn, record_cls, sql, params=()):
+    """执行查询并返回第一条记录，没有结果时返回 None"""
+    cursor = conn.execute(sql, params)
+    cursor.row_factory = record_cls.builder(column[0] for column in cursor.description)
+    return cursor.fetchone()
+
+
+# teams 表上由触发器维护的名额计数器: 字段名 -> 计入条件（{r} 为 invitations 行别名）
+# 每个计数器统计满足条件的去重邮箱数，与 COUNT(DISTINCT email) 的结果保持一致
+TEAM_MEMBER_COUNTERS = {
+    'success_members': "{r}.status = 'success'",
+    'pending_members': "{r}.status = 'pending'",
+    'temp_members': "{r}.status = 'success' AND {r}.is_temp = 1 AND {r}.is_confirmed = 0",
+}
+
+
+def _counter_delta_sql(column, condition, row, delta):
+    """
+    生成计数器增减语句：当 row 满足条件，且同一 Team 中没有其他满足条件的同邮箱记录时才增减
+    （row 为 NEW 或 OLD）
+    """
+    sign = '+' if delta > 0 else '-'
+    return f'''
+            UPDATE teams SET {column} = {column} {sign} 1
+            WHERE id = {row}.team_id
+              AND {condition.format(r=row)}
+              AND NOT EXISTS (
+                  SELECT 1 FROM invitations i
+                  WHERE i.team_id = {row}.team_id AND i.email = {row}.email
+                    AND i.id != {row}.id AND {condition.format(r='i')}
+              );'''
+
+
+def _create_member_counter_triggers(cursor):
+    """创建维护 teams 名额计数器的触发器（包括级联删除路径）"""
+    insert_body = ''.join(_counter_delta_sql(col, cond, 'NEW', 1)
+                          for col, cond in TEAM_MEMBER_COUNTERS.items())
+    delete_body = ''.join(_counter_delta_sql(col, cond, 'OLD', -1)
+                          for col, cond in TEAM_MEMBER_COUNTERS.items())
+    # 更新视为先删除旧行再插入新行
+    update_body = delete_body + insert_body
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_invitations_counters_insert
+        AFTER INSERT ON invitations
+        BEGIN{insert_body}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_invitations_counters_delete
+        AFTER DELETE ON invitations
+        BEGIN{delete_body}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_invitations_counters_update
+        AFTER UPDATE OF team_id, email, status, is_temp, is_confirmed ON invitations
+        BEGIN{update_body}
+        END
+    ''')
+
+
+def _expected_member_counters_sql():
+    """按 invitations 实际数据计算各 Team 计数器的查询"""
+    columns = ',\n'.join(
+        f"COUNT(DISTINCT CASE WHEN {cond.format(r='i')} THEN i.email END) AS {col}"
+        for col, cond in TEAM_MEMBER_COUNTERS.items()
+    )
+    return f'''
+        SELECT t.id AS team_id, {columns}
+        FROM teams t
+        LEFT JOIN invitations i ON i.team_id = t.id
+        GROUP BY t.id
+    '''
+
+
+def _rebuild_member_counters(cursor):
+    """根据 invitations 重新计算所有 Team 的名额计数器"""
+    cursor.execute(_expected_member_counters_sql())
+    rows = cursor.fetchall()
+    assignments = ', '.join(f'{col} = ?' for col in TEAM_MEMBER_COUNTERS)
+    cursor.executemany(
+        f'UPDATE teams SET {assignments} WHERE id = ?',
+        [tuple(row[col] for col in TEAM_MEMBER_COUNTERS) + (row['team_id'],) for row in rows]
+    )
+    return len(rows)
+
+
+def init_db():
+    """初始化数据库（执行未应用的版本化迁移，已是最新版本时只做一次版本查询）"""
+    from migrations import migrate
+    migrate()
+
+
+class TeamCache:
+    """
+    Team 元数据的进程内读穿缓存
+
+    缓存整张 teams 表的快照（不含触发器维护的名额计数器，名额请用
+    get_all_with_capacity / get_free_teams 读取），TTL 到期或任意 Team 写操作后重新加载。
+    多进程部署时其他进程的修改最多延迟 TTL 秒可见。
+    """
+
+    def __init__(self, ttl=TEAM_CACHE_TTL):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._teams = None  # 按 created_at 倒序的 Team 列表
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self._version = 0  # 每次失效加一，防止加载期间发生的写入被旧快照覆盖
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _snapshot(self):
+        with self._lock:
+            if self._teams is not None and time.monotonic() - self._loaded_at < self._ttl:
+                self._stats['hits'] += 1
+                return self._teams, self._by_id
+            self._stats['misses'] += 1
+            version = self._version
+
+        with get_db() as conn:
+            teams = _fetch_records(conn, TeamRecord,
+                                   f'SELECT {_column_list(TEAM_COLUMNS)} FROM teams ORDER BY created_at DESC')
+        by_id = {team['id']: team for team in teams}
+
+        with self._lock:
+            if version == self._version:
+                self._teams, self._by_id = teams, by_id
+                self._loaded_at = time.monotonic()
+        return teams, by_id
+
+    def get_all(self):
+        teams, _ = self._snapshot()
+        return [team.copy() for team in teams]
+
+    def get(self, team_id):
+        try:
+            team_id = int(team_id)
+        except (TypeError, ValueError):
+            return None
+        _, by_id = self._snapshot()
+        team = by_id.get(team_id)
+        return team.copy() if team else None
+
+    def patch(self, team_id, **fields):
+        """直接修改缓存中的单个 Team（用于不值得整体失效的高频字段）"""
+        with self._lock:
+            team = self._by_id.get(team_id)
+            if team is not None:
+                team.update(fields)
+
+    def invalidate(self):
+        with self._lock:
+            self._teams = None
+            self._by_id = {}
+            self._version += 1
+            self._stats['invalidations'] += 1
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._by_id)
+            stats['age'] = round(time.monotonic() - self._loaded_at, 1) if self._teams is not None else None
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0
+        return stats
+
+
+_team_cache = TeamCache()
+
+
+def get_team_cache_stats():
+    """获取 Team 缓存统计信息"""
+    return _team_cache.get_stats()
+
+
+def _invalidates_team_cache(func):
+    """Team 写操作装饰器：执行结束后使 Team 缓存失效"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _team_cache.invalidate()
+            events.emit('teams_changed')
+    return wrapper
 
 
 class Team:
     @staticmethod
+    @_invalidates_team_cache
     def create(name, account_id, access_token, organization_id=None, email=None):
         """创建新 Team（不自动生成密钥,需要手动生成）"""
         with get_db() as conn:
@@ -193,31 +699,24 @@ class Team:
     
     @staticmethod
     def get_all():
-        """获取所有 Teams"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM teams ORDER BY created_at DESC')
-            return [dict(row) for row in cursor.fetchall()]
+        """获取所有 Teams（读缓存，不含名额计数器）"""
+        return _team_cache.get_all()
     
     @staticmethod
     def get_by_id(team_id):
-        """根据 ID 获取 Team"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM teams WHERE id = ?', (team_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        """根据 ID 获取 Team（读缓存，不含名额计数器）"""
+        return _team_cache.get(team_id)
 
     @staticmethod
     def get_by_organization_id(organization_id):
         """根据 organization_id 获取 Team"""
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM teams WHERE organization_id = ?', (organization_id,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+            return _fetch_record(conn, TeamRecord, f'''
+                SELECT {_column_list(TEAM_COLUMNS)} FROM teams WHERE organization_id = ?
+            ''', (organization_id,))
 
     @staticmethod
+    @_invalidates_team_cache
     def update_token(team_id, access_token):
         """更新 Team 的 access_token，并重置错误计数"""
         with get_db() as conn:
@@ -232,6 +731,7 @@ class Team:
             ''', (access_token, team_id))
 
     @staticmethod
+    @_invalidates_team_cache
     def update_team_info(team_id, name=None, account_id=None, access_token=None, email=None):
         """更新 Team 的完整信息"""
         with get_db() as conn:
@@ -260,24 +760,89 @@ class Team:
                 cursor.execute(sql, params)
 
     @staticmethod
+    @_invalidates_team_cache
     def delete(team_id):
         """删除 Team"""
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM teams WHERE id = ?', (team_id,))
 
+    @staticmethod
+    def get_all_with_capacity(include_expired=False):
+        """
+        获取所有 Team 及其名额占用情况
+        每个 Team 附带 member_count（成功邀请的去重邮箱数）和 pending_count（待处理邀请的去重邮箱数），
+        直接读取触发器维护的计数器
+        """
+        with get_db() as conn:
+            where = '' if include_expired else f"WHERE {TEAM_TOKEN_USABLE}"
+            return _fetch_records(conn, TeamRecord, f'''
+                SELECT {_column_list(TEAM_COLUMNS)},
+                       success_members AS member_count,
+                       pending_members AS pending_count
+                FROM teams
+                {where}
+                ORDER BY created_at DESC
+            ''')
+
+    @staticmethod
+    def get_free_teams(limit=None):
+        """
+        获取有空位且 token 未过期的 Team，按最后邀请时间倒序（最近成功的在前，从未邀请的排最后）
+        由部分索引 idx_teams_free_seats 直接提供顺序（索引条件按 4 个名额和 TEAM_TOKEN_USABLE 建立，
+        修改 TEAM_SEATS 时需新增迁移重建）；
+        reserved_count 为进行中的名额预占数，成功邀请数 + 预占数已满的 Team 不返回
+        """
+        with get_db() as conn:
+            return _fetch_records(conn, TeamRecord, f'''
+                SELECT {_column_list(TEAM_COLUMNS)},
+                       success_members AS member_count,
+                       pending_members AS pending_count,
+                       (SELECT COUNT(*) FROM seat_reservations r
+                        WHERE r.team_id = teams.id AND r.expires_at > ?) AS reserved_count
+                FROM teams
+                WHERE success_members < {TEAM_SEATS} AND {TEAM_TOKEN_USABLE}
+                  AND success_members + reserved_count < {TEAM_SEATS}
+                ORDER BY last_invite_at DESC, id DESC
+                LIMIT ?
+            ''', (int(time.time()), -1 if limit is None else limit))
+
+    @staticmethod
+    def rebuild_member_counters():
+        """根据邀请记录重建所有 Team 的名额计数器，返回处理的 Team 数量"""
+        with get_db() as conn:
+            return _rebuild_member_counters(conn.cursor())
+
+    @staticmethod
+    def verify_member_counters():
+        """校验名额计数器，返回与实际邀请记录不一致的 Team 列表"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_expected_member_counters_sql())
+            expected = {row['team_id']: row for row in cursor.fetchall()}
+            columns = ', '.join(TEAM_MEMBER_COUNTERS)
+            cursor.execute(f'SELECT id, name, {columns} FROM teams')
+            mismatches = []
+            for row in cursor.fetchall():
+                exp = expected.get(row['id'])
+                for col in TEAM_MEMBER_COUNTERS:
+                    actual_value = row[col]
+                    expected_value = exp[col] if exp else 0
+                    if actual_value != expected_value:
+                        mismatches.append({
+                            'team_id': row['id'],
+                            'name': row['name'],
+                            'counter': col,
+                            'actual': actual_value,
+                            'expected': expected_value
+                        })
+            return mismatches
+
     @staticmethod
     def get_available_teams():
         """获取所有未满员的 Team (轮询机制: 按最后邀请时间排序，最久未使用的优先)"""
-        teams = Team.get_all()
-        available = []
-        for team in teams:
-            invitations = Invitation.get_by_team(team['id'])
-            member_count = len({inv['email'] for inv in invitations if inv['status'] == 'success'})
-            if member_count < 4:
-                team_copy = dict(team)
-                team_copy['member_count'] = member_count
-                available.append(team_copy)
+        available = [team for team in Team.get_all_with_capacity(include_expired=True)
+                     if team['member_count'] < TEAM_SEATS]
 
         # 排序逻辑：
         # 1. 优先选择从未使用过的team (last_invite_at is None)
@@ -291,17 +856,54 @@ class Team:
         return available
 
     @staticmethod
-    def update_last_invite(team_id):
-        """更新Team的最后邀请时间"""
+    def get_allocation_state(team_ids=None):
+        """
+        获取 Team 分配器需要的状态（id、token_status、success_members、最后邀请时间戳 last_invite_ts，
+        以及未过期名额预占的到期时间戳列表 reservations），team_ids 为 None 时返回所有 Team
+        """
+        conditions, params = [], [int(time.time())]
+        if team_ids is not None:
+            team_ids = list(team_ids)
+            if not team_ids:
+                return []
+            conditions.append(f"id IN ({', '.join('?' * len(team_ids))})")
+            params.extend(team_ids)
+        # 整体加载按 id 顺序遍历整张表
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else 'ORDER BY id'
+
         with get_db() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE teams
-                SET last_invite_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (team_id,))
+            cursor.execute(f'''
+                SELECT id, token_status, success_members,
+                       CAST(strftime('%s', last_invite_at) AS INTEGER) AS last_invite_ts,
+                       (SELECT group_concat(expires_at) FROM seat_reservations r
+                        WHERE r.team_id = teams.id AND r.expires_at > ?) AS reservations
+                FROM teams
+                {where}
+            ''', params)
+            states = []
+            for row in cursor.fetchall():
+                state = dict(row)
+                state['reservations'] = [int(ts) for ts in state['reservations'].split(',')] \
+                    if state['reservations'] else []
+                states.append(state)
+            return states
+
+    @staticmethod
+    def update_last_invite(team_id):
+        """更新Team的最后邀请时间（由后台审计写入线程批量提交）"""
+        # 高频写入只更新缓存中的这一字段，不整体失效
+        now = time.time()
+        _team_cache.patch(team_id, last_invite_at=time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now)))
+        events.emit('team_invited', team_id=team_id, ts=int(now))
+        _audit_writer.submit('''
+            UPDATE teams
+            SET last_invite_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (team_id,))
     
     @staticmethod
+    @_invalidates_team_cache
     def increment_token_error(team_id):
         """增加token错误计数，如果达到5次则标记为expired"""
         with get_db() as conn:
@@ -325,6 +927,11 @@ class Team:
     @staticmethod
     def reset_token_error(team_id):
         """重置token错误计数（当token更新或请求成功时）"""
+        # 每次请求成功都会调用，没有需要重置的内容时不写库、不使缓存失效
+        team = _team_cache.get(team_id)
+        if team and not team['token_error_count'] and team['token_status'] == 'active':
+            return
+
         with get_db() as conn:
             cursor = conn.cursor()
 
@@ -379,7 +986,11 @@ class Team:
                     WHERE id = ?
                 ''', (team_id,))
 
+        _team_cache.invalidate()
+        events.emit('teams_changed')
+
     @staticmethod
+    @_invalidates_team_cache
     def increment_member_check_error(team_id):
         """增加检查成员时的token错误计数（10分钟内超过3次则标记为expired）"""
         with get_db() as conn:
@@ -472,6 +1083,12 @@ class Team:
     @staticmethod
     def reset_member_check_error(team_id):
         """重置检查成员的错误计数（当请求成功时）"""
+        # 每次获取成员成功都会调用，没有需要重置的内容时不写库、不使缓存失效
+        team = _team_cache.get(team_id)
+        if team and not team['member_check_error_count'] and not team['member_check_first_error_at'] \
+                and team['token_status'] == 'active':
+            return
+
         with get_db() as conn:
             cursor = conn.cursor()
 
@@ -502,6 +1119,9 @@ class Team:
                     WHERE id = ?
                 ''', (team_id,))
 
+        _team_cache.invalidate()
+        events.emit('teams_changed')
+
     @staticmethod
     def get_token_status(team_id):
         """获取token状态"""
@@ -525,6 +1145,7 @@ class Team:
             return [dict(row) for row in cursor.fetchall()]
 
     @staticmethod
+    @_invalidates_team_cache
     def delete_expired_teams():
         """批量删除所有token已过期的teams，返回删除的数量和详情"""
         expired_teams = Team.get_expired_teams()
@@ -575,34 +1196,39 @@ class AccessKey:
             ''', (team_id, key_id))
 
     @staticmethod
-    def get_all():
-        """获取所有密钥"""
+    def get_all(limit=None, cursor=None, team_id=None, status=None, created_from=None, created_to=None):
+        """
+        获取未取消的密钥，按创建时间倒序
+        传入 limit 时按 (created_at, id) 游标分页；status: 'temp' 1日试用 / 'normal' 永久
+        """
+        conditions, params = _keyset_filters('ak', cursor, created_from, created_to)
+        conditions.insert(0, 'ak.is_cancelled = 0')
+        if team_id:
+            conditions.append('ak.team_id = ?')
+            params.append(team_id)
+        if status in ('temp', 'normal'):
+            conditions.append('ak.is_temp = ?')
+            params.append(1 if status == 'temp' else 0)
+
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ak.*,
+            return _keyset_select(conn, f'''
+                SELECT {_column_list(KEY_COLUMNS, 'ak')},
                        t.name as team_name,
                        (SELECT COUNT(*) FROM invitations WHERE key_id = ak.id AND status = 'success') as usage_count
                 FROM access_keys ak
                 LEFT JOIN teams t ON ak.team_id = t.id
-                WHERE ak.is_cancelled = 0
-                ORDER BY ak.created_at DESC
-            ''')
-            return [dict(row) for row in cursor.fetchall()]
+            ''', 'ak', conditions, params, limit, KeyRecord)
 
     @staticmethod
     def get_by_code(key_code):
         """根据密钥获取信息"""
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT ak.*,
+            return _fetch_record(conn, KeyRecord, f'''
+                SELECT {_column_list(KEY_COLUMNS, 'ak')},
                        (SELECT COUNT(*) FROM invitations WHERE key_id = ak.id) as usage_count
                 FROM access_keys ak
                 WHERE ak.key_code = ? AND ak.is_cancelled = 0
             ''', (key_code,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
 
 
 
@@ -625,44 +1251,215 @@ class AccessKey:
             cursor.execute('DELETE FROM access_keys WHERE id = ?', (key_id,))
 
 
+def _invitation_params(row):
+    """邀请记录字典转为 INSERT 参数（temp_expire_at 同时换算为整数时间戳 temp_expire_ts）"""
+    return (row['team_id'], row.get('key_id'), row['email'], row.get('user_id'), row.get('invite_id'),
+            row.get('status', 'pending'), row.get('is_temp', False), row.get('temp_expire_at'),
+            _to_epoch(row.get('temp_expire_at')))
+
+
+def _insert_invitations(cursor, params, replace=False):
+    """
+    在调用方的事务中逐行写入邀请记录，返回 [(id, 参数)]；replace=True 时先删除同一 Team 下同邮箱的旧记录。
+    invitation_created 事件由调用方在事务提交后通过 _emit_invitations_created 发出
+    """
+    if replace:
+        cursor.executemany('''
+            DELETE FROM invitations WHERE team_id = ? AND lower(email) = lower(?)
+        ''', [(p[0], p[2]) for p in params])
+    created = []
+    # 逐行插入以取得每条记录的 id
+    for p in params:
+        cursor.execute('''
+            INSERT INTO invitations (team_id, key_id, email, user_id, invite_id,
+                                    status, is_temp, temp_expire_at, temp_expire_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', p)
+        created.append((cursor.lastrowid, p))
+    return created
+
+
+def _emit_invitations_created(created):
+    for invitation_id, p in created:
+        events.emit('invitation_created', id=invitation_id, team_id=p[0], email=p[2], status=p[5],
+                    is_temp=bool(p[6]), temp_expire_ts=p[8])
+
+
+def _delete_reservations(conn, reservation_ids):
+    """在调用方的事务中删除预占，返回被删除的 [(team_id, expires_at)]"""
+    if not reservation_ids:
+        return []
+    placeholders = ','.join('?' * len(reservation_ids))
+    rows = conn.execute(f'DELETE FROM seat_reservations WHERE id IN ({placeholders}) RETURNING team_id, expires_at',
+                        list(reservation_ids)).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+class SeatReservation:
+    """
+    Team 名额预占
+
+    邀请前在一个短事务中条件插入预占记录：只有「成功邀请数 + 未过期的预占数 < TEAM_SEATS」时才插入，
+    并发的加入请求因此不会超额分配同一个 Team，也不需要全局锁或邀请前先查成员列表。
+    邀请成功时在同一事务中写入邀请记录并删除预占（fulfill），失败时释放（release）；
+    进程异常退出遗留的预占 SEAT_RESERVATION_TTL 秒后不再计入，并在下次预占该 Team 时清理。
+
+    seats_changed 事件带上新增 / 删除的预占 (team_id, expires_at)，分配器据此直接调整内存中的名额，
+    不再为每次预占和释放读库。
+    """
+
+    @staticmethod
+    def reserve(team_id, email, key_id=None, ttl=SEAT_RESERVATION_TTL):
+        """预占一个名额，返回预占 ID；Team 已满（含其他请求的预占）时返回 None"""
+        reserved = SeatReservation.reserve_many(team_id, [email], key_id, ttl)
+        return reserved[0] if reserved else None
+
+    @staticmethod
+    def reserve_many(team_id, emails, key_id=None, ttl=SEAT_RESERVATION_TTL):
+        """
+        在同一事务中按顺序为每个邮箱预占一个名额，返回预占 ID 列表（与 emails 前几个一一对应）；
+        名额不足时只预占前面的邮箱
+        """
+        def _reserve():
+            now = int(time.time())
+            reserved = []
+            with get_db() as conn:
+                cursor = conn.cursor()
+                # 先执行写语句取得写锁，后面的名额判断和插入不会与其他预占交错
+                cursor.execute('DELETE FROM seat_reservations WHERE team_id = ? AND expires_at <= ?',
+                               (team_id, now))
+                for email in emails:
+                    # 每次插入都重新计数，同一事务中前面的预占同样计入
+                    cursor.execute(f'''
+                        INSERT INTO seat_reservations (team_id, email, key_id, expires_at)
+                        SELECT id, ?, ?, ? FROM teams
+                        WHERE id = ?
+                          AND success_members + (
+                              SELECT COUNT(*) FROM seat_reservations
+                              WHERE team_id = ? AND expires_at > ?
+                          ) < {TEAM_SEATS}
+                    ''', (email, key_id, now + ttl, team_id, team_id, now))
+                    if not cursor.rowcount:
+                        break
+                    reserved.append(cursor.lastrowid)
+            return reserved, now + ttl
+
+        reserved, expires_at = execute_with_retry(_reserve)
+        if reserved:
+            events.emit('seats_changed', team_ids=[team_id], reserved=[(team_id, expires_at)] * len(reserved))
+        else:
+            # 一个都没有预占到：内存中的名额已过时（如其他进程的预占），通知重新读取该 Team
+            events.emit('seats_changed', team_ids=[team_id])
+        return reserved
+
+    @staticmethod
+    def release(reservation_id):
+        """释放预占（邀请失败）"""
+        SeatReservation.release_many([reservation_id])
+
+    @staticmethod
+    def release_many(reservation_ids):
+        """在一个事务中释放多个预占"""
+        if not reservation_ids:
+            return
+
+        def _release():
+            with get_db() as conn:
+                return _delete_reservations(conn, reservation_ids)
+
+        released = execute_with_retry(_release)
+        if released:
+            events.emit('seats_changed', team_ids=sorted({team_id for team_id, _ in released}), released=released)
+
+    @staticmethod
+    def fulfill(reservation_id, team_id, email, **invitation):
+        """邀请成功：在同一事务中写入邀请记录（参数同 Invitation.create）并删除预占，返回邀请记录 ID"""
+        params = _invitation_params(dict(invitation, team_id=team_id, email=email))
+        with get_db() as conn:
+            created = _insert_invitations(conn.cursor(), [params])
+            released = _delete_reservations(conn, [reservation_id])
+        # 事务提交后再发出事件
+        _emit_invitations_created(created)
+        events.emit('seats_changed', team_ids=[team_id], released=released)
+        return created[0][0]
+
+    @staticmethod
+    def fulfill_many(reservation_ids, rows):
+        """批量邀请成功：在同一事务中写入邀请记录（rows 同 Invitation.create_many）并删除这些预占，返回写入条数"""
+        params = [_invitation_params(row) for row in rows]
+        with get_db() as conn:
+            created = _insert_invitations(conn.cursor(), params, replace=True)
+            released = _delete_reservations(conn, reservation_ids)
+        # 事务提交后再发出事件
+        _emit_invitations_created(created)
+        team_ids = sorted({p[0] for p in params} | {team_id for team_id, _ in released})
+        if team_ids:
+            events.emit('seats_changed', team_ids=team_ids, released=released)
+        return len(params)
+
+
 class Invitation:
     @staticmethod
     def create(team_id, email, key_id=None, user_id=None, invite_id=None,
                status='pending', is_temp=False, temp_expire_at=None):
-        """创建邀请记录"""
+        """创建邀请记录（temp_expire_at 为 UTC 时间，同时写入整数时间戳 temp_expire_ts）"""
+        params = _invitation_params({'team_id': team_id, 'email': email, 'key_id': key_id, 'user_id': user_id,
+                                     'invite_id': invite_id, 'status': status, 'is_temp': is_temp,
+                                     'temp_expire_at': temp_expire_at})
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO invitations (team_id, key_id, email, user_id, invite_id,
-                                        status, is_temp, temp_expire_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (team_id, key_id, email, user_id, invite_id, status, is_temp, temp_expire_at))
-            return cursor.lastrowid
+            created = _insert_invitations(conn.cursor(), [params])
+        _emit_invitations_created(created)
+        return created[0][0]
+
+    @staticmethod
+    def create_many(rows):
+        """
+        在一个事务中批量写入邀请记录，rows 为包含 team_id、email 及可选 key_id / invite_id / status /
+        is_temp / temp_expire_at 的字典；同一 Team 下同邮箱的旧记录（如 failed）先删除，返回写入条数
+        """
+        params = [_invitation_params(row) for row in rows]
+        if not params:
+            return 0
+        with get_db() as conn:
+            created = _insert_invitations(conn.cursor(), params, replace=True)
+        _emit_invitations_created(created)
+        return len(params)
 
     @staticmethod
     def get_by_team(team_id):
         """获取 Team 的所有邀请"""
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM invitations
+            return _fetch_records(conn, InvitationRecord, f'''
+                SELECT {_column_list(INVITATION_COLUMNS)} FROM invitations
                 WHERE team_id = ?
                 ORDER BY created_at DESC
             ''', (team_id,))
-            return [dict(row) for row in cursor.fetchall()]
 
     @staticmethod
-    def get_all():
-        """获取所有邀请"""
+    def get_all(limit=None, cursor=None, team_id=None, status=None, email_prefix=None,
+                created_from=None, created_to=None):
+        """
+        获取邀请记录，按创建时间倒序
+        传入 limit 时按 (created_at, id) 游标分页；email_prefix 不区分大小写
+        """
+        conditions, params = _keyset_filters('i', cursor, created_from, created_to)
+        if team_id:
+            conditions.append('i.team_id = ?')
+            params.append(team_id)
+        if status:
+            conditions.append('i.status = ?')
+            params.append(status)
+        if email_prefix:
+            _prefix_filter('lower(i.email)', email_prefix.lower(), conditions, params)
+
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT i.*, t.name as team_name
+            # 管理后台列表只需要展示用的列
+            return _keyset_select(conn, '''
+                SELECT i.id, i.team_id, i.email, i.status, i.is_temp, i.temp_expire_at,
+                       i.is_confirmed, i.created_at, t.name as team_name
                 FROM invitations i
                 JOIN teams t ON i.team_id = t.id
-                ORDER BY i.created_at DESC
-            ''')
-            return [dict(row) for row in cursor.fetchall()]
+            ''', 'i', conditions, params, limit, InvitationRecord)
 
     @staticmethod
     def get_all_emails_by_team(team_id):
@@ -675,6 +1472,17 @@ class Invitation:
             ''', (team_id,))
             return [row[0] for row in cursor.fetchall()]
 
+    @staticmethod
+    def get_emails_grouped_by_team():
+        """一次查询获取所有 Team 的已邀请邮箱（小写），返回 {team_id: set(email)}，供批量扫描使用"""
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT DISTINCT team_id, lower(email) FROM invitations')
+            grouped = {}
+            for team_id, email in cursor.fetchall():
+                grouped.setdefault(team_id, set()).add(email)
+            return grouped
+
     @staticmethod
     def get_success_count_by_team(team_id):
         """获取 Team 的成功邀请数量（用于判断Team是否已满）"""
@@ -687,19 +1495,33 @@ class Invitation:
             return cursor.fetchone()[0]
 
     @staticmethod
-    def get_temp_expired():
-        """获取所有已过期的临时邀请（使用UTC时间比较）"""
+    def get_temp_expired(invitation_ids=None):
+        """获取已过期且未确认的临时邀请（按 UTC 时间戳比较）；传入 invitation_ids 时只在这些邀请中查找"""
+        conditions = ['is_temp = 1', 'is_confirmed = 0', 'temp_expire_ts <= ?']
+        params = [int(time.time())]
+        if invitation_ids is not None:
+            invitation_ids = list(invitation_ids)
+            if not invitation_ids:
+                return []
+            conditions.append(f"id IN ({', '.join('?' * len(invitation_ids))})")
+            params.extend(invitation_ids)
+        with get_db() as conn:
+            return _fetch_records(conn, InvitationRecord, f'''
+                SELECT id, team_id, email, user_id, temp_expire_at, temp_expire_ts FROM invitations
+                WHERE {' AND '.join(conditions)}
+                ORDER BY temp_expire_ts
+            ''', params)
+
+    @staticmethod
+    def get_temp_schedule():
+        """获取所有未确认临时邀请的 (id, temp_expire_ts)，用于启动时重建到期调度"""
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT * FROM invitations
-                WHERE is_temp = 1
-                  AND is_confirmed = 0
-                  AND temp_expire_at IS NOT NULL
-                  AND datetime(temp_expire_at) < datetime('now')
-                ORDER BY temp_expire_at
+                SELECT id, temp_expire_ts FROM invitations
+                WHERE is_temp = 1 AND is_confirmed = 0 AND temp_expire_ts IS NOT NULL
             ''')
-            return [dict(row) for row in cursor.fetchall()]
+            return cursor.fetchall()
 
     @staticmethod
     def confirm(invitation_id):
@@ -711,6 +1533,7 @@ class Invitation:
                 SET is_confirmed = 1
                 WHERE id = ?
             ''', (invitation_id,))
+        events.emit('invitation_confirmed', id=invitation_id)
 
     @staticmethod
     def update_user_id(invitation_id, user_id):
@@ -737,6 +1560,29 @@ class Invitation:
             ''', (email,))
             return [row[0] for row in cursor.fetchall()]
 
+    @staticmethod
+    def get_teams_by_emails(emails):
+        """批量查找邮箱所在的 Team（成功邀请记录），返回 {小写邮箱: [team_id, ...]}，最近邀请的在前"""
+        emails = list({email.lower() for email in emails})
+        grouped = {}
+        with get_db() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(emails), 500):
+                chunk = emails[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT lower(email), team_id
+                    FROM invitations
+                    WHERE lower(email) IN ({placeholders})
+                      AND status = 'success'
+                    ORDER BY created_at DESC
+                ''', chunk)
+                for email, team_id in cursor.fetchall():
+                    team_ids = grouped.setdefault(email, [])
+                    if team_id not in team_ids:
+                        team_ids.append(team_id)
+        return grouped
+
     @staticmethod
     def delete_by_email(team_id, email):
         """删除指定team中指定email的邀请记录（线程安全版本，带重试机制）"""
@@ -749,20 +1595,68 @@ class Invitation:
                 ''', (team_id, email))
                 return cursor.rowcount > 0
 
-        return execute_with_retry(_delete)
+        deleted = execute_with_retry(_delete)
+        if deleted:
+            events.emit('seats_changed', team_ids=[team_id])
+        return deleted
+
+    @staticmethod
+    def delete_many(pairs):
+        """在一个事务中删除多组 (team_id, email) 的邀请记录（邮箱不区分大小写），返回删除条数"""
+        pairs = list(pairs)
+        if not pairs:
+            return 0
+
+        def _delete():
+            with get_db() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    DELETE FROM invitations
+                    WHERE team_id = ? AND LOWER(email) = LOWER(?)
+                ''', pairs)
+                return cursor.rowcount
+
+        deleted = execute_with_retry(_delete)
+        if deleted:
+            events.emit('seats_changed', team_ids=sorted({team_id for team_id, _ in pairs}))
+        return deleted
+
+    @staticmethod
+    def delete_by_emails(emails):
+        """删除这些邮箱在所有 Team 的邀请记录，返回 {小写邮箱: [team_id, ...]}"""
+        emails = list({email.lower() for email in emails})
+
+        def _delete():
+            deleted = {}
+            with get_db() as conn:
+                cursor = conn.cursor()
+                for start in range(0, len(emails), 500):
+                    chunk = emails[start:start + 500]
+                    placeholders = ', '.join('?' * len(chunk))
+                    cursor.execute(f'''
+                        DELETE FROM invitations
+                        WHERE lower(email) IN ({placeholders})
+                        RETURNING lower(email), team_id
+                    ''', chunk)
+                    for email, team_id in cursor.fetchall():
+                        deleted.setdefault(email, []).append(team_id)
+            return deleted
+
+        deleted = execute_with_retry(_delete)
+        if deleted:
+            events.emit('seats_changed', team_ids=sorted({t for team_ids in deleted.values() for t in team_ids}))
+        return deleted
 
     @staticmethod
     def get_by_user_id(team_id, user_id):
         """根据user_id获取邀请记录"""
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM invitations
+            return _fetch_record(conn, InvitationRecord, '''
+                SELECT id, team_id, email, user_id, status, is_temp, temp_expire_at, is_confirmed
+                FROM invitations
                 WHERE team_id = ? AND user_id = ?
                 LIMIT 1
             ''', (team_id, user_id))
-            row = cursor.fetchone()
-            return dict(row) if row else None
 
 
 class AutoKickConfig:
@@ -810,35 +1704,51 @@ class AutoKickConfig:
 class KickLog:
     @staticmethod
     def create(team_id, user_id, email, reason, success=True, error_message=None):
-        """创建踢人日志（线程安全版本，带重试机制）"""
-        def _create():
-            with get_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO kick_logs (team_id, user_id, email, reason, success, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (team_id, user_id, email, reason, success, error_message))
-                return cursor.lastrowid
-        
-        return execute_with_retry(_create)
+        """创建踢人日志（由后台审计写入线程批量提交，不阻塞踢人线程）"""
+        _audit_writer.submit('''
+            INSERT INTO kick_logs (team_id, user_id, email, reason, success, error_message)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (team_id, user_id, email, reason, success, error_message))
+
+    @staticmethod
+    def create_many(logs):
+        """
+        批量创建踢人日志，logs 为包含 team_id、user_id、email、reason 及可选 success / error_message 的字典；
+        连续提交给后台审计写入线程，合并在同一批事务中提交
+        """
+        for log in logs:
+            KickLog.create(log['team_id'], log['user_id'], log['email'], log['reason'],
+                           success=log.get('success', True), error_message=log.get('error_message'))
 
     @staticmethod
-    def get_all(limit=100):
-        """获取所有踢人日志"""
+    def get_all(limit=100, cursor=None, team_id=None, status=None, email_prefix=None,
+                created_from=None, created_to=None):
+        """
+        获取踢人日志，按创建时间倒序
+        按 (created_at, id) 游标分页；status: 'success' 成功 / 'failed' 失败
+        """
+        flush_audit_writes()
+        conditions, params = _keyset_filters('k', cursor, created_from, created_to)
+        if team_id:
+            conditions.append('k.team_id = ?')
+            params.append(team_id)
+        if status in ('success', 'failed'):
+            conditions.append('k.success = ?')
+            params.append(1 if status == 'success' else 0)
+        if email_prefix:
+            _prefix_filter('lower(k.email)', email_prefix.lower(), conditions, params)
+
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
+            return _keyset_select(conn, '''
                 SELECT k.*, t.name as team_name
                 FROM kick_logs k
                 JOIN teams t ON k.team_id = t.id
-                ORDER BY k.created_at DESC
-                LIMIT ?
-            ''', (limit,))
-            return [dict(row) for row in cursor.fetchall()]
+            ''', 'k', conditions, params, limit)
 
     @staticmethod
     def get_by_team(team_id, limit=50):
         """获取指定 Team 的踢人日志"""
+        flush_audit_writes()
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -855,17 +1765,17 @@ class LoginAttempt:
 
     @staticmethod
     def record(ip_address, username=None, success=False):
-        """记录登录尝试"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO login_attempts (ip_address, username, success)
-                VALUES (?, ?, ?)
-            ''', (ip_address, username, success))
+        """记录登录尝试（由后台审计写入线程批量提交）"""
+        _audit_writer.submit('''
+            INSERT INTO login_attempts (ip_address, username, success)
+            VALUES (?, ?, ?)
+        ''', (ip_address, username, success))
 
     @staticmethod
     def get_recent_failures(ip_address, minutes=30):
         """获取最近 N 分钟内的失败次数"""
+        # 先等待排队中的登录记录落库，保证刚失败的尝试被计入
+        flush_audit_writes()
         with get_db() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -898,115 +1808,47 @@ class LoginAttempt:
 class Order:
     """小红书订单管理"""
     
-    @staticmethod
-    def create_table():
-        """创建订单表（如果不存在）"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_number TEXT NOT NULL UNIQUE,
-                    key_id INTEGER,
-                    is_used BOOLEAN DEFAULT 0,
-                    user_email TEXT,
-                    extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    used_at TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (key_id) REFERENCES access_keys (id) ON DELETE SET NULL
-                )
-            ''')
-            
-            # 创建索引加速查询
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_orders_number
-                ON orders(order_number)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_orders_used
-                ON orders(is_used, created_at)
-            ''')
-    
     @staticmethod
     def create(order_number):
         """
         创建订单记录并自动生成关联的访问密钥
-        返回 (order_id, key_code)
+        返回 {'id', 'key_id', 'key_code'}，订单已存在时返回 None
         """
-        # 检查订单是否已存在
-        existing = Order.get_by_number(order_number)
-        if existing:
-            return None  # 订单已存在
-        
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            try:
-                # 开启事务（SQLite默认在with语句中自动开启，但显式处理更安全）
-                # 1. 先检查订单是否存在（防止重复）
-                cursor.execute('SELECT id FROM orders WHERE order_number = ?', (order_number,))
-                if cursor.fetchone():
-                    return None
-
-                # 2. 检查 AccessKey 是否存在（防止冲突）
-                cursor.execute('SELECT id FROM access_keys WHERE key_code = ?', (order_number,))
-                existing_key = cursor.fetchone()
-                
-                if existing_key:
-                    # 如果 Key 已存在但 Order 不存在，直接关联
-                    key_id = existing_key[0]
-                else:
-                    # 创建新的访问密钥
-                    cursor.execute('''
-                        INSERT INTO access_keys (key_code, is_temp, temp_hours)
-                        VALUES (?, 0, 0)
-                    ''', (order_number,))
-                    key_id = cursor.lastrowid
-                
-                # 3. 创建订单记录
-                cursor.execute('''
-                    INSERT INTO orders (order_number, key_id)
-                    VALUES (?, ?)
-                ''', (order_number, key_id))
-                order_id = cursor.lastrowid
-                
-                return {'id': order_id, 'key_id': key_id, 'key_code': order_number}
-                
-            except sqlite3.IntegrityError:
-                # 发生冲突时回滚（with get_db() 会自动回滚）
-                return None
-            except Exception as e:
-                print(f"创建订单失败: {e}")
-                raise e
+        result = Order.batch_create([order_number])
+        return result['orders'][0] if result['orders'] else None
     
     @staticmethod
     def get_by_number(order_number):
         """根据订单号查询"""
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT o.*, ak.key_code
+            return _fetch_record(conn, OrderRecord, f'''
+                SELECT {_column_list(ORDER_COLUMNS, 'o')}, ak.key_code
                 FROM orders o
                 LEFT JOIN access_keys ak ON o.key_id = ak.id
                 WHERE o.order_number = ?
             ''', (order_number,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
     
     @staticmethod
-    def get_all(limit=1000, offset=0):
-        """获取所有订单"""
+    def get_all(limit=1000, cursor=None, status=None, email_prefix=None, created_from=None, created_to=None):
+        """
+        获取订单，按创建时间倒序
+        按 (created_at, id) 游标分页；status: 'used' 已使用 / 'unused' 未使用；
+        email_prefix 匹配使用者邮箱
+        """
+        conditions, params = _keyset_filters('o', cursor, created_from, created_to)
+        if status in ('used', 'unused'):
+            conditions.append('o.is_used = ?')
+            params.append(1 if status == 'used' else 0)
+        if email_prefix:
+            _prefix_filter('lower(o.user_email)', email_prefix.lower(), conditions, params)
+
         with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT o.*, ak.key_code,
+            return _keyset_select(conn, f'''
+                SELECT {_column_list(ORDER_COLUMNS, 'o')}, ak.key_code,
                        (SELECT COUNT(*) FROM invitations WHERE key_id = o.key_id) as usage_count
                 FROM orders o
                 LEFT JOIN access_keys ak ON o.key_id = ak.id
-                ORDER BY o.created_at DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
-            return [dict(row) for row in cursor.fetchall()]
+            ''', 'o', conditions, params, limit, OrderRecord)
     
     @staticmethod
     def get_unused_count():
@@ -1047,7 +1889,8 @@ class Order:
             # 今日新增订单
             cursor.execute('''
                 SELECT COUNT(*) FROM orders
-                WHERE DATE(extracted_at) = DATE('now')
+                WHERE extracted_at >= DATE('now')
+                  AND extracted_at < DATE('now', '+1 day')
             ''')
             today = cursor.fetchone()[0]
             
@@ -1059,26 +1902,55 @@ class Order:
             }
     
     @staticmethod
-    def batch_create(order_numbers):
+    def batch_create(order_numbers, chunk_size=500):
         """
-        批量创建订单
+        批量创建订单（单事务、按块集合写入）
+        已存在的订单和批内重复的订单号计为跳过；
+        若同名访问密钥已存在但订单不存在，直接关联该密钥
         返回 {'created': count, 'skipped': count, 'orders': [...]}
         """
-        created_count = 0
-        skipped_count = 0
-        created_orders = []
-        
-        for order_number in order_numbers:
-            result = Order.create(order_number)
-            if result:
-                created_count += 1
-                created_orders.append(result)
-            else:
-                skipped_count += 1
-        
+        order_numbers = list(order_numbers)
+        unique_numbers = list(dict.fromkeys(order_numbers))  # 批内去重并保持顺序
+        created = {}
+
+        with get_db() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(unique_numbers), chunk_size):
+                chunk = unique_numbers[start:start + chunk_size]
+                placeholders = ', '.join('?' * len(chunk))
+
+                # 1. 过滤已存在的订单
+                cursor.execute(f'SELECT order_number FROM orders WHERE order_number IN ({placeholders})', chunk)
+                existing = {row[0] for row in cursor.fetchall()}
+                new_numbers = [n for n in chunk if n not in existing]
+                if not new_numbers:
+                    continue
+                placeholders = ', '.join('?' * len(new_numbers))
+
+                # 2. 创建访问密钥（已存在的密钥保留并复用）
+                cursor.executemany('''
+                    INSERT OR IGNORE INTO access_keys (key_code, is_temp, temp_hours)
+                    VALUES (?, 0, 0)
+                ''', [(n,) for n in new_numbers])
+
+                # 3. 创建订单记录并关联密钥
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO orders (order_number, key_id)
+                    SELECT key_code, id FROM access_keys
+                    WHERE key_code IN ({placeholders})
+                    RETURNING id, key_id, order_number
+                ''', new_numbers)
+                for row in cursor.fetchall():
+                    created[row['order_number']] = {
+                        'id': row['id'],
+                        'key_id': row['key_id'],
+                        'key_code': row['order_number']
+                    }
+
+        created_orders = [created[n] for n in unique_numbers if n in created]
         return {
-            'created': created_count,
-            'skipped': skipped_count,
+            'created': len(created_orders),
+            'skipped': len(order_numbers) - len(created_orders),
             'orders': created_orders
         }
 
@@ -1086,32 +1958,6 @@ class Order:
 class XHSConfig:
     """小红书配置管理"""
     
-    @staticmethod
-    def create_table():
-        """创建配置表（如果不存在）"""
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS xhs_config (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cookies TEXT,
-                    last_sync_at TIMESTAMP,
-                    sync_enabled BOOLEAN DEFAULT 0,
-                    sync_interval_hours INTEGER DEFAULT 6,
-                    last_error TEXT,
-                    error_count INTEGER DEFAULT 0,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # 插入默认配置（如果不存在）
-            cursor.execute('SELECT COUNT(*) FROM xhs_config')
-            if cursor.fetchone()[0] == 0:
-                cursor.execute('''
-                    INSERT INTO xhs_config (sync_enabled, sync_interval_hours)
-                    VALUES (0, 6)
-                ''')
-    
     @staticmethod
     def get():
         """获取配置"""
@@ -1183,14 +2029,7 @@ class XHSConfig:
             return None
         
         try:
-            import json
             return json.loads(config['cookies'])
         except:
             return None
 
-
-# 初始化新表
-def init_xhs_tables():
-    """初始化小红书相关表"""
-    Order.create_table()
-    XHSConfig.create_table()
@@ -0,0 +1,45 @@
+"""
+进程内事件通知
+
+数据写入方（如 database.Invitation）在提交后调用 emit() 发布事件，
+关心这些变化的内存结构（如临时邀请到期调度器）通过 subscribe() 订阅，
+避免写入方直接依赖这些模块。处理函数同步执行，应尽量轻量（只更新内存结构），
+处理函数抛出的异常会被记录并忽略，不影响写入方。
+
+事件名:
+    invitation_created    id, team_id, email, status, is_temp, temp_expire_ts
+    invitation_confirmed  id
+    seats_changed         team_ids（名额预占变化、邀请记录被删除），预占变化时另有
+                          reserved / released：新增 / 删除的预占 [(team_id, expires_at)]
+    team_invited          team_id, ts（最后邀请时间更新）
+    teams_changed         （Team 新增/修改/删除、token 状态变化）
+    member_kicked         account_id, user_id（发出踢人请求后，无论是否成功）
+"""
+import threading
+
+_handlers = {}
+_lock = threading.Lock()
+
+
+def subscribe(event, handler):
+    """订阅事件，handler 以关键字参数接收事件内容"""
+    with _lock:
+        _handlers.setdefault(event, []).append(handler)
+
+
+def unsubscribe(event, handler):
+    with _lock:
+        handlers = _handlers.get(event, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+
+def emit(event, **payload):
+    """发布事件"""
+    with _lock:
+        handlers = list(_handlers.get(event, ()))
+    for handler in handlers:
+        try:
+            handler(**payload)
+        except Exception as e:
+            print(f"⚠️  事件 {event} 处理出错: {str(e)}")
@@ -0,0 +1,139 @@
+"""
+临时邀请到期调度器
+
+内存中维护一个按到期时间排序的最小堆，后台线程睡到最早的到期时间后立即处理，
+不再等待自动检测的下一轮全量扫描，也不受检测运行时段限制。
+
+- 启动时从数据库 (Invitation.get_temp_schedule) 重建堆
+- 通过 events 订阅 invitation_created / invitation_confirmed，新建或确认邀请时更新堆
+- 同时到期的邀请合并为一批，交给 AutoKickService.kick_expired_invitations 处理
+  （按 Team 分组，每个 Team 只获取一次成员列表）；处理失败的邀请 EXPIRY_RETRY_DELAY 秒后重试
+
+被删除或已确认的邀请不需要从堆中移除：处理前会按数据库中的最新状态重新过滤。
+"""
+import heapq
+import threading
+import time
+
+import events
+from database import Invitation
+from auto_kick_service import auto_kick_service
+from config import EXPIRY_RETRY_DELAY
+
+
+class ExpiryScheduler:
+    """临时邀请到期调度（线程安全）"""
+
+    def __init__(self, handler, retry_delay=EXPIRY_RETRY_DELAY):
+        self.handler = handler
+        self.retry_delay = retry_delay
+        self._cond = threading.Condition()
+        self._heap = []  # [(到期时间戳, invitation_id)]
+        self._deadlines = {}  # invitation_id -> 当前有效的到期时间戳（堆中其他条目视为已失效）
+        self._running = False
+        self._thread = None
+        self._stats = {'scheduled': 0, 'cancelled': 0, 'fired': 0, 'retried': 0, 'batches': 0, 'max_lag_ms': 0}
+
+        events.subscribe('invitation_created', self._on_created)
+        events.subscribe('invitation_confirmed', self._on_confirmed)
+
+    def start(self):
+        """从数据库重建调度并启动后台线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        schedule = Invitation.get_temp_schedule()
+        for invitation_id, expire_ts in schedule:
+            self.schedule(invitation_id, expire_ts)
+        self._thread = threading.Thread(target=self._run, daemon=True, name='expiry-scheduler')
+        self._thread.start()
+        print(f"✅ 临时邀请到期调度已启动，待处理 {len(schedule)} 个")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def schedule(self, invitation_id, expire_ts):
+        """添加或更新一个邀请的到期时间"""
+        with self._cond:
+            self._deadlines[invitation_id] = expire_ts
+            heapq.heappush(self._heap, (expire_ts, invitation_id))
+            self._stats['scheduled'] += 1
+            # 新的到期时间早于当前等待的目标时唤醒调度线程
+            if self._heap[0] == (expire_ts, invitation_id):
+                self._cond.notify()
+
+    def cancel(self, invitation_id):
+        with self._cond:
+            if self._deadlines.pop(invitation_id, None) is not None:
+                self._stats['cancelled'] += 1
+
+    def _on_created(self, id, is_temp, temp_expire_ts, **_):
+        if is_temp and temp_expire_ts is not None:
+            self.schedule(id, temp_expire_ts)
+
+    def _on_confirmed(self, id, **_):
+        self.cancel(id)
+
+    def _pop_due(self):
+        """等待到最早的到期时间，弹出一批到期的邀请 ID（停止时返回 None）"""
+        with self._cond:
+            while self._running:
+                # 丢弃已取消或已被更新到期时间的条目
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                expire_ts = self._heap[0][0]
+                if expire_ts > now:
+                    self._cond.wait(expire_ts - now)
+                    continue
+
+                due = []
+                lag_ms = round((now - expire_ts) * 1000)
+                while self._heap and self._heap[0][0] <= now:
+                    expire_ts, invitation_id = heapq.heappop(self._heap)
+                    if self._deadlines.get(invitation_id) == expire_ts:
+                        del self._deadlines[invitation_id]
+                        due.append(invitation_id)
+                if due:
+                    self._stats['fired'] += len(due)
+                    self._stats['batches'] += 1
+                    self._stats['max_lag_ms'] = max(self._stats['max_lag_ms'], lag_ms)
+                    return due
+            return None
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if due is None:
+                return
+            try:
+                retry = self.handler(due) or []
+            except Exception as e:
+                print(f"❌ 处理到期临时邀请出错: {str(e)}")
+                retry = due
+            if retry:
+                retry_at = int(time.time() + self.retry_delay)
+                with self._cond:
+                    self._stats['retried'] += len(retry)
+                for invitation_id in retry:
+                    self.schedule(invitation_id, retry_at)
+
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._deadlines)
+            stats['next_expire_in'] = (round(min(self._deadlines.values()) - time.time(), 1)
+                                       if self._deadlines else None)
+            stats['running'] = self._running
+        return stats
+
+
+expiry_scheduler = ExpiryScheduler(auto_kick_service.kick_expired_invitations)
@@ -0,0 +1,139 @@
+"""
+邀请结果验证
+
+邀请接口返回失败时，邀请有时实际已经生效（上游同步有延迟）。
+这里并发查询待处理邀请列表和成员列表，短间隔指数退避（带随机抖动）重试，
+邮箱一出现立即返回，直到截止时间为止；同时记录从开始验证到邮箱出现的耗时，
+用于根据实际数据调整 INVITE_VERIFY_TIMEOUT 等参数。
+"""
+import concurrent.futures
+import random
+import threading
+import time
+from collections import deque
+
+from chatgpt_client import chatgpt_client
+from config import (INVITE_VERIFY_TIMEOUT, INVITE_VERIFY_BACKOFF_INITIAL, INVITE_VERIFY_BACKOFF_MAX,
+                    INVITE_VERIFY_WORKERS, INVITE_VERIFY_SAMPLES, CHATGPT_READ_TIMEOUT)
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class InviteVerifier:
+    """轮询验证邀请是否实际生效（线程安全）"""
+
+    def __init__(self, client=chatgpt_client, workers=INVITE_VERIFY_WORKERS):
+        self.client = client
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                               thread_name_prefix='invite-verify')
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=INVITE_VERIFY_SAMPLES)
+        self._stats = {
+            'verifications': 0,
+            'found_pending': 0,
+            'found_member': 0,
+            'not_found': 0,
+            'polls': 0
+        }
+
+    def _pending_emails(self, team, read_timeout):
+        """待处理邀请中的邮箱集合（小写），请求失败返回空集合"""
+        try:
+            response = self.client.get_invites(team['access_token'], team['account_id'],
+                                               read_timeout=read_timeout, max_wait=read_timeout)
+            if response.status_code != 200:
+                return set()
+            return {inv.get('email_address', '').lower() for inv in response.json().get('items', [])}
+        except Exception:
+            return set()
+
+    def _member_emails(self, team, read_timeout):
+        """成员列表中的邮箱集合（小写），请求失败返回空集合"""
+        try:
+            response = self.client.get_members(team['access_token'], team['account_id'], read_timeout=read_timeout,
+                                               use_cache=False, max_wait=read_timeout)
+            if response.status_code != 200:
+                return set()
+            return {m.get('email', '').lower() for m in response.json().get('items', [])}
+        except Exception:
+            return set()
+
+    def verify(self, team, email, timeout=INVITE_VERIFY_TIMEOUT):
+        """
+        在 timeout 秒内确认 email 是否已在 Team 的待处理邀请或成员列表中
+        返回 {'found': bool, 'source': 'pending' / 'member' / None, 'elapsed_ms': int, 'polls': int}
+        """
+        return self.verify_many(team, [email], timeout)[email.lower()]
+
+    def verify_many(self, team, emails, timeout=INVITE_VERIFY_TIMEOUT):
+        """
+        同一个 Team 的多个邮箱共用每一轮查询，返回 {小写邮箱: verify() 的结果}
+        所有邮箱都出现或到达截止时间时返回
+        """
+        waiting = {email.lower() for email in emails}
+        checks = (('pending', self._pending_emails), ('member', self._member_emails))
+        start = time.monotonic()
+        deadline = start + timeout
+        delay = INVITE_VERIFY_BACKOFF_INITIAL
+        polls = 0
+        found = {}  # 邮箱 -> (来源, 耗时 ms)
+
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            polls += 1
+            read_timeout = max(0.5, min(remaining, CHATGPT_READ_TIMEOUT))
+            futures = {self._executor.submit(check, team, read_timeout): name for name, check in checks}
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout=remaining):
+                    elapsed_ms = round((time.monotonic() - start) * 1000)
+                    for email in waiting & future.result():
+                        found[email] = (futures[future], elapsed_ms)
+                    waiting.difference_update(found)
+                    if not waiting:
+                        break
+            except concurrent.futures.TimeoutError:
+                break
+            if waiting:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, delay * random.uniform(0.7, 1.3)))
+                delay = min(delay * 2, INVITE_VERIFY_BACKOFF_MAX)
+
+        elapsed_ms = round((time.monotonic() - start) * 1000)
+        results = {}
+        with self._lock:
+            self._stats['polls'] += polls
+            for email in {email.lower() for email in emails}:
+                self._stats['verifications'] += 1
+                if email in found:
+                    source, found_ms = found[email]
+                    self._stats[f"found_{source}"] += 1
+                    self._samples.append(found_ms)
+                    results[email] = {'found': True, 'source': source, 'elapsed_ms': found_ms, 'polls': polls}
+                else:
+                    self._stats['not_found'] += 1
+                    results[email] = {'found': False, 'source': None, 'elapsed_ms': elapsed_ms, 'polls': polls}
+        return results
+
+    def get_stats(self):
+        """获取验证统计信息，propagation_ms 为邮箱出现所需时间的分布"""
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._samples)
+        stats['avg_polls'] = round(stats['polls'] / stats['verifications'], 2) if stats['verifications'] else 0
+        stats['propagation_ms'] = {
+            'samples': len(samples),
+            'p50': _percentile(samples, 0.5) if samples else None,
+            'p90': _percentile(samples, 0.9) if samples else None,
+            'max': samples[-1] if samples else None
+        }
+        return stats
+
+
+invite_verifier = InviteVerifier()
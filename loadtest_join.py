@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+压测：/api/join 端到端并发表现
+
+在临时数据库中写入 N 个空 Team 和 M 个访问密钥（或订单号密钥），启动本地模拟 backend-api
+(mock_backend.py) 和多线程的应用服务，按目标 RPS 开环发送 /api/join 请求（每个请求一个新邮箱和一个未用过的密钥）。
+
+统计:
+    - 延迟 p50 / p95 / p99 / max（从计划发送时间算起，客户端排队也计入，避免协调遗漏）
+    - 成功率、「所有 Team 名额已满」比例、其他失败
+    - 数据库锁重试 / 锁错误次数（连接池统计）
+    - 超额分配的 Team：数据库成功邀请数或模拟接口中的成员 + 待处理邀请数超过 4 个
+
+结果保存为 JSON，--compare 可与之前的结果对比:
+    python3 loadtest_join.py --teams 50 --keys 250 --rps 40
+    python3 loadtest_join.py --teams 50 --keys 250 --rps 40 --compare loadtest_join_20250101_120000.json
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from mock_backend import start_mock_backend
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def seed(team_count, key_count, key_kind, temp_hours):
+    """写入 Team 和密钥，返回密钥列表（数据库在导入 app_new 时已按 DATABASE_PATH 初始化）"""
+    import database
+    from database import get_db, Order
+
+    with get_db() as conn:
+        conn.executemany(
+            'INSERT INTO teams (name, account_id, access_token, organization_id, email) VALUES (?, ?, ?, ?, ?)',
+            [(f"team-{n}", f"acct-{n}", 'token', f"org-{n}", f"owner{n}@example.com")
+             for n in range(1, team_count + 1)]
+        )
+    database._team_cache.invalidate()
+
+    if key_kind == 'order':
+        # 订单号密钥：P 开头的订单号本身就是访问密钥
+        orders = Order.batch_create([f"P{20250000000000 + i}" for i in range(key_count)])['orders']
+        return [order['key_code'] for order in orders]
+
+    codes = [f"loadtest-key-{i:06d}" for i in range(key_count)]
+    with get_db() as conn:
+        conn.executemany(
+            'INSERT INTO access_keys (key_code, is_temp, temp_hours) VALUES (?, ?, ?)',
+            [(code, temp_hours > 0, temp_hours) for code in codes]
+        )
+    return codes
+
+
+def classify(status, payload):
+    if payload is None:
+        return 'transport_error'
+    if status == 200 and payload.get('success'):
+        return 'success'
+    error = payload.get('error', '')
+    if '名额已满' in error or '无可用 Team' in error:
+        return 'all_full'
+    if '无效的访问密钥' in error:
+        return 'invalid_key'
+    if '超时' in error:
+        return 'timeout'
+    return 'failed'
+
+
+def send_join(url, email, key_code, timeout):
+    body = json.dumps({'email': email, 'key_code': key_code}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read())
+        except ValueError:
+            return e.code, {}
+    except Exception:
+        return None, None
+
+
+def run_load(url, keys, rps, concurrency, timeout):
+    """开环发送：第 i 个请求计划在 start + i / rps 发出，返回每个请求的结果"""
+    results = []
+    lock = threading.Lock()
+
+    def task(i, scheduled):
+        status, payload = send_join(url, f"loadtest{i}@example.com", keys[i], timeout)
+        latency = time.perf_counter() - scheduled
+        outcome = classify(status, payload)
+        timing = (payload or {}).get('timing') or {}
+        with lock:
+            results.append({'i': i, 'status': status, 'outcome': outcome, 'latency_ms': round(latency * 1000, 1),
+                            'slowest_step': timing.get('slowest_step'), 'team': (payload or {}).get('team_name')})
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        futures = []
+        for i in range(len(keys)):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(task, i, scheduled))
+        concurrent.futures.wait(futures)
+        duration = time.perf_counter() - start
+    return sorted(results, key=lambda r: r['i']), duration
+
+
+def oversubscribed_teams(mock_state):
+    """数据库或模拟接口中名额超过 TEAM_SEATS 的 Team"""
+    from database import Team
+    from config import TEAM_SEATS
+
+    over = []
+    upstream = {}
+    for account_id, account in mock_state.accounts.items():
+        upstream[account_id] = (sum(1 for m in account['members'].values() if m['role'] != 'account-owner')
+                                + len(account['invites']))
+    for team in Team.get_all_with_capacity():
+        seats = upstream.get(team['account_id'], 0)
+        if team['member_count'] > TEAM_SEATS or seats > TEAM_SEATS:
+            over.append({'team': team['name'], 'db_members': team['member_count'], 'upstream_seats': seats})
+    return over
+
+
+def summarize(results, duration, args, extra):
+    latencies = sorted(r['latency_ms'] for r in results)
+    total = len(results)
+    outcomes = {}
+    for r in results:
+        outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+    slowest = {}
+    for r in results:
+        if r['slowest_step']:
+            slowest[r['slowest_step']] = slowest.get(r['slowest_step'], 0) + 1
+    success_latencies = sorted(r['latency_ms'] for r in results if r['outcome'] == 'success')
+
+    return {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': extra.pop('git_commit'),
+        'params': {
+            'teams': args.teams, 'keys': args.keys, 'key_kind': args.key_kind, 'rps': args.rps,
+            'concurrency': args.concurrency, 'latency': args.latency, 'error_429': args.error_429,
+            'error_5xx': args.error_5xx, 'phantom_rate': args.phantom_rate,
+            'invite_visible_after': args.invite_visible_after
+        },
+        'requests': total,
+        'duration_s': round(duration, 2),
+        'achieved_rps': round(total / duration, 2) if duration else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else None
+        },
+        'success_latency_ms': {
+            'p50': percentile(success_latencies, 0.50),
+            'p95': percentile(success_latencies, 0.95),
+            'p99': percentile(success_latencies, 0.99)
+        },
+        'outcomes': outcomes,
+        'success_rate': round(outcomes.get('success', 0) / total, 4) if total else 0,
+        'all_full_rate': round(outcomes.get('all_full', 0) / total, 4) if total else 0,
+        'slowest_step': slowest,
+        **extra
+    }
+
+
+def print_report(report, baseline=None):
+    def row(label, key_path, fmt='{}'):
+        def get(data):
+            value = data
+            for key in key_path:
+                value = (value or {}).get(key)
+            return value
+        current = get(report)
+        line = f"   {label:<22}{fmt.format(current) if current is not None else '-':>12}"
+        if baseline is not None:
+            before = get(baseline)
+            line += f"{fmt.format(before) if before is not None else '-':>12}"
+            if isinstance(current, (int, float)) and isinstance(before, (int, float)) and before:
+                line += f"{(current - before) / before * 100:>+10.1f}%"
+        print(line)
+
+    print(f"\n📊 /api/join 压测结果（{report['requests']} 个请求，{report['duration_s']}s，"
+          f"实际 {report['achieved_rps']} rps）")
+    if baseline is not None:
+        print(f"   {'':<22}{'本次':>12}{'对比':>12}{'变化':>11}")
+    row('p50 (ms)', ('latency_ms', 'p50'))
+    row('p95 (ms)', ('latency_ms', 'p95'))
+    row('p99 (ms)', ('latency_ms', 'p99'))
+    row('max (ms)', ('latency_ms', 'max'))
+    row('成功率', ('success_rate',), '{:.2%}')
+    row('名额已满比例', ('all_full_rate',), '{:.2%}')
+    row('数据库锁重试', ('db', 'lock_retries'))
+    row('数据库锁错误', ('db', 'lock_errors'))
+    row('超额分配 Team 数', ('oversubscribed_count',))
+    print(f"   结果分布: {report['outcomes']}")
+    if report['slowest_step']:
+        print(f"   最慢步骤: {report['slowest_step']}")
+    print(f"   上游请求数: { {route: stats['requests'] for route, stats in report['upstream'].items()} }")
+    if report.get('ready_pool'):
+        pool = report['ready_pool']
+        print(f"   就绪池: 命中率 {pool['hit_rate']:.0%}，核对 {pool['checked']} 次，跳过上游已满 {pool['skipped_full']} 次")
+    for team in report['oversubscribed'][:10]:
+        print(f"   ⚠️  {team['team']}: 数据库 {team['db_members']} / 上游 {team['upstream_seats']}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/api/join 端到端压测')
+    parser.add_argument('--teams', type=int, default=50, help='Team 数量（每个 4 个名额）')
+    parser.add_argument('--keys', type=int, default=250, help='密钥数量（即请求数）')
+    parser.add_argument('--key-kind', choices=('access', 'order'), default='access', help='访问密钥或订单号密钥')
+    parser.add_argument('--temp-hours', type=int, default=0, help='访问密钥的临时时长（小时），0 为永久')
+    parser.add_argument('--rps', type=float, default=20, help='目标请求速率')
+    parser.add_argument('--concurrency', type=int, default=64, help='客户端最大并发数')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求的客户端超时 (秒)')
+    parser.add_argument('--latency', default='lognormal:0.08,0.5', help='模拟接口延迟分布（见 mock_backend.py）')
+    parser.add_argument('--error-429', type=float, default=0.0, help='模拟接口 429 概率')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='模拟接口 5xx 概率')
+    parser.add_argument('--phantom-rate', type=float, default=0.0, help='邀请返回 5xx 但实际生效的概率')
+    parser.add_argument('--invite-visible-after', type=float, default=0.0, help='新邀请出现在待处理列表前的延迟 (秒)')
+    parser.add_argument('--seed', type=int, default=42, help='模拟接口随机种子')
+    parser.add_argument('--ready-pool', action='store_true', help='启动后台就绪池（ready_pool.py）')
+    parser.add_argument('--output', help='结果 JSON 路径（默认 loadtest_join_<时间>.json）')
+    parser.add_argument('--compare', help='与之前保存的结果 JSON 对比')
+    args = parser.parse_args()
+
+    mock = start_mock_backend(seed=args.seed, latency=args.latency, error_429=args.error_429,
+                              error_5xx=args.error_5xx, phantom_rate=args.phantom_rate,
+                              invite_visible_after=args.invite_visible_after)
+
+    # 必须在导入应用之前设置：config 在导入时读取环境变量
+    workdir = tempfile.mkdtemp(prefix='loadtest_join_')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'loadtest.db')
+    os.environ['CHATGPT_API_BASE'] = mock.base_url
+
+    from werkzeug.serving import make_server
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app_new
+        from database import get_db_pool_stats, flush_audit_writes
+        from config import TEAM_SEATS
+        keys = seed(args.teams, args.keys, args.key_kind, args.temp_hours)
+        if args.ready_pool:
+            app_new.ready_pool.start()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_new.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/join"
+
+    print(f"🚀 {args.teams} 个 Team（{args.teams * TEAM_SEATS} 个名额），{len(keys)} 个{args.key_kind}密钥，"
+          f"目标 {args.rps:g} rps，并发上限 {args.concurrency}，模拟延迟 {args.latency}")
+
+    pool_before = get_db_pool_stats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, duration = run_load(url, keys, args.rps, args.concurrency, args.timeout)
+        flush_audit_writes()
+    pool_after = get_db_pool_stats()
+    server.shutdown()
+    if args.ready_pool:
+        app_new.ready_pool.stop()
+
+    over = oversubscribed_teams(mock.state)
+    report = summarize(results, duration, args, {
+        'git_commit': git_commit(),
+        'db': {key: pool_after.get(key, 0) - pool_before.get(key, 0) for key in ('lock_retries', 'lock_errors')},
+        'oversubscribed_count': len(over),
+        'oversubscribed': over,
+        'upstream': mock.state.get_stats()['routes'],
+        'ready_pool': app_new.ready_pool.get_stats() if args.ready_pool else None
+    })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or f"loadtest_join_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n💾 结果已保存: {output}")
+    return 0 if report['oversubscribed_count'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
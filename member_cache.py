@@ -0,0 +1,116 @@
+"""
+Team 成员列表缓存（进程内，按 account_id）
+
+join_team、管理后台、自动踢人等多处都会获取同一个 Team 的成员列表：
+- 成功的结果缓存 MEMBER_CACHE_TTL 秒
+- 同一账号并发的获取请求合并为一次（singleflight），其余调用方等待并共享结果
+- 邀请、踢人之后立即使该账号的缓存失效；失效前已发出的请求结果不会写回缓存
+"""
+import threading
+import time
+
+from config import MEMBER_CACHE_TTL
+
+
+class _Flight:
+    """一次进行中的获取请求"""
+    __slots__ = ('event', 'result', 'error', 'stale')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.stale = False
+
+
+class MemberCache:
+    """带 TTL 和请求合并的成员列表缓存（线程安全）"""
+
+    def __init__(self, ttl=MEMBER_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # account_id -> (写入时间, 结果)
+        self._flights = {}  # account_id -> _Flight
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'invalidations': 0
+        }
+
+    def get(self, account_id, fetch, cacheable=None):
+        """
+        返回 account_id 的成员列表结果：缓存有效时直接返回，
+        否则调用 fetch()（同一账号同时只有一个调用方真正发出请求）
+        cacheable(result) 为 False 的结果（如错误响应）只共享给等待者，不写入缓存
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and now - entry[0] < self.ttl:
+                self._stats['hits'] += 1
+                return entry[1]
+
+            flight = self._flights.get(account_id)
+            leader = flight is None
+            if leader:
+                flight = self._flights[account_id] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(account_id) is flight:
+                    del self._flights[account_id]
+                if (flight.error is None and not flight.stale
+                        and (cacheable is None or cacheable(flight.result))):
+                    self._entries[account_id] = (time.monotonic(), flight.result)
+            flight.event.set()
+        return flight.result
+
+    def put(self, account_id, result):
+        """直接写入缓存（由不经过 get() 的调用方获取到的最新结果）"""
+        with self._lock:
+            self._entries[account_id] = (time.monotonic(), result)
+
+    def invalidate(self, account_id):
+        """使账号的缓存失效；进行中的请求结果作废，之后的调用方重新获取"""
+        with self._lock:
+            self._entries.pop(account_id, None)
+            flight = self._flights.pop(account_id, None)
+            if flight is not None:
+                flight.stale = True
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for flight in self._flights.values():
+                flight.stale = True
+            self._flights.clear()
+
+    def get_stats(self):
+        """获取缓存统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = sum(1 for written, _ in self._entries.values() if now - written < self.ttl)
+            stats['in_flight'] = len(self._flights)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0
+        return stats
+
+
+member_cache = MemberCache()
@@ -0,0 +1,497 @@
+"""
+数据库版本化迁移
+
+schema_version 表记录已应用的迁移版本，启动时只需一次版本查询；
+新的表结构变更请在末尾按顺序追加 @migration(版本号, 描述)，不要修改已发布的迁移。
+
+命令行用法:
+    python3 migrations.py           # 备份数据库后执行未应用的迁移
+    python3 migrations.py --status  # 查看当前版本和待执行的迁移
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import database
+from config import MIGRATION_BATCH_SIZE
+from database import get_db, _create_member_counter_triggers, _rebuild_member_counters, TEAM_MEMBER_COUNTERS
+
+
+# 迁移注册表: [(version, description, func)]，按版本号升序
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """注册迁移的装饰器"""
+    def decorator(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"迁移版本号必须递增: {version}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_current_version(conn):
+    """获取当前数据库的版本号（schema_version 表不存在时为 0）"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def _columns(conn, table):
+    return {row[1]: row for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def add_column_if_missing(conn, table, column, definition):
+    """字段不存在时添加，返回是否新增"""
+    if column in _columns(conn, table):
+        return False
+    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+def rebuild_table(conn, table, create_sql, columns, batch_size=None, post_sql=()):
+    """
+    分批重建表（用于 SQLite 不支持的 ALTER，如修改约束）
+
+    create_sql 中用 {table} 作为表名占位符；按 id 分批复制，每批单独提交，
+    避免在大库上长时间持有写锁。最后在一个短事务中补齐复制期间新增的行并替换旧表。
+    复制期间对已复制行的修改不会同步，请在服务停止时执行（启动时迁移即满足）。
+    post_sql 为替换后需要重建的索引/触发器语句。
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    new_table = f'{table}_new'
+    column_list = ', '.join(columns)
+
+    conn.commit()
+    conn.execute(f'DROP TABLE IF EXISTS {new_table}')
+    conn.execute(create_sql.format(table=new_table))
+    conn.commit()
+
+    total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    print(f"   🔄 重建 {table} 表: 共 {total} 行, 每批 {batch_size} 行")
+
+    last_id = 0
+    copied = 0
+    started = time.monotonic()
+    while True:
+        cursor = conn.execute(f'''
+            INSERT INTO {new_table} ({column_list})
+            SELECT {column_list} FROM {table}
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, batch_size))
+        if cursor.rowcount <= 0:
+            break
+        copied += cursor.rowcount
+        last_id = conn.execute(f'SELECT MAX(id) FROM {new_table}').fetchone()[0]
+        conn.commit()
+        percent = copied * 100 / total if total else 100
+        print(f"      已复制 {copied}/{total} ({percent:.1f}%)")
+
+    # 替换旧表：关闭外键，防止删除旧表时触发 ON DELETE 动作（事务内设置无效，需先提交）
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        conn.execute(f'''
+            INSERT INTO {new_table} ({column_list})
+            SELECT {column_list} FROM {table} WHERE id > ?
+        ''', (last_id,))
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {new_table} RENAME TO {table}')
+        for sql in post_sql:
+            conn.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = ON')
+
+    print(f"   ✅ {table} 表重建完成, 耗时 {time.monotonic() - started:.1f} 秒")
+
+
+def migrate():
+    """执行所有未应用的迁移，返回应用的迁移数量"""
+    with get_db() as conn:
+        current = get_current_version(conn)
+        if current >= latest_version():
+            return 0
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        pending = [m for m in MIGRATIONS if m[0] > current]
+        print(f"🔄 数据库版本 {current} -> {latest_version()}, 待执行 {len(pending)} 个迁移")
+        for version, description, func in pending:
+            print(f"   ▶️  [{version}] {description}")
+            try:
+                func(conn)
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (version, description))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"   ❌ 迁移 [{version}] 失败: {e}")
+                raise
+        print("✅ 数据库迁移完成")
+        return len(pending)
+
+
+# ==================== 迁移列表 ====================
+
+@migration(1, '基础表结构')
+def _m0001_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            account_id TEXT NOT NULL,
+            access_token TEXT NOT NULL,
+            organization_id TEXT,
+            email TEXT,
+            last_invite_at TIMESTAMP,
+            token_error_count INTEGER DEFAULT 0,
+            token_status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Access Keys 表 (重构: 每个邀请码对应一个 Team)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS access_keys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id INTEGER,
+            key_code TEXT NOT NULL UNIQUE,
+            is_temp BOOLEAN DEFAULT 0,
+            temp_hours INTEGER DEFAULT 0,
+            is_cancelled BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE SET NULL
+        )
+    ''')
+
+    # Invitations 表（记录所有邀请）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS invitations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id INTEGER NOT NULL,
+            key_id INTEGER,
+            email TEXT NOT NULL,
+            user_id TEXT,
+            invite_id TEXT,
+            status TEXT DEFAULT 'pending',
+            is_temp BOOLEAN DEFAULT 0,
+            temp_expire_at TIMESTAMP,
+            is_confirmed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE CASCADE,
+            FOREIGN KEY (key_id) REFERENCES access_keys (id) ON DELETE SET NULL
+        )
+    ''')
+
+    # 自动检测配置表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS auto_kick_config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enabled BOOLEAN DEFAULT 0,
+            check_interval_min INTEGER DEFAULT 90,
+            check_interval_max INTEGER DEFAULT 120,
+            start_time TEXT DEFAULT '09:00',
+            end_time TEXT DEFAULT '22:00',
+            timezone TEXT DEFAULT 'Asia/Shanghai',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 插入默认配置（如果不存在）
+    if conn.execute('SELECT COUNT(*) FROM auto_kick_config').fetchone()[0] == 0:
+        conn.execute('''
+            INSERT INTO auto_kick_config (enabled, check_interval_min, check_interval_max, start_time, end_time)
+            VALUES (0, 90, 120, '09:00', '22:00')
+        ''')
+
+    # 踢人日志表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS kick_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            email TEXT NOT NULL,
+            reason TEXT,
+            success BOOLEAN DEFAULT 1,
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE CASCADE
+        )
+    ''')
+
+    # 登录失败记录表 (fail2ban)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ip_address TEXT NOT NULL,
+            username TEXT,
+            success BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_login_attempts_ip
+        ON login_attempts(ip_address, created_at)
+    ''')
+
+
+@migration(2, 'teams 表 Token 状态与邀请轮询字段')
+def _m0002_team_status_columns(conn):
+    add_column_if_missing(conn, 'teams', 'last_invite_at', 'TIMESTAMP')
+    add_column_if_missing(conn, 'teams', 'token_error_count', 'INTEGER DEFAULT 0')
+    add_column_if_missing(conn, 'teams', 'token_status', "TEXT DEFAULT 'active'")
+    add_column_if_missing(conn, 'teams', 'member_check_error_count', 'INTEGER DEFAULT 0')
+    add_column_if_missing(conn, 'teams', 'member_check_first_error_at', 'TIMESTAMP')
+
+
+@migration(3, 'access_keys.team_id 允许为空')
+def _m0003_access_keys_nullable_team(conn):
+    team_id = _columns(conn, 'access_keys').get('team_id')
+    if team_id is None or not team_id[3]:  # notnull
+        return
+
+    rebuild_table(conn, 'access_keys', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id INTEGER,
+            key_code TEXT NOT NULL UNIQUE,
+            is_temp BOOLEAN DEFAULT 0,
+            temp_hours INTEGER DEFAULT 0,
+            is_cancelled BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (team_id) REFERENCES teams (id) ON DELETE SET NULL
+        )
+    ''', ['id', 'team_id', 'key_code', 'is_temp', 'temp_hours', 'is_cancelled', 'created_at'])
+
+
+@migration(4, '小红书订单表和配置表')
+def _m0004_xhs_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_number TEXT NOT NULL UNIQUE,
+            key_id INTEGER,
+            is_used BOOLEAN DEFAULT 0,
+            user_email TEXT,
+            extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            used_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (key_id) REFERENCES access_keys (id) ON DELETE SET NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_number
+        ON orders(order_number)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_orders_used
+        ON orders(is_used, created_at)
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS xhs_config (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cookies TEXT,
+            last_sync_at TIMESTAMP,
+            sync_enabled BOOLEAN DEFAULT 0,
+            sync_interval_hours INTEGER DEFAULT 6,
+            last_error TEXT,
+            error_count INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if conn.execute('SELECT COUNT(*) FROM xhs_config').fetchone()[0] == 0:
+        conn.execute('''
+            INSERT INTO xhs_config (sync_enabled, sync_interval_hours)
+            VALUES (0, 6)
+        ''')
+
+
+@migration(5, 'Team 名额统计覆盖索引')
+def _m0005_invitation_capacity_index(conn):
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_invitations_team_status_email
+        ON invitations(team_id, status, email)
+    ''')
+
+
+@migration(6, 'teams 名额计数器及维护触发器')
+def _m0006_team_member_counters(conn):
+    added = False
+    for column in TEAM_MEMBER_COUNTERS:
+        added = add_column_if_missing(conn, 'teams', column, 'INTEGER NOT NULL DEFAULT 0') or added
+
+    _create_member_counter_triggers(conn.cursor())
+    if added:
+        # 新增计数器字段时根据现有邀请记录回填
+        _rebuild_member_counters(conn.cursor())
+
+    # 有空位的 Team 按最后邀请时间排序（部分索引，直接回答"下一个可用 Team"）
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_teams_free_seats
+        ON teams(last_invite_at, id)
+        WHERE success_members < 4 AND token_status != 'expired'
+    ''')
+
+
+
+@migration(7, '热点查询索引（邀请、踢人日志、邀请码、订单）')
+def _m0007_query_indexes(conn):
+    statements = [
+        # Invitation.get_by_team / get_by_user_id
+        'CREATE INDEX IF NOT EXISTS idx_invitations_team_created ON invitations(team_id, created_at)',
+        # Invitation.get_teams_by_email: LOWER(email) = LOWER(?) AND status = 'success'
+        'CREATE INDEX IF NOT EXISTS idx_invitations_email_lower ON invitations(lower(email), status)',
+        # Invitation.delete_by_email: team_id = ? AND LOWER(email) = LOWER(?)
+        'CREATE INDEX IF NOT EXISTS idx_invitations_team_email_lower ON invitations(team_id, lower(email))',
+        # AccessKey.get_all / get_by_code / Order.get_all 的 usage_count 相关子查询
+        'CREATE INDEX IF NOT EXISTS idx_invitations_key_status ON invitations(key_id, status)',
+        # Invitation.get_all 按创建时间倒序
+        'CREATE INDEX IF NOT EXISTS idx_invitations_created ON invitations(created_at)',
+        # Invitation.get_temp_expired: 只索引未确认的临时邀请
+        '''CREATE INDEX IF NOT EXISTS idx_invitations_temp_unconfirmed ON invitations(temp_expire_at)
+           WHERE is_temp = 1 AND is_confirmed = 0''',
+        # KickLog.get_all / get_by_team
+        'CREATE INDEX IF NOT EXISTS idx_kick_logs_created ON kick_logs(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_kick_logs_team_created ON kick_logs(team_id, created_at)',
+        # 删除 Team 时 ON DELETE SET NULL 需要按 team_id 查找邀请码
+        'CREATE INDEX IF NOT EXISTS idx_access_keys_team ON access_keys(team_id)',
+        # AccessKey.get_all: is_cancelled = 0 ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_access_keys_cancelled_created ON access_keys(is_cancelled, created_at)',
+        # Team.get_all / get_by_organization_id / get_expired_teams
+        'CREATE INDEX IF NOT EXISTS idx_teams_created ON teams(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_teams_organization ON teams(organization_id)',
+        'CREATE INDEX IF NOT EXISTS idx_teams_token_status ON teams(token_status, updated_at)',
+        # Order.get_all / get_stats（今日新增）/ 按 key_id 关联
+        'CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_extracted ON orders(extracted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_key ON orders(key_id)',
+        # LoginAttempt.cleanup_old_records
+        'CREATE INDEX IF NOT EXISTS idx_login_attempts_created ON login_attempts(created_at)',
+    ]
+    for sql in statements:
+        conn.execute(sql)
+
+
+@migration(8, '管理后台游标分页的过滤索引')
+def _m0008_admin_page_indexes(conn):
+    # 二级索引末尾隐含 rowid (id)，(…, created_at) 索引即可按 (created_at, id) 有序翻页
+    statements = [
+        # Invitation.get_all(status=...)
+        'CREATE INDEX IF NOT EXISTS idx_invitations_status_created ON invitations(status, created_at)',
+        # KickLog.get_all(status=...) / (email_prefix=...)
+        'CREATE INDEX IF NOT EXISTS idx_kick_logs_success_created ON kick_logs(success, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_kick_logs_email_lower ON kick_logs(lower(email))',
+        # AccessKey.get_all(team_id=...)，同时覆盖删除 Team 时按 team_id 的查找
+        '''CREATE INDEX IF NOT EXISTS idx_access_keys_team_cancelled_created
+           ON access_keys(team_id, is_cancelled, created_at)''',
+        'DROP INDEX IF EXISTS idx_access_keys_team',
+        # Order.get_all(email_prefix=...)
+        'CREATE INDEX IF NOT EXISTS idx_orders_user_email_lower ON orders(lower(user_email))',
+    ]
+    for sql in statements:
+        conn.execute(sql)
+
+
+@migration(9, '临时邀请到期时间改存 UTC 时间戳并建索引')
+def _m0009_temp_expire_ts(conn):
+    # temp_expire_at 保留用于展示；到期查询和调度改用整数时间戳，范围比较可直接走索引
+    add_column_if_missing(conn, 'invitations', 'temp_expire_ts', 'INTEGER')
+    conn.execute('''
+        UPDATE invitations
+        SET temp_expire_ts = CAST(strftime('%s', temp_expire_at) AS INTEGER)
+        WHERE temp_expire_at IS NOT NULL AND temp_expire_ts IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_invitations_temp_expire_ts ON invitations(temp_expire_ts)
+        WHERE is_temp = 1 AND is_confirmed = 0
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_invitations_temp_unconfirmed')
+
+
+@migration(10, '名额预占表')
+def _m0010_seat_reservations(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seat_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            team_id INTEGER NOT NULL,
+            email TEXT NOT NULL,
+            key_id INTEGER,
+            expires_at INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (team_id) REFERENCES teams(id) ON DELETE CASCADE
+        )
+    ''')
+    # 按 Team 统计 / 清理未过期的预占
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_seat_reservations_team_expires
+        ON seat_reservations(team_id, expires_at)
+    ''')
+
+
+@migration(11, 'idx_teams_free_seats 改用与查询一致的 token 状态条件')
+def _m0011_free_seats_index_token_status(conn):
+    # 迁移 6 的条件 token_status != 'expired' 会漏掉 token_status 为 NULL 的 Team；
+    # 条件须与 database.TEAM_TOKEN_USABLE 和 TEAM_SEATS（4）保持一致，get_free_teams 才能使用该索引
+    conn.execute('DROP INDEX IF EXISTS idx_teams_free_seats')
+    conn.execute('''
+        CREATE INDEX idx_teams_free_seats
+        ON teams(last_invite_at, id)
+        WHERE success_members < 4 AND COALESCE(token_status, 'active') != 'expired'
+    ''')
+
+
+def _backup_database(path):
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backup_file = f'{path}.backup_{timestamp}'
+    # 先把 WAL 内容写回主库，保证备份完整
+    with get_db() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    shutil.copy(path, backup_file)
+    print(f"✅ 数据库已备份到: {backup_file}")
+    return backup_file
+
+
+def main():
+    path = database.DATABASE_PATH
+    if '--status' in sys.argv[1:]:
+        with get_db() as conn:
+            current = get_current_version(conn)
+        print(f"📦 数据库: {path}")
+        print(f"   当前版本: {current}, 最新版本: {latest_version()}")
+        for version, description, _ in MIGRATIONS:
+            mark = '✅' if version <= current else '⏳'
+            print(f"   {mark} [{version}] {description}")
+        return 0
+
+    if os.path.exists(path):
+        _backup_database(path)
+    migrate()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+本地模拟 ChatGPT Team backend-api（压测 / 延迟测试用，不需要真实 Token 和网络）
+
+实现 chatgpt_client 用到的全部接口，Team 状态保存在内存中：
+    GET    /backend-api/accounts/{account_id}/users            成员列表
+    GET    /backend-api/accounts/{account_id}/invites          待处理邀请
+    POST   /backend-api/accounts/{account_id}/invites          发送邀请 {"email_addresses": [...]}
+    DELETE /backend-api/accounts/{account_id}/users/{user_id}  踢出成员
+路径前缀 /backend-api 可省略。未见过的 account_id 首次访问时自动创建（带一个所有者）。
+
+可调参数（命令行、start_mock_backend() 关键字参数或运行时 POST /_mock/config）：
+    latency           延迟分布，按接口覆盖：{'default': '0.05', 'invite': 'lognormal:0.3,0.5', ...}
+                      接口名: members / invites / invite / kick；分布写法见 parse_latency()
+    error_401 / error_429 / error_5xx   按概率注入错误（0~1），429 带 Retry-After: retry_after
+    phantom_rate      邀请请求返回 5xx 但邀请实际已生效的概率（上游同步延迟的典型表现）
+    invite_visible_after   新邀请出现在待处理列表前的延迟 (秒)
+    accept_after      邀请在多少秒后自动变成成员（None 表示不自动接受）
+    max_seats         每个 Team 的名额（成员 + 待处理邀请，不含所有者），超出返回 400；None 不限制
+
+管理接口: GET /_mock/stats、POST /_mock/config、POST /_mock/reset、
+POST /_mock/accounts {"account_id": ..., "members": [邮箱...], "invites": [邮箱...]}
+
+把 CHATGPT_API_BASE 指向它即可让应用、AutoKickService 和基准测试脚本在本地运行：
+    python3 mock_backend.py --port 18600 --latency lognormal:0.08,0.5 --error-429 0.02
+    CHATGPT_API_BASE=http://127.0.0.1:18600/backend-api python3 app_new.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROUTES = (
+    ('GET', re.compile(r'^/accounts/([^/]+)/users$'), 'members'),
+    ('GET', re.compile(r'^/accounts/([^/]+)/invites$'), 'invites'),
+    ('POST', re.compile(r'^/accounts/([^/]+)/invites$'), 'invite'),
+    ('DELETE', re.compile(r'^/accounts/([^/]+)/users/([^/]+)$'), 'kick'),
+)
+
+DEFAULT_CONFIG = {
+    'latency': {'default': '0'},
+    'error_401': 0.0,
+    'error_429': 0.0,
+    'error_5xx': 0.0,
+    'retry_after': 1,
+    'phantom_rate': 0.0,
+    'invite_visible_after': 0.0,
+    'accept_after': None,
+    'max_seats': None,
+}
+
+
+def parse_latency(spec):
+    """
+    解析延迟分布，返回 sample(rng) -> 秒
+    '0.05' / 'fixed:0.05'       固定延迟
+    'uniform:0.02,0.2'          均匀分布
+    'normal:0.1,0.03'           正态分布（均值, 标准差），截断到 >= 0
+    'lognormal:0.08,0.5'        对数正态（中位数, sigma），长尾
+    """
+    kind, _, args = str(spec).partition(':')
+    if not args:
+        kind, args = 'fixed', kind
+    values = [float(v) for v in args.split(',')]
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        mu = math.log(values[0]) if values[0] > 0 else float('-inf')
+        return lambda rng: rng.lognormvariate(mu, values[1]) if values[0] > 0 else 0.0
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+def _now_iso():
+    return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+class MockState:
+    """内存中的 Team 状态和统计（线程安全）"""
+
+    def __init__(self, config=None, seed=None):
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.accounts = {}
+        self.config = {}
+        self.configure(**DEFAULT_CONFIG)
+        self.configure(**(config or {}))
+        self._stats = {}
+
+    # ---------- 配置 ----------
+
+    def configure(self, **config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"未知参数: {', '.join(sorted(unknown))}")
+        with self._lock:
+            if 'latency' in config:
+                latency = config['latency']
+                if not isinstance(latency, dict):
+                    latency = {'default': latency}
+                merged = dict(self.config.get('latency', {}))
+                merged.update(latency)
+                config['latency'] = merged
+                self._samplers = {name: parse_latency(spec) for name, spec in merged.items()}
+            self.config.update(config)
+
+    def reset(self):
+        with self._lock:
+            self.accounts.clear()
+            self._stats.clear()
+
+    # ---------- Team 状态 ----------
+
+    def _account(self, account_id):
+        account = self.accounts.get(account_id)
+        if account is None:
+            owner = {'id': f"user-owner-{account_id}", 'email': f"owner@{account_id}.mock",
+                     'role': 'account-owner', 'name': 'owner', 'created_time': _now_iso()}
+            account = self.accounts[account_id] = {'members': {owner['id']: owner}, 'invites': {}}
+        return account
+
+    def add_account(self, account_id, members=(), invites=()):
+        """预置一个 Team 的成员和待处理邀请（邮箱列表）"""
+        with self._lock:
+            account = self._account(account_id)
+            for email in members:
+                self._add_member(account, email)
+            for email in invites:
+                self._add_invite(account, email, visible_at=0)
+            return account
+
+    def _add_member(self, account, email, role='standard-user'):
+        member = {'id': f"user-{uuid.uuid4().hex[:16]}", 'email': email, 'role': role,
+                  'name': email.split('@')[0], 'created_time': _now_iso()}
+        account['members'][member['id']] = member
+        return member
+
+    def _add_invite(self, account, email, visible_at):
+        invite = {'id': f"invite-{uuid.uuid4().hex[:16]}", 'email_address': email, 'role': 'standard-user',
+                  'created_time': _now_iso(), '_created': time.monotonic(), '_visible_at': visible_at}
+        account['invites'][email.lower()] = invite
+        return invite
+
+    def _settle(self, account):
+        """按 accept_after 把到时间的邀请转成成员"""
+        accept_after = self.config['accept_after']
+        if accept_after is None:
+            return
+        now = time.monotonic()
+        for key, invite in list(account['invites'].items()):
+            if now - invite['_created'] >= accept_after:
+                del account['invites'][key]
+                self._add_member(account, invite['email_address'])
+
+    @staticmethod
+    def _public(invite):
+        return {k: v for k, v in invite.items() if not k.startswith('_')}
+
+    # ---------- 接口 ----------
+
+    def handle(self, route, account_id, user_id=None, body=None):
+        """执行一个接口调用，返回 (status, payload, headers)"""
+        with self._lock:
+            config = self.config
+            roll = self._rng.random()
+            for status, rate in ((401, config['error_401']), (429, config['error_429']),
+                                 (503, config['error_5xx'])):
+                if roll < rate:
+                    headers = {'Retry-After': str(config['retry_after'])} if status == 429 else {}
+                    return status, {'detail': f"mock error {status}"}, headers
+                roll -= rate
+
+            account = self._account(account_id)
+            self._settle(account)
+
+            if route == 'members':
+                items = list(account['members'].values())
+                return 200, {'items': items, 'total': len(items), 'limit': 100, 'offset': 0}, {}
+
+            if route == 'invites':
+                now = time.monotonic()
+                items = [self._public(inv) for inv in account['invites'].values() if inv['_visible_at'] <= now]
+                return 200, {'items': items, 'total': len(items)}, {}
+
+            if route == 'invite':
+                emails = (body or {}).get('email_addresses') or []
+                used = (sum(1 for m in account['members'].values() if m['role'] != 'account-owner')
+                        + len(account['invites']))
+                new = [e for e in emails if e.lower() not in account['invites']]
+                if config['max_seats'] is not None and used + len(new) > config['max_seats']:
+                    return 400, {'detail': 'Not enough seats'}, {}
+                visible_at = time.monotonic() + config['invite_visible_after']
+                invites = [account['invites'].get(e.lower()) or self._add_invite(account, e, visible_at)
+                           for e in emails]
+                if self._rng.random() < config['phantom_rate']:
+                    return 502, {'detail': 'mock upstream timeout (invite applied)'}, {}
+                return 200, {'account_invites': [self._public(inv) for inv in invites], 'errored_emails': []}, {}
+
+            if route == 'kick':
+                if account['members'].get(user_id, {}).get('role') == 'account-owner':
+                    return 400, {'detail': 'Cannot remove account owner'}, {}
+                if account['members'].pop(user_id, None) is None:
+                    return 404, {'detail': 'User not found'}, {}
+                return 200, {'success': True}, {}
+
+        return 404, {'detail': 'Not found'}, {}
+
+    def latency(self, route):
+        with self._lock:
+            sampler = self._samplers.get(route) or self._samplers['default']
+            return sampler(self._rng)
+
+    def record(self, route, status, elapsed):
+        with self._lock:
+            stats = self._stats.setdefault(route, {'requests': 0, 'status': {}, 'total_ms': 0.0})
+            stats['requests'] += 1
+            stats['status'][status] = stats['status'].get(status, 0) + 1
+            stats['total_ms'] += elapsed * 1000
+
+    def get_stats(self):
+        with self._lock:
+            routes = {}
+            for route, stats in self._stats.items():
+                routes[route] = {
+                    'requests': stats['requests'],
+                    'status': dict(stats['status']),
+                    'avg_ms': round(stats['total_ms'] / stats['requests'], 1) if stats['requests'] else 0
+                }
+            return {
+                'accounts': len(self.accounts),
+                'members': sum(len(a['members']) for a in self.accounts.values()),
+                'invites': sum(len(a['invites']) for a in self.accounts.values()),
+                'routes': routes,
+                'config': dict(self.config)
+            }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None  # 由 MockServer 注入
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _dispatch(self, method):
+        state = self.server.state
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/backend-api/'):
+            path = path[len('/backend-api'):]
+        body = self._body() if method in ('POST', 'DELETE') else None
+
+        if path.startswith('/_mock/'):
+            return self._admin(method, path, body or {})
+
+        for route_method, pattern, route in ROUTES:
+            match = pattern.match(path) if route_method == method else None
+            if match:
+                break
+        else:
+            return self._send(404, {'detail': 'Not found'})
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send(401, {'detail': 'Missing bearer token'})
+
+        start = time.monotonic()
+        time.sleep(state.latency(route))
+        status, payload, headers = state.handle(route, *match.groups(), body=body)
+        state.record(route, status, time.monotonic() - start)
+        self._send(status, payload, headers)
+
+    def _admin(self, method, path, body):
+        state = self.server.state
+        try:
+            if path == '/_mock/stats' and method == 'GET':
+                return self._send(200, state.get_stats())
+            if path == '/_mock/config' and method == 'POST':
+                state.configure(**body)
+                return self._send(200, state.get_stats()['config'])
+            if path == '/_mock/reset' and method == 'POST':
+                state.reset()
+                return self._send(200, {'success': True})
+            if path == '/_mock/accounts' and method == 'POST':
+                state.add_account(body['account_id'], body.get('members', ()), body.get('invites', ()))
+                return self._send(200, {'success': True})
+        except (KeyError, ValueError) as e:
+            return self._send(400, {'detail': str(e)})
+        return self._send(404, {'detail': 'Not found'})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, state):
+        self.state = state
+        super().__init__(address, MockHandler)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/backend-api"
+
+
+def start_mock_backend(host='127.0.0.1', port=0, seed=None, **config):
+    """在后台线程启动模拟服务（port=0 自动分配），返回 MockServer；server.base_url 即 CHATGPT_API_BASE"""
+    server = MockServer((host, port), MockState(config, seed=seed))
+    threading.Thread(target=server.serve_forever, daemon=True, name='mock-backend').start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 ChatGPT Team backend-api')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18600)
+    parser.add_argument('--latency', default='0', help='默认延迟分布，如 0.05 / uniform:0.02,0.2 / lognormal:0.08,0.5')
+    for route in ('members', 'invites', 'invite', 'kick'):
+        parser.add_argument(f'--latency-{route}', help=f'{route} 接口的延迟分布（覆盖 --latency）')
+    parser.add_argument('--error-401', type=float, default=0.0, help='401 概率')
+    parser.add_argument('--error-429', type=float, default=0.0, help='429 概率')
+    parser.add_argument('--error-5xx', type=float, default=0.0, help='5xx 概率')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 的 Retry-After (秒)')
+    parser.add_argument('--phantom-rate', type=float, default=0.0, help='邀请返回 5xx 但实际生效的概率')
+    parser.add_argument('--invite-visible-after', type=float, default=0.0, help='新邀请出现在待处理列表前的延迟 (秒)')
+    parser.add_argument('--accept-after', type=float, help='邀请自动变成成员的延迟 (秒)')
+    parser.add_argument('--max-seats', type=int, help='每个 Team 的名额（不含所有者）')
+    parser.add_argument('--seed', type=int, help='随机种子')
+    args = parser.parse_args()
+
+    latency = {'default': args.latency}
+    for route in ('members', 'invites', 'invite', 'kick'):
+        spec = getattr(args, f'latency_{route}')
+        if spec:
+            latency[route] = spec
+
+    server = MockServer((args.host, args.port), MockState({
+        'latency': latency,
+        'error_401': args.error_401,
+        'error_429': args.error_429,
+        'error_5xx': args.error_5xx,
+        'retry_after': args.retry_after,
+        'phantom_rate': args.phantom_rate,
+        'invite_visible_after': args.invite_visible_after,
+        'accept_after': args.accept_after,
+        'max_seats': args.max_seats,
+    }, seed=args.seed))
+    print(f"🧪 模拟 backend-api 已启动: {server.base_url}")
+    print(f"   CHATGPT_API_BASE={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
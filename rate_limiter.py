@@ -0,0 +1,187 @@
+"""
+backend-api 请求限流器（进程内共享）
+
+按 account_id 各维护一个令牌桶，另有一个全局令牌桶作为总上限，
+所有经过 chatgpt_client 的请求在发送前都要先取得两个桶的令牌。
+
+- reserve() 立即扣除令牌并返回需要等待的秒数，并发调用方自动错开，不会同时醒来
+- 收到 429 时遵守 Retry-After（没有则按 RATE_LIMIT_429_BACKOFF 暂停该账号），
+  并把该账号的速率减半；之后每次成功按基础速率的 RATE_LIMIT_RECOVERY 比例逐步恢复 (AIMD)
+- 记录等待次数、等待时长、429 次数等指标
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from config import (RATE_LIMIT_ACCOUNT_RPS, RATE_LIMIT_ACCOUNT_BURST, RATE_LIMIT_GLOBAL_RPS,
+                    RATE_LIMIT_GLOBAL_BURST, RATE_LIMIT_MIN_RPS, RATE_LIMIT_429_BACKOFF,
+                    RATE_LIMIT_RECOVERY, RATE_LIMIT_MAX_WAIT)
+
+
+class RateLimited(Exception):
+    """需要等待的时间超过调用方允许的上限"""
+
+    def __init__(self, account_id, delay):
+        super().__init__(f"请求过于频繁，需等待 {delay:.1f} 秒")
+        self.account_id = account_id
+        self.delay = delay
+
+
+class TokenBucket:
+    """
+    令牌桶；tokens 可以为负（已被预约的令牌），
+    updated 可以在未来（被 Retry-After 暂停到该时刻，期间不补充令牌）
+    """
+    __slots__ = ('base_rate', 'rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now):
+        """预约一个令牌，返回从 now 起需要等待的秒数"""
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        delay = max(0.0, self.updated - now)
+        if self.tokens < 0:
+            delay += -self.tokens / self.rate
+        return delay
+
+    def give_back(self):
+        self.tokens += 1
+
+    def pause_until(self, until):
+        """暂停到 until，到时只放行一个请求，之后按当前速率补充"""
+        if until > self.updated:
+            self.tokens = min(self.tokens, 1)
+            self.updated = until
+
+
+def parse_retry_after(value, now_wall=None):
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回秒数，无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now_wall = now_wall or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now_wall).total_seconds())
+
+
+class RateLimiter:
+    """按账号 + 全局的令牌桶限流器（线程安全）"""
+
+    def __init__(self, account_rps=RATE_LIMIT_ACCOUNT_RPS, account_burst=RATE_LIMIT_ACCOUNT_BURST,
+                 global_rps=RATE_LIMIT_GLOBAL_RPS, global_burst=RATE_LIMIT_GLOBAL_BURST,
+                 min_rps=RATE_LIMIT_MIN_RPS, backoff=RATE_LIMIT_429_BACKOFF, recovery=RATE_LIMIT_RECOVERY,
+                 max_wait=RATE_LIMIT_MAX_WAIT):
+        self.account_rps = account_rps
+        self.account_burst = account_burst
+        self.min_rps = min_rps
+        self.backoff = backoff
+        self.recovery = recovery
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rps, global_burst, time.monotonic())
+        self._accounts = {}
+        self._stats = {
+            'requests': 0,
+            'delayed': 0,
+            'rejected': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+            'throttled_429': 0,
+            'retry_after_honored': 0
+        }
+
+    def _account(self, account_id, now):
+        bucket = self._accounts.get(account_id)
+        if bucket is None:
+            bucket = self._accounts[account_id] = TokenBucket(self.account_rps, self.account_burst, now)
+        return bucket
+
+    def reserve(self, account_id, max_wait=None):
+        """
+        预约一次请求，返回需要等待的秒数（调用方负责等待）
+        需要等待超过 max_wait 时撤销预约并抛出 RateLimited
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._account(account_id, now)
+            delay = max(bucket.take(now), self._global.take(now))
+            if max_wait is not None and delay > max_wait:
+                bucket.give_back()
+                self._global.give_back()
+                self._stats['rejected'] += 1
+                raise RateLimited(account_id, delay)
+            self._stats['requests'] += 1
+            if delay > 0:
+                self._stats['delayed'] += 1
+                self._stats['total_wait'] += delay
+                self._stats['max_wait'] = max(self._stats['max_wait'], delay)
+        return delay
+
+    def acquire(self, account_id, max_wait=None):
+        """预约并等待到可以发送请求，返回实际等待的秒数"""
+        if max_wait is None:
+            max_wait = self.max_wait
+        delay = self.reserve(account_id, max_wait)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def on_response(self, account_id, status_code, retry_after=None):
+        """根据响应调整速率：429 时暂停并减速，成功时逐步恢复"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._account(account_id, now)
+            if status_code == 429:
+                seconds = parse_retry_after(retry_after)
+                self._stats['throttled_429'] += 1
+                if seconds is not None:
+                    self._stats['retry_after_honored'] += 1
+                else:
+                    seconds = self.backoff
+                bucket.pause_until(now + seconds)
+                bucket.rate = max(self.min_rps, bucket.rate / 2)
+            elif status_code < 400 and bucket.rate < bucket.base_rate:
+                # 取整避免浮点误差导致速率永远差一点恢复不到基础速率
+                bucket.rate = round(min(bucket.base_rate, bucket.rate + bucket.base_rate * self.recovery), 6)
+
+    def get_stats(self):
+        """获取限流统计信息（含当前被减速或暂停的账号）"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            throttled = {
+                account_id: {
+                    'rate': round(bucket.rate, 3),
+                    'paused_for': round(max(0.0, bucket.updated - now), 1)
+                }
+                for account_id, bucket in self._accounts.items()
+                if bucket.rate < bucket.base_rate or bucket.updated > now
+            }
+            stats['accounts'] = len(self._accounts)
+            stats['global_rate'] = self._global.rate
+        stats['total_wait'] = round(stats['total_wait'], 3)
+        stats['max_wait'] = round(stats['max_wait'], 3)
+        stats['avg_wait'] = round(stats['total_wait'] / stats['delayed'], 3) if stats['delayed'] else 0
+        stats['throttled_accounts'] = throttled
+        return stats
+
+
+rate_limiter = RateLimiter()
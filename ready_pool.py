@@ -0,0 +1,206 @@
+"""
+已验证 Team 就绪池
+
+后台线程每 READY_POOL_INTERVAL 秒从 Team 分配器查看排在最前的 READY_POOL_SIZE 个 Team（不计入分配，
+不影响轮转策略），并发获取上游成员列表和待处理邀请列表，记录上游实际占用的名额
+（非所有者成员 + 待处理邀请）和其中的邮箱。两个请求都成功（token 可用）的 Team 进入就绪池，
+核对结果 READY_POOL_MAX_AGE 秒内有效。后台请求不排队等待限流（max_wait=0），没有令牌时本轮跳过该 Team。
+
+join_team 用就绪池调整候选 Team 的顺序（arrange）：
+- 邮箱已在某个 Team 的成员或待处理邀请中：排在最前，直接记录成功，不再发送邀请
+- 上游仍有空位的 Team 其次（保持分配器的顺序），上游已满的 Team 跳过
+- 未核对或结果已过期的 Team 排在最后，按原流程处理（预占名额后直接邀请，失败再验证）
+
+核对结果在本进程内就地维护：写入成功邀请记录（invitation_created）时增加占用并记下邮箱，
+发出踢人请求（member_kicked）后丢弃该账号的结果，Team 变化或 token 状态变化（teams_changed）时全部丢弃。
+"""
+import concurrent.futures
+import threading
+import time
+
+import events
+from allocator import team_allocator
+from chatgpt_client import chatgpt_client
+from database import Team
+from config import (READY_POOL_SIZE, READY_POOL_INTERVAL, READY_POOL_MAX_AGE, READY_POOL_READ_TIMEOUT,
+                    TEAM_SEATS)
+
+
+class _ReadyEntry:
+    """一个 Team 的上游核对结果"""
+    __slots__ = ('team_id', 'account_id', 'checked_at', 'used', 'emails')
+
+    def __init__(self, team_id, account_id, used, emails):
+        self.team_id = team_id
+        self.account_id = account_id
+        self.checked_at = time.monotonic()
+        self.used = used  # 上游已占用的名额
+        self.emails = emails  # 小写邮箱 -> 'member' / 'pending'
+
+
+class ReadyPool:
+    """后台核对候选 Team 的上游名额（线程安全）"""
+
+    def __init__(self, allocator=team_allocator, client=chatgpt_client, size=READY_POOL_SIZE,
+                 interval=READY_POOL_INTERVAL, max_age=READY_POOL_MAX_AGE, read_timeout=READY_POOL_READ_TIMEOUT,
+                 seats=TEAM_SEATS):
+        self.allocator = allocator
+        self.client = client
+        self.size = size
+        self.interval = interval
+        self.max_age = max_age
+        self.read_timeout = read_timeout
+        self.seats = seats
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix='ready-pool')
+        self._cond = threading.Condition()
+        self._entries = {}  # team_id -> _ReadyEntry
+        self._running = False
+        self._thread = None
+        self._stats = {'refreshes': 0, 'checked': 0, 'check_errors': 0, 'requests': 0, 'ready_hits': 0,
+                       'known_emails': 0, 'skipped_full': 0, 'last_refresh_ms': 0}
+
+        events.subscribe('invitation_created', self._on_invitation_created)
+        events.subscribe('member_kicked', self._on_member_kicked)
+        events.subscribe('teams_changed', self._on_teams_changed)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name='ready-pool')
+        self._thread.start()
+        print(f"✅ Team 就绪池已启动，每 {self.interval} 秒核对 {self.size} 个 Team")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ 核对就绪 Team 出错: {str(e)}")
+            with self._cond:
+                if self._running:
+                    self._cond.wait(self.interval)
+                if not self._running:
+                    return
+
+    # ---------- 核对 ----------
+
+    def _check(self, team):
+        """获取上游成员和待处理邀请，返回 _ReadyEntry；任一请求失败（含限流）返回 None"""
+        try:
+            members = self.client.get_members(team['access_token'], team['account_id'],
+                                              read_timeout=self.read_timeout, use_cache=False, max_wait=0)
+            if members.status_code != 200:
+                return None
+            invites = self.client.get_invites(team['access_token'], team['account_id'],
+                                              read_timeout=self.read_timeout, max_wait=0)
+            if invites.status_code != 200:
+                return None
+        except Exception:
+            return None
+
+        emails = {}
+        used = 0
+        for member in members.json().get('items', []):
+            emails[member.get('email', '').lower()] = 'member'
+            if member.get('role') != 'account-owner':
+                used += 1
+        for invite in invites.json().get('items', []):
+            email = invite.get('email_address', '').lower()
+            if email not in emails:
+                emails[email] = 'pending'
+                used += 1
+        return _ReadyEntry(team['id'], team['account_id'], used, emails)
+
+    def refresh(self):
+        """核对分配器当前排在最前的 Team，返回进入就绪池的 Team 数"""
+        start = time.perf_counter()
+        teams = [team for team in (Team.get_by_id(team_id)
+                                   for team_id in self.allocator.candidate_ids(self.size, peek=True))
+                 if team is not None]
+        entries = list(self._executor.map(self._check, teams))
+
+        now = time.monotonic()
+        with self._cond:
+            for team, entry in zip(teams, entries):
+                if entry is None:
+                    self._entries.pop(team['id'], None)
+                else:
+                    self._entries[team['id']] = entry
+            for team_id in [t for t, e in self._entries.items() if now - e.checked_at > self.max_age]:
+                del self._entries[team_id]
+            self._stats['refreshes'] += 1
+            self._stats['checked'] += len(teams)
+            self._stats['check_errors'] += sum(1 for entry in entries if entry is None)
+            self._stats['last_refresh_ms'] = round((time.perf_counter() - start) * 1000)
+        return sum(1 for entry in entries if entry is not None)
+
+    # ---------- 使用 ----------
+
+    def arrange(self, teams, email):
+        """
+        按核对结果调整候选 Team 顺序，返回 (teams, sources)
+        sources 为 {team_id: 'member' / 'pending'}，表示邮箱已在该 Team 的成员或待处理邀请中
+        """
+        email = email.lower()
+        now = time.monotonic()
+        known, ready, unchecked = [], [], []
+        sources = {}
+        skipped = 0
+        with self._cond:
+            for team in teams:
+                entry = self._entries.get(team['id'])
+                if entry is None or now - entry.checked_at > self.max_age:
+                    unchecked.append(team)
+                elif email in entry.emails:
+                    sources[team['id']] = entry.emails[email]
+                    known.append(team)
+                elif entry.used >= self.seats:
+                    skipped += 1
+                else:
+                    ready.append(team)
+            self._stats['requests'] += 1
+            self._stats['ready_hits'] += bool(known or ready)
+            self._stats['known_emails'] += bool(known)
+            self._stats['skipped_full'] += skipped
+        return known + ready + unchecked, sources
+
+    def _on_invitation_created(self, team_id, email, status, **_):
+        if status != 'success':
+            return
+        with self._cond:
+            entry = self._entries.get(team_id)
+            if entry is not None and email.lower() not in entry.emails:
+                entry.emails[email.lower()] = 'pending'
+                entry.used += 1
+
+    def _on_member_kicked(self, account_id, **_):
+        with self._cond:
+            for team_id in [t for t, e in self._entries.items() if e.account_id == account_id]:
+                del self._entries[team_id]
+
+    def _on_teams_changed(self, **_):
+        with self._cond:
+            self._entries.clear()
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._cond:
+            stats = dict(self._stats)
+            fresh = [e for e in self._entries.values() if now - e.checked_at <= self.max_age]
+            stats['ready'] = sum(1 for e in fresh if e.used < self.seats)
+            stats['full'] = len(fresh) - stats['ready']
+            stats['running'] = self._running
+        stats['hit_rate'] = round(stats['ready_hits'] / stats['requests'], 3) if stats['requests'] else 0
+        return stats
+
+
+ready_pool = ReadyPool()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+维护脚本：校验 / 重建 teams 表上的名额计数器
+(success_members, pending_members, temp_members)
+
+用法:
+    python3 rebuild_team_counters.py           # 校验并在不一致时重建
+    python3 rebuild_team_counters.py --verify  # 只校验，不一致时返回非 0 退出码
+"""
+import sys
+
+from database import init_db, Team
+
+
+def main():
+    verify_only = '--verify' in sys.argv[1:]
+
+    init_db()
+
+    print("🔍 校验名额计数器...")
+    mismatches = Team.verify_member_counters()
+
+    if not mismatches:
+        print("✅ 所有 Team 的名额计数器均与邀请记录一致")
+        return 0
+
+    print(f"⚠️  发现 {len(mismatches)} 处不一致:")
+    for item in mismatches:
+        print(f"   Team {item['team_id']} ({item['name']}) {item['counter']}: "
+              f"当前={item['actual']}, 应为={item['expected']}")
+
+    if verify_only:
+        return 1
+
+    print("\n🔄 重建名额计数器...")
+    count = Team.rebuild_member_counters()
+    remaining = Team.verify_member_counters()
+    if remaining:
+        print(f"❌ 重建后仍有 {len(remaining)} 处不一致")
+        return 1
+
+    print(f"✅ 已重建 {count} 个 Team 的名额计数器")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
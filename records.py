@@ -0,0 +1,167 @@
+"""
+轻量行记录类型
+
+查询结果直接构造成带 __slots__ 的记录对象，替代 dict(row) 副本：
+每行只保存查询实际选出的列，没有每行一个的 dict 哈希表，内存占用和创建开销都更小。
+
+记录支持 dict 风格访问（record['x']、get、keys、in、dict(record)、**record），
+原有按字典使用查询结果的代码无需修改；写入不在列定义中的键时存放在按需创建的附加字典里。
+序列化 JSON 时才通过 to_dict() 生成字典（见 app_new.py 中的 JSON provider）。
+"""
+
+
+class Record:
+    """记录基类，子类用 __slots__ 声明可能出现的列"""
+    __slots__ = ('_extra',)
+
+    _fields = ()
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(cls.__slots__)
+        cls._field_set = frozenset(cls._fields)
+
+    def __init__(self, values=None, **kwargs):
+        for source in (values or {}, kwargs):
+            for key, value in dict(source).items():
+                self[key] = value
+
+    @classmethod
+    def builder(cls, names):
+        """返回按列名顺序把一行元组构造成记录的 sqlite3 row_factory"""
+        names = tuple(names)
+        if not cls._field_set.issuperset(names):
+            def build_mixed(_cursor, values):
+                record = cls.__new__(cls)
+                for name, value in zip(names, values):
+                    record[name] = value
+                return record
+            return build_mixed
+
+        setters = tuple(getattr(cls, name).__set__ for name in names)
+        new = cls.__new__
+
+        def build(_cursor, values):
+            record = new(cls)
+            for setter, value in zip(setters, values):
+                setter(record, value)
+            return record
+        return build
+
+    def _extra_dict(self):
+        try:
+            return self._extra
+        except AttributeError:
+            return None
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        extra = self._extra_dict()
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, value)
+            return
+        extra = self._extra_dict()
+        if extra is None:
+            extra = self._extra = {}
+        extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set and hasattr(self, key):
+            delattr(self, key)
+            return
+        extra = self._extra_dict()
+        if extra is None or key not in extra:
+            raise KeyError(key)
+        del extra[key]
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return hasattr(self, key)
+        extra = self._extra_dict()
+        return extra is not None and key in extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = [name for name in self._fields if hasattr(self, name)]
+        extra = self._extra_dict()
+        if extra:
+            keys.extend(extra)
+        return keys
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def update(self, values=None, **kwargs):
+        for source in (values or {}, kwargs):
+            for key, value in dict(source).items():
+                self[key] = value
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_dict(self):
+        """生成普通字典（序列化 JSON 时使用）"""
+        return {key: self[key] for key in self.keys()}
+
+    def copy(self):
+        record = self.__class__.__new__(self.__class__)
+        for key in self.keys():
+            record[key] = self[key]
+        return record
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+class TeamRecord(Record):
+    """teams 表记录；member_count / pending_count / reserved_count 仅在名额查询中出现"""
+    __slots__ = ('id', 'name', 'account_id', 'access_token', 'organization_id', 'email',
+                 'last_invite_at', 'token_error_count', 'token_status',
+                 'member_check_error_count', 'member_check_first_error_at',
+                 'created_at', 'updated_at', 'member_count', 'pending_count', 'reserved_count')
+
+
+class InvitationRecord(Record):
+    """invitations 表记录；team_name 仅在关联 teams 的查询中出现"""
+    __slots__ = ('id', 'team_id', 'key_id', 'email', 'user_id', 'invite_id', 'status',
+                 'is_temp', 'temp_expire_at', 'temp_expire_ts', 'is_confirmed', 'created_at', 'team_name')
+
+
+class KeyRecord(Record):
+    """access_keys 表记录"""
+    __slots__ = ('id', 'team_id', 'key_code', 'is_temp', 'temp_hours', 'is_cancelled',
+                 'created_at', 'team_name', 'usage_count')
+
+
+class OrderRecord(Record):
+    """orders 表记录"""
+    __slots__ = ('id', 'order_number', 'key_id', 'is_used', 'user_email', 'extracted_at',
+                 'used_at', 'created_at', 'key_code', 'usage_count')
@@ -0,0 +1,197 @@
+"""
+自动踢人异步扫描引擎
+
+用 asyncio + curl_cffi AsyncSession 并发扫描所有 Team：
+获取成员列表 → 与已邀请邮箱比对 → 踢出非法成员，每个 Team 拿到成员列表后立即进入踢人阶段（流水线）。
+同时在途的请求数由 AUTO_KICK_CONCURRENCY 控制，请求速率仍由 rate_limiter 按账号和全局限流
+（按限流器节奏等待时不占用并发名额，被限流的账号不会挤占其他账号的请求）。
+所有账号共用一个 AsyncSession，Session 不保存 Cookie，只复用连接。
+
+成员判定规则 classify_members() 与线程版 AutoKickService._check_team 共用，两种引擎的判定结果一致。
+"""
+import asyncio
+from http.cookiejar import CookieJar
+
+from curl_cffi.requests import AsyncSession
+from curl_cffi.const import CurlHttpVersion
+
+import events
+from chatgpt_client import build_headers
+from database import Invitation, KickLog
+from rate_limiter import rate_limiter
+from member_cache import member_cache
+from config import (CHATGPT_API_BASE, CHATGPT_IMPERSONATE, CHATGPT_CONNECT_TIMEOUT, CHATGPT_READ_TIMEOUT,
+                    CHATGPT_SCAN_READ_TIMEOUT, AUTO_KICK_CONCURRENCY, RATE_LIMIT_MAX_WAIT)
+
+UNINVITED_REASON = "未经邀请的成员"
+
+
+def classify_members(members, invited_emails):
+    """
+    判定每个成员的处理方式，返回 [(结果, 邮箱, user_id)]
+    结果为 'owner'（所有者，跳过）、'legal'（已邀请）或 'kick'（未经邀请，需踢出）
+    invited_emails 为小写邮箱集合（含 Team 所有者邮箱）
+    """
+    decisions = []
+    for member in members:
+        member_email = member.get('email', '').lower()
+        member_user_id = member.get('id', '')
+
+        if member.get('role', '') == 'account-owner':
+            decisions.append(('owner', member_email, member_user_id))
+        elif member_email in invited_emails:
+            decisions.append(('legal', member_email, member_user_id))
+        else:
+            decisions.append(('kick', member_email, member_user_id))
+    return decisions
+
+
+class _NoCookieJar(CookieJar):
+    """不保存任何 Cookie：上游为某个账号设置的 Cookie 不会带到其他账号的请求中"""
+
+    def set_cookie(self, cookie):
+        pass
+
+
+def _record_kick(team_id, user_id, email, success, error_message=None):
+    """记录踢人结果（在线程中执行，避免阻塞事件循环）"""
+    if success:
+        # 从invitations表中删除记录，释放位置
+        Invitation.delete_by_email(team_id, email)
+    KickLog.create(team_id, user_id, email, UNINVITED_REASON, success=success, error_message=error_message)
+
+
+def _current_invited(team):
+    invited = set(email.lower() for email in Invitation.get_all_emails_by_team(team['id']))
+    if team['email']:
+        invited.add(team['email'].lower())
+    return invited
+
+
+class AsyncScanEngine:
+    """基于 asyncio 的全量 Team 扫描"""
+
+    def __init__(self, base_url=CHATGPT_API_BASE, concurrency=AUTO_KICK_CONCURRENCY, limiter=rate_limiter,
+                 connect_timeout=CHATGPT_CONNECT_TIMEOUT, read_timeout=CHATGPT_SCAN_READ_TIMEOUT,
+                 kick_read_timeout=CHATGPT_READ_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.limiter = limiter
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.kick_read_timeout = kick_read_timeout
+
+    def scan(self, teams, prefetched=None):
+        """
+        扫描所有 Team 并踢出非法成员（阻塞直到完成），返回统计信息
+        prefetched 为 {team_id: 成员列表}，其中的 Team 直接使用已获取的列表，不再请求
+        """
+        return asyncio.run(self._scan(teams, prefetched or {}))
+
+    async def _scan(self, teams, prefetched):
+        stats = {
+            'total': len(teams),
+            'success': 0,
+            'failed': 0,
+            'skipped': 0,
+            'kicked': 0,
+            'kick_failed': 0,
+            'requests': 0
+        }
+        # 一次查询取出所有 Team 的已邀请邮箱，踢人前再按 Team 重新确认
+        invited_by_team = await asyncio.to_thread(Invitation.get_emails_grouped_by_team)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with AsyncSession(max_clients=self.concurrency, impersonate=CHATGPT_IMPERSONATE,
+                                http_version=CurlHttpVersion.V2TLS, cookies=_NoCookieJar()) as session:
+            await asyncio.gather(*(
+                self._check_team_safe(session, semaphore, team, invited_by_team.get(team['id'], set()),
+                                      prefetched.get(team['id']), stats)
+                for team in teams
+            ))
+        return stats
+
+    async def _request(self, session, semaphore, method, team, path, read_timeout, stats):
+        """按限流器节奏等待后占用一个并发名额发送请求（等待期间不占用名额）"""
+        account_id = team['account_id']
+        delay = self.limiter.reserve(account_id, RATE_LIMIT_MAX_WAIT)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            stats['requests'] += 1
+            response = await session.request(method, self.base_url + path,
+                                             headers=build_headers(team['access_token'], account_id),
+                                             timeout=(self.connect_timeout, read_timeout))
+        self.limiter.on_response(account_id, response.status_code, response.headers.get('Retry-After'))
+        return response
+
+    async def _check_team_safe(self, session, semaphore, team, invited_emails, members, stats):
+        try:
+            result = await self._check_team(session, semaphore, team, invited_emails, members, stats)
+        except Exception as e:
+            print(f"❌ 检测 Team {team['name']} 时出错: {str(e)}")
+            result = 'failed'
+        stats[result] += 1
+
+    async def _fetch_members(self, session, semaphore, team, stats):
+        """获取成员列表，失败返回 None"""
+        try:
+            response = await self._request(session, semaphore, 'GET', team,
+                                           f"/accounts/{team['account_id']}/users", self.read_timeout, stats)
+        except Exception as e:
+            print(f"   ❌ {team['name']} 获取成员列表出错: {str(e)}")
+            return None
+        if response.status_code != 200:
+            print(f"   ❌ {team['name']} 获取成员列表失败: {response.status_code}")
+            return None
+        # 扫描拿到的是最新列表，顺便刷新成员缓存
+        member_cache.put(team['account_id'], response)
+        return response.json().get('items', [])
+
+    async def _check_team(self, session, semaphore, team, invited_emails, members, stats):
+        """检查单个 Team，返回 'success' / 'skipped'；members 为本轮已获取的成员列表（没有则重新获取）"""
+        if members is None:
+            members = await self._fetch_members(session, semaphore, team, stats)
+        if not members:
+            return 'skipped'
+
+        invited = set(invited_emails)
+        if team['email']:
+            invited.add(team['email'].lower())
+        to_kick = [(email, user_id) for result, email, user_id in classify_members(members, invited)
+                   if result == 'kick']
+        if not to_kick:
+            return 'success'
+
+        # 扫描开始后可能有新邀请，踢人前按最新的邀请记录重新判定
+        invited = await asyncio.to_thread(_current_invited, team)
+        to_kick = [(email, user_id) for email, user_id in to_kick if email not in invited]
+
+        await asyncio.gather(*(self._kick_member(session, semaphore, team, user_id, email, stats)
+                               for email, user_id in to_kick))
+        return 'success'
+
+    async def _kick_member(self, session, semaphore, team, user_id, email, stats):
+        print(f"   ⚠️  {team['name']}: {email} (非法成员,准备踢出)")
+        try:
+            response = await self._request(session, semaphore, 'DELETE', team,
+                                           f"/accounts/{team['account_id']}/users/{user_id}",
+                                           self.kick_read_timeout, stats)
+            success = response.status_code == 200
+            error_msg = None if success else f"状态码: {response.status_code}"
+        except Exception as e:
+            success = False
+            error_msg = str(e)
+        member_cache.invalidate(team['account_id'])
+        events.emit('member_kicked', account_id=team['account_id'], user_id=user_id)
+
+        await asyncio.to_thread(_record_kick, team['id'], user_id, email, success, error_msg)
+        if success:
+            stats['kicked'] += 1
+            print(f"   ✅ 成功踢出: {email}")
+        else:
+            stats['kick_failed'] += 1
+            print(f"   ❌ 踢出失败: {email} - {error_msg}")
+
+
+scan_engine = AsyncScanEngine()